@@ -1,6 +1,7 @@
 from ..models import Intent
 import re
-from typing import List
+from functools import lru_cache
+from typing import Dict, List, Tuple
 
 ALL_DOC_TYPES = [
     "annual report",
@@ -61,6 +62,64 @@ HALF_PATTERNS = {
     ],
 }
 
+ALL_DOC_PHRASES = ["all report", "all reports", "all filings", "all documents", "all docs"]
+
+DOC_TYPE_MAPPING = [
+    ("annual report", "annual report"),
+    ("annual", "annual report"),
+    ("form 10-k", "10-K"),
+    ("10-k", "10-K"),
+    ("10k", "10-K"),
+    ("10-q", "10-Q"),
+    ("10q", "10-Q"),
+    ("20-f", "20-F"),
+    ("financial statement", "financial statements"),
+    ("full financial", "financial statements"),
+    ("balance sheet", "financial statements"),
+    ("income statement", "financial statements"),
+    ("cash flow", "financial statements"),
+    ("investor presentation", "investor presentation"),
+    ("investor deck", "investor presentation"),
+    ("slide deck", "investor presentation"),
+    ("investor slide deck", "investor presentation"),
+    ("presentation deck", "investor presentation"),
+    ("earnings presentation", "investor presentation"),
+    ("earnings release", "earnings release"),
+    ("quarterly report", "earnings release"),
+    ("quarterly results", "earnings release"),
+    ("half-year", "earnings release"),
+    ("semi-annual", "earnings release"),
+    ("quarterly", "earnings release"),
+    ("results release", "earnings release"),
+]
+
+COMMON_WORDS = frozenset(
+    "download latest report reports annual quarterly from the of to and get all files filings documents".split()
+)
+
+PARSE_CACHE_SIZE = 4096
+
+_YEAR_RANGE_RE = re.compile(r"(20\d{2})\s*(?:to|-|–|—)\s*(\d{2,4})")
+_YEAR_RE = re.compile(r"(20\d{2})")
+_TOKEN_RE = re.compile(r"[A-Za-z&.\-]+")
+
+# Every period pattern contains one of these literals, so a prompt that misses
+# this cheap scan cannot match any of them.
+_PERIOD_TRIGGER_RE = re.compile(r"q ?[1-4]|h[12]|quarter|half|semi")
+
+def _compile_period_patterns() -> List[Tuple[str, str, "re.Pattern"]]:
+    compiled = []
+    for key, table in (("quarter", QUARTER_PATTERNS), ("half", HALF_PATTERNS)):
+        for code, patterns in table.items():
+            for pattern in patterns:
+                literal = pattern.replace(r"\b", "")
+                if not _PERIOD_TRIGGER_RE.search(literal):
+                    raise ValueError(f"Period pattern {pattern!r} is not covered by the trigger scan")
+                compiled.append((key, code, re.compile(pattern)))
+    return compiled
+
+_PERIOD_PATTERNS = _compile_period_patterns()
+
 def _extract_years(text: str) -> List[int]:
     """
     Extract explicit years from the text.
@@ -68,7 +127,7 @@ def _extract_years(text: str) -> List[int]:
     - For ranges like "2020 to 2024", also use the END year (2024).
     - Otherwise, return the list of distinct years found.
     """
-    m = re.search(r"(20\d{2})\s*(?:to|-|–|—)\s*(\d{2,4})", text)
+    m = _YEAR_RANGE_RE.search(text)
     if m:
         start = int(m.group(1))
         end_raw = m.group(2)
@@ -79,62 +138,29 @@ def _extract_years(text: str) -> List[int]:
         years = sorted({start, end})
         return years
 
-    years = sorted({int(y) for y in re.findall(r"(20\d{2})", text)})
+    years = sorted({int(y) for y in _YEAR_RE.findall(text)})
     return years or []
 
 def _detect_periods(text: str):
     extras = {}
     txt = text.lower()
-    for code, patterns in QUARTER_PATTERNS.items():
-        for pattern in patterns:
-            if re.search(pattern, txt):
-                extras["quarter"] = code
-                return extras
-    for code, patterns in HALF_PATTERNS.items():
-        for pattern in patterns:
-            if re.search(pattern, txt):
-                extras["half"] = code
-                return extras
+    if not _PERIOD_TRIGGER_RE.search(txt):
+        return extras
+    for key, code, pattern in _PERIOD_PATTERNS:
+        if pattern.search(txt):
+            extras[key] = code
+            return extras
     return extras
 
 def _extract_doc_types(text: str) -> List[str]:
     txt = text.lower()
 
     # "All reports" should include every major document bucket
-    if any(phrase in txt for phrase in ["all report", "all reports", "all filings", "all documents", "all docs"]):
+    if any(phrase in txt for phrase in ALL_DOC_PHRASES):
         return ALL_DOC_TYPES.copy()
 
-    mapping = [
-        ("annual report", "annual report"),
-        ("annual", "annual report"),
-        ("form 10-k", "10-K"),
-        ("10-k", "10-K"),
-        ("10k", "10-K"),
-        ("10-q", "10-Q"),
-        ("10q", "10-Q"),
-        ("20-f", "20-F"),
-        ("financial statement", "financial statements"),
-        ("full financial", "financial statements"),
-        ("balance sheet", "financial statements"),
-        ("income statement", "financial statements"),
-        ("cash flow", "financial statements"),
-        ("investor presentation", "investor presentation"),
-        ("investor deck", "investor presentation"),
-        ("slide deck", "investor presentation"),
-        ("investor slide deck", "investor presentation"),
-        ("presentation deck", "investor presentation"),
-        ("earnings presentation", "investor presentation"),
-        ("earnings release", "earnings release"),
-        ("quarterly report", "earnings release"),
-        ("quarterly results", "earnings release"),
-        ("half-year", "earnings release"),
-        ("semi-annual", "earnings release"),
-        ("quarterly", "earnings release"),
-        ("results release", "earnings release"),
-    ]
-
     doc_types: List[str] = []
-    for needle, normalized in mapping:
+    for needle, normalized in DOC_TYPE_MAPPING:
         if needle in txt and normalized not in doc_types:
             doc_types.append(normalized)
 
@@ -142,17 +168,23 @@ def _extract_doc_types(text: str) -> List[str]:
         doc_types = DEFAULT_DOC_TYPES.copy()
     return doc_types
 
-def parse_prompt(prompt: str) -> Intent:
-    t = prompt.strip()
-
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_normalized(t: str) -> Intent:
     doc_types = _extract_doc_types(t)
     doc_type = doc_types[0]
 
-    tokens = [w for w in re.findall(r"[A-Za-z&.\-]+", t) if len(w) > 1]
-    common = set("download latest report reports annual quarterly from the of to and get all files filings documents".split())
-    cand = [w for w in tokens if w.lower() not in common]
+    tokens = [w for w in _TOKEN_RE.findall(t) if len(w) > 1]
+    cand = [w for w in tokens if w.lower() not in COMMON_WORDS]
     company = cand[0] if cand else "Unknown"
 
     years = _extract_years(t)
     extras = _detect_periods(t)
     return Intent(company=company, doc_type=doc_type, doc_types=doc_types, years=years, extras=extras)
+
+def parse_prompt(prompt: str) -> Intent:
+    # Cached intents are shared, and callers mutate what they get back.
+    return _parse_normalized(prompt.strip()).model_copy(deep=True)
+
+def parse_cache_info() -> Dict[str, int]:
+    info = _parse_normalized.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": info.maxsize}
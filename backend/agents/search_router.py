@@ -1,38 +1,92 @@
-from typing import List
+from typing import Callable, Dict, Iterable, List, Optional
 import asyncio
 import logging
+import random
+import re
+from ..config import ROUTER_EXPLORE_RATE, ROUTER_MIN_ATTEMPTS, ROUTER_SKIP_YIELD
+from ..database import get_provider_stats, record_provider_outcome
+from ..metrics import PROVIDER_SECONDS, timed
 from ..models import Intent, FoundFile
+from ..tracing import annotate, span
 from ..services.sec import find_sec_documents
 from ..services.ir_scraper import find_ir_documents
 from ..services.web_search import web_find_documents
+from ..util.breaker import OPEN, breaker
+from ..util.deadline import Deadline, expired
 
 logger = logging.getLogger(__name__)
 
-async def route_search(intent: Intent) -> List[FoundFile]:
-    # Run blocking search functions in thread pool to avoid blocking async event loop
-    loop = asyncio.get_event_loop()
+# Tavily is most reliable for PDFs, SEC covers U.S. filers, IR scraping is the fallback
+DEFAULT_ORDER = ["tavily", "sec", "ir"]
+SEC_DOC_TYPES = {"10-K", "annual report"}
+# Later providers only run while fewer candidates than this have been found
+ENOUGH_RESULTS = 5
+
+def _provider_fn(provider: str) -> Callable[..., List[FoundFile]]:
+    # Looked up per call so tests can patch the module attributes
+    return {"tavily": web_find_documents, "sec": find_sec_documents, "ir": find_ir_documents}[provider]
+
+def stats_key(intent: Intent) -> str:
+    """Provider stats are kept per ticker when known, else per normalized company."""
+    ticker = (intent.extras or {}).get("ticker")
+    return ticker.upper() if ticker else re.sub(r"[^a-z0-9]", "", intent.company.lower())
+
+def _yield(stats: Dict[str, int]) -> float:
+    # Laplace-smoothed so a provider with no history sits at 0.5
+    return (stats.get("wins", 0) + 1) / (stats.get("attempts", 0) + 2)
+
+def plan_providers(doc_type: str, stats: Dict[str, Dict[str, int]], explore: Optional[bool] = None) -> List[str]:
+    """
+    Providers to ask, in order, for this doc type given its history.
+
+    Providers that have been tried ROUTER_MIN_ATTEMPTS times with a win rate
+    under ROUTER_SKIP_YIELD are skipped, and the rest are ordered by yield,
+    best first. With probability ROUTER_EXPLORE_RATE the default order is
+    used instead, so that skipped providers get another chance.
+    """
+    eligible = [p for p in DEFAULT_ORDER if p != "sec" or doc_type in SEC_DOC_TYPES]
+    if explore is None:
+        explore = random.random() < ROUTER_EXPLORE_RATE
+    if explore or not stats:
+        return eligible
+
+    def fruitless(p: str) -> bool:
+        s = stats.get(p)
+        return bool(s) and s["attempts"] >= ROUTER_MIN_ATTEMPTS and s["wins"] / s["attempts"] < ROUTER_SKIP_YIELD
+
+    kept = [p for p in eligible if not fruitless(p)] or eligible
+    # sort is stable, so ties keep the default order
+    return sorted(kept, key=lambda p: -_yield(stats.get(p, {})))
+
+async def route_search(intent: Intent, deadline: Optional[Deadline] = None) -> List[FoundFile]:
+    # Run blocking search functions in thread pool to avoid blocking async event
+    # loop; to_thread carries the tracing context along
+    key = stats_key(intent)
+    stats = await asyncio.to_thread(get_provider_stats, key, intent.doc_type)
+    order = plan_providers(intent.doc_type, stats)
+    annotate(provider_order=",".join(order))
+
     all_results = []
-    
-    # Strategy 1: Use Tavily as primary search (most reliable for PDFs)
-    tavily_hits = await loop.run_in_executor(None, web_find_documents, intent)
-    if tavily_hits:
-        logger.info(f"Tavily found {len(tavily_hits)} documents")
-        all_results.extend(tavily_hits)
-    
-    # Strategy 2: Try SEC for U.S. public companies + 10-K/annual (if Tavily didn't find enough)
-    if len(all_results) < 5 and intent.doc_type in {"10-K", "annual report"}:
-        sec_hits = await loop.run_in_executor(None, find_sec_documents, intent)
-        if sec_hits:
-            logger.info(f"SEC found {len(sec_hits)} documents")
-            all_results.extend(sec_hits)
-    
-    # Strategy 3: Try IR site scraping (if still not enough)
-    if len(all_results) < 5:
-        ir_hits = await loop.run_in_executor(None, find_ir_documents, intent)
-        if ir_hits:
-            logger.info(f"IR scraper found {len(ir_hits)} documents")
-            all_results.extend(ir_hits)
-    
+    attempted = []
+    for provider in order:
+        if attempted and len(all_results) >= ENOUGH_RESULTS:
+            break
+        if expired(deadline):
+            logger.info(f"Deadline reached before asking {provider}")
+            break
+        if breaker(provider).state == OPEN:
+            # Not an attempt: the provider's history shouldn't pay for its outage
+            logger.info(f"Skipping {provider}: circuit open")
+            continue
+        with timed(PROVIDER_SECONDS, provider), span("provider", provider=provider):
+            hits = await asyncio.to_thread(_provider_fn(provider), intent, deadline)
+            annotate(results=len(hits))
+        attempted.append(provider)
+        if hits:
+            logger.info(f"{provider} found {len(hits)} documents")
+            all_results.extend(hits)
+    await asyncio.to_thread(record_provider_outcome, key, intent.doc_type, attempted)
+
     # Remove duplicates by URL and sort by confidence
     seen = set()
     unique_results = []
@@ -40,9 +94,15 @@ async def route_search(intent: Intent) -> List[FoundFile]:
         if result.url not in seen:
             seen.add(result.url)
             unique_results.append(result)
-    
+
     # Sort by confidence
     unique_results.sort(key=lambda x: x.confidence, reverse=True)
-    
-    logger.info(f"Total unique documents found: {len(unique_results)}")
-    return unique_results
\ No newline at end of file
+
+    logger.info(f"Total unique documents found: {len(unique_results)} (providers: {', '.join(attempted)})")
+    return unique_results
+
+async def record_download_sources(intent: Intent, sources: Iterable[str]):
+    """Credit the providers whose candidates were actually downloaded."""
+    won = {s.lower() for s in sources} & set(DEFAULT_ORDER)
+    if won:
+        await asyncio.to_thread(record_provider_outcome, stats_key(intent), intent.doc_type, (), won)
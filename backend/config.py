@@ -4,6 +4,45 @@ load_dotenv()
 
 DOWNLOAD_ROOT = os.getenv("DOWNLOAD_ROOT", "./data/downloads")
 METADATA_ROOT = os.getenv("METADATA_ROOT", "./data/metadata")
+MANIFEST_COMPRESS = os.getenv("MANIFEST_COMPRESS", "false").strip().lower() in ("1", "true", "yes")
 DEFAULT_PROVIDER = os.getenv("DEFAULT_PROVIDER", "openai")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
+# Overrides for pointing providers at local stand-ins (benchmarks/pipeline_bench.py)
+TAVILY_API_BASE_URL = os.getenv("TAVILY_API_BASE_URL")
+SEC_BASE_URL = os.getenv("SEC_BASE_URL", "https://www.sec.gov").rstrip("/")
+TAVILY_QUERY_CONCURRENCY = int(os.getenv("TAVILY_QUERY_CONCURRENCY", "4"))
+# A target year stops getting queries once a result for it scores this high
+YEAR_CONFIDENCE_THRESHOLD = float(os.getenv("YEAR_CONFIDENCE_THRESHOLD", "0.8"))
+# Provider routing from per-company/doc type history (agents/search_router.py)
+ROUTER_EXPLORE_RATE = float(os.getenv("ROUTER_EXPLORE_RATE", "0.1"))
+ROUTER_MIN_ATTEMPTS = int(os.getenv("ROUTER_MIN_ATTEMPTS", "5"))
+ROUTER_SKIP_YIELD = float(os.getenv("ROUTER_SKIP_YIELD", "0.05"))
+# Per-provider circuit breakers (util/breaker.py)
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+BREAKER_SLOW_RATE = float(os.getenv("BREAKER_SLOW_RATE", "0.5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+BREAKER_HALF_OPEN_CALLS = int(os.getenv("BREAKER_HALF_OPEN_CALLS", "1"))
+METADATA_WRITER_THREADS = int(os.getenv("METADATA_WRITER_THREADS", "4"))
+TEXT_CACHE_ROOT = os.getenv("TEXT_CACHE_ROOT", "./data/text")
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "0")) or (os.cpu_count() or 1)
+PROBE_CANDIDATES = int(os.getenv("PROBE_CANDIDATES", "3"))
+PROBE_BYTES = int(os.getenv("PROBE_BYTES", "65536"))
+PROBE_TIMEOUT = float(os.getenv("PROBE_TIMEOUT", "10"))
+DOWNLOAD_SEGMENTS = int(os.getenv("DOWNLOAD_SEGMENTS", "4"))
+SEGMENT_THRESHOLD_BYTES = int(float(os.getenv("SEGMENT_THRESHOLD_MB", "32")) * 1024 * 1024)
+# Retries and hedging for idempotent GETs (util/http.py)
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "30"))
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))  # 0 disables hedging
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.25"))
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100"))
+LOOP_DEBUG = os.getenv("LOOP_DEBUG", "false").strip().lower() in ("1", "true", "yes")
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")  # unset disables request profiling and /admin endpoints
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./data/profiles")
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "10"))
+TRACE_EXPORT_URL = os.getenv("TRACE_EXPORT_URL")  # OTLP/HTTP JSON, e.g. http://localhost:4318/v1/traces
@@ -5,17 +5,20 @@ Supports SQLite (local development) and Supabase (managed Postgres) deployments.
 """
 import logging
 import os
+import queue
 import sqlite3
+import threading
+import time
+from concurrent.futures import Future
 from datetime import datetime
 from pathlib import Path
 from threading import Lock
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
 
-try:
-    from supabase import Client, create_client
-except Exception:  # pragma: no cover - optional dependency
-    Client = None
-    create_client = None
+if TYPE_CHECKING:  # pragma: no cover
+    from supabase import Client
+
+from .metrics import CACHE_HITS, DB_WRITE_SECONDS, timed
 
 logger = logging.getLogger(__name__)
 
@@ -25,10 +28,23 @@ SQLITE_PATH = Path(os.getenv("SQLITE_PATH", DATA_DIR / "database.db"))
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_ANON_KEY")
 SUPABASE_TABLE = os.getenv("SUPABASE_TABLE", "files")
+SUPABASE_PROVIDER_STATS_TABLE = os.getenv("SUPABASE_PROVIDER_STATS_TABLE", "provider_stats")
+SQLITE_WRITE_BATCH = int(os.getenv("SQLITE_WRITE_BATCH", "500"))
+SUPABASE_WRITE_BATCH = int(os.getenv("SUPABASE_WRITE_BATCH", "200"))
+# Seconds catalog reads are served from memory on the Supabase backend
+SUPABASE_CACHE_TTL = float(os.getenv("SUPABASE_CACHE_TTL", "5"))
+READ_CACHE_MAX_ENTRIES = 1024
 
 _sqlite_conn: Optional[sqlite3.Connection] = None
 _sqlite_lock = Lock()
+_sqlite_readers = threading.local()
+_writer: Optional["_BatchWriter"] = None
+_writer_lock = Lock()
+_fts_available = False
 _supabase_client: Optional["Client"] = None
+_read_cache: Dict[Tuple, Tuple[float, List[Dict]]] = {}
+_read_cache_lock = Lock()
+_read_cache_generation = 0
 
 DB_FIELDS = [
     "company",
@@ -44,6 +60,14 @@ DB_FIELDS = [
     "created_at",
 ]
 
+# One catalog entry per document per company, doc type and year: the same
+# bytes filed for two requests are two entries
+CATALOG_KEY = ("sha256", "company", "doc_type", "year")
+
+
+def catalog_key(doc: Dict) -> Tuple:
+    return tuple(doc.get(field) for field in CATALOG_KEY)
+
 
 def _ensure_backend():
     if DATABASE_BACKEND not in {"sqlite", "supabase"}:
@@ -54,17 +78,213 @@ def _ensure_backend():
 
 
 def _get_sqlite_conn() -> sqlite3.Connection:
+    """Writer connection; only DDL and the write-behind thread use it."""
     global _sqlite_conn
     if _sqlite_conn is None:
         os.makedirs(SQLITE_PATH.parent, exist_ok=True)
         _sqlite_conn = sqlite3.connect(str(SQLITE_PATH), check_same_thread=False)
         _sqlite_conn.row_factory = sqlite3.Row
+        # WAL lets readers run against the last committed snapshot while the
+        # writer appends; NORMAL sync is durable across app crashes in WAL mode.
+        _sqlite_conn.execute("PRAGMA journal_mode=WAL;")
+        _sqlite_conn.execute("PRAGMA synchronous=NORMAL;")
     return _sqlite_conn
 
 
+def _get_sqlite_read_conn() -> sqlite3.Connection:
+    """Per-thread read-only connection, opened on first use in each thread."""
+    conn = getattr(_sqlite_readers, "conn", None)
+    if conn is None or getattr(_sqlite_readers, "path", None) != SQLITE_PATH:
+        _get_sqlite_conn()
+        conn = sqlite3.connect(str(SQLITE_PATH))
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only=ON;")
+        _sqlite_readers.conn = conn
+        _sqlite_readers.path = SQLITE_PATH
+    return conn
+
+
+class _BatchWriter:
+    """
+    Single writer thread that drains queued inserts in batches.
+
+    Callers enqueue a normalized row and get a Future resolving to whether the
+    row was inserted; whatever is queued when the thread wakes up (up to
+    `batch_size` rows) goes to `insert_rows` together: one executemany
+    transaction on SQLite, one upsert request on Supabase.
+    """
+
+    _STOP = object()
+
+    def __init__(self, insert_rows: Callable[[List[Dict]], List[bool]], batch_size: int, name: str):
+        self.insert_rows = insert_rows
+        self.batch_size = max(1, batch_size)
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, doc: Dict) -> "Future":
+        future: Future = Future()
+        self._queue.put((doc, future))
+        return future
+
+    def close(self):
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            batch = [item]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+            if stop:
+                return
+
+    def _flush(self, batch: List[Tuple[Dict, "Future"]]):
+        try:
+            with timed(DB_WRITE_SECONDS, "batch"):
+                inserted = self.insert_rows([doc for doc, _ in batch])
+        except Exception as exc:
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+        for (_, future), ok in zip(batch, inserted):
+            future.set_result(ok)
+
+
+def _insert_sqlite_rows(docs: List[Dict]) -> List[bool]:
+    """Insert rows in one transaction; returns per-row "was new" flags."""
+    conn = _get_sqlite_conn()
+    with _sqlite_lock, conn:
+        hashes = list({doc["sha256"] for doc in docs})
+        existing = set()
+        # Stay well under SQLite's bound-parameter limit.
+        for start in range(0, len(hashes), 900):
+            chunk = hashes[start:start + 900]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT {', '.join(CATALOG_KEY)} FROM files WHERE sha256 IN ({placeholders});",
+                chunk,
+            )
+            existing.update(tuple(row) for row in rows)
+        inserted = []
+        for doc in docs:
+            key = catalog_key(doc)
+            inserted.append(key not in existing)
+            existing.add(key)
+        conn.executemany(
+            """
+            INSERT INTO files (
+                company, doc_type, year, file_path, filename,
+                url, sha256, mimetype, source, indexed_at, created_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT DO NOTHING;
+            """,
+            [tuple(doc[field] for field in DB_FIELDS) for doc, ok in zip(docs, inserted) if ok],
+        )
+    return inserted
+
+
+def _upsert_supabase_rows(docs: List[Dict]) -> List[bool]:
+    """Upsert rows on CATALOG_KEY in one request; returns per-row "was new" flags."""
+    # PostgREST rejects a batch that touches the same key twice
+    unique: Dict[Tuple, Dict] = {}
+    for doc in docs:
+        unique.setdefault(catalog_key(doc), doc)
+    client = _get_supabase_client()
+    # ignore_duplicates maps to ON CONFLICT DO NOTHING, so only rows that were
+    # actually inserted come back in the representation.
+    response = (
+        client.table(SUPABASE_TABLE)
+        .upsert(list(unique.values()), on_conflict=",".join(CATALOG_KEY), ignore_duplicates=True)
+        .execute()
+    )
+    if getattr(response, "error", None):
+        raise RuntimeError(response.error)
+    _invalidate_read_cache()
+    stored = {catalog_key(row) for row in response.data or []}
+    inserted = []
+    for doc in docs:
+        key = catalog_key(doc)
+        inserted.append(key in stored)
+        stored.discard(key)
+    return inserted
+
+
+def _get_writer() -> _BatchWriter:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                if DATABASE_BACKEND == "sqlite":
+                    _writer = _BatchWriter(_insert_sqlite_rows, SQLITE_WRITE_BATCH, "sqlite-writer")
+                else:
+                    _writer = _BatchWriter(_upsert_supabase_rows, SUPABASE_WRITE_BATCH, "supabase-writer")
+    return _writer
+
+
+def close_database():
+    """Flush queued writes and stop the writer thread."""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+
+
+def _invalidate_read_cache():
+    global _read_cache_generation
+    with _read_cache_lock:
+        _read_cache_generation += 1
+        _read_cache.clear()
+
+
+def _cached_read(key: Tuple, fetch: Callable[[], List[Dict]]) -> List[Dict]:
+    """
+    Read-through cache for Supabase catalog queries.
+
+    Results live for SUPABASE_CACHE_TTL seconds and are dropped by every
+    write from this process; a result fetched while a write landed is not
+    stored, so a write is never hidden behind an older read.
+    """
+    if SUPABASE_CACHE_TTL <= 0:
+        return fetch()
+    now = time.monotonic()
+    with _read_cache_lock:
+        hit = _read_cache.get(key)
+        if hit is not None and hit[0] > now:
+            CACHE_HITS.labels("catalog_read").inc()
+            return [dict(row) for row in hit[1]]
+        generation = _read_cache_generation
+    rows = fetch()
+    with _read_cache_lock:
+        if generation == _read_cache_generation:
+            if len(_read_cache) >= READ_CACHE_MAX_ENTRIES:
+                _read_cache.clear()
+            _read_cache[key] = (now + SUPABASE_CACHE_TTL, rows)
+    return [dict(row) for row in rows]
+
+
 def _get_supabase_client() -> "Client":
     global _supabase_client
-    if create_client is None:
+    if _supabase_client is not None:
+        return _supabase_client
+    try:
+        # Optional dependency, and slow to import: only load it when selected
+        from supabase import create_client
+    except Exception:  # pragma: no cover - optional dependency
         raise ImportError(
             "supabase client is not installed. Add 'supabase' to requirements."
         )
@@ -73,8 +293,7 @@ def _get_supabase_client() -> "Client":
             "Supabase credentials are missing. "
             "Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY (or SUPABASE_ANON_KEY)."
         )
-    if _supabase_client is None:
-        _supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    _supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
     return _supabase_client
 
 
@@ -99,28 +318,118 @@ def _normalize_metadata(file_data: Dict) -> Dict:
     return doc
 
 
+_FILE_TEXT_SQL = """
+    CREATE TABLE IF NOT EXISTS file_text (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sha256 TEXT NOT NULL UNIQUE,
+        pages INTEGER,
+        chars INTEGER,
+        extracted_at INTEGER NOT NULL
+    );
+"""
+
+
+def _table_sql(conn: sqlite3.Connection, name: str) -> Optional[str]:
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE name = ?;", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def _init_sqlite_fts(conn: sqlite3.Connection):
+    """
+    Create the full-text tables; skipped with a warning if FTS5 is missing.
+
+    Text is extracted once per file, so it is indexed once per sha256, however
+    many catalog rows share the hash.
+    """
+    global _fts_available
+    legacy = "sha256 TEXT PRIMARY KEY" in (_table_sql(conn, "file_text") or "")
+    if legacy:
+        # Its implicit rowids aren't stable across VACUUM, so text_fts can't point at them
+        conn.execute("ALTER TABLE file_text RENAME TO file_text_legacy;")
+    conn.execute(_FILE_TEXT_SQL)
+    if legacy:
+        conn.execute(
+            "INSERT INTO file_text (sha256, pages, chars, extracted_at) "
+            "SELECT sha256, pages, chars, extracted_at FROM file_text_legacy;"
+        )
+        conn.execute("DROP TABLE file_text_legacy;")
+    try:
+        # rowid mirrors file_text.id; hits join to the catalog through sha256
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS text_fts "
+            "USING fts5(body, tokenize='porter unicode61');"
+        )
+        _fts_available = True
+    except sqlite3.OperationalError as exc:
+        _fts_available = False
+        logger.warning("SQLite FTS5 unavailable, document search disabled: %s", exc)
+        return
+    if _table_sql(conn, "files_fts"):
+        # Catalogs indexed before text_fts held a copy of the text per catalog row
+        logger.info("Migrating document search index to one entry per file")
+        conn.execute(
+            """
+            INSERT INTO text_fts (rowid, body)
+            SELECT t.id, (
+                SELECT o.body FROM files_fts o JOIN files f ON f.id = o.rowid
+                WHERE f.sha256 = t.sha256 LIMIT 1
+            )
+            FROM file_text t
+            WHERE EXISTS (
+                SELECT 1 FROM files_fts o JOIN files f ON f.id = o.rowid WHERE f.sha256 = t.sha256
+            );
+            """
+        )
+        conn.execute("DROP TABLE files_fts;")
+
+
+_FILES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS files (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        company TEXT NOT NULL,
+        doc_type TEXT NOT NULL,
+        year INTEGER,
+        file_path TEXT NOT NULL,
+        filename TEXT NOT NULL,
+        url TEXT NOT NULL,
+        sha256 TEXT NOT NULL,
+        mimetype TEXT,
+        source TEXT,
+        indexed_at INTEGER,
+        created_at TEXT NOT NULL
+    );
+"""
+
+
+def _migrate_files_unique_sha256(conn: sqlite3.Connection):
+    """
+    Catalogs created before CATALOG_KEY made sha256 alone UNIQUE, which
+    SQLite can only drop by rebuilding the table. Ids are kept, since
+    /files cursors carry them.
+    """
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'files';").fetchone()
+    if row is None or "sha256 TEXT NOT NULL UNIQUE" not in row[0]:
+        return
+    logger.info("Migrating files table: unique on (%s) instead of sha256", ", ".join(CATALOG_KEY))
+    conn.execute(_FILES_TABLE_SQL.replace("files (", "files_migrated (", 1))
+    conn.execute(
+        f"INSERT INTO files_migrated (id, {', '.join(DB_FIELDS)}) SELECT id, {', '.join(DB_FIELDS)} FROM files;"
+    )
+    conn.execute("DROP TABLE files;")
+    conn.execute("ALTER TABLE files_migrated RENAME TO files;")
+
+
 def init_database():
     _ensure_backend()
     if DATABASE_BACKEND == "sqlite":
         conn = _get_sqlite_conn()
         with conn:
+            _migrate_files_unique_sha256(conn)
+            conn.execute(_FILES_TABLE_SQL)
+            # year is often unknown; IFNULL keeps NULL years from all counting as distinct
             conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS files (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    company TEXT NOT NULL,
-                    doc_type TEXT NOT NULL,
-                    year INTEGER,
-                    file_path TEXT NOT NULL,
-                    filename TEXT NOT NULL,
-                    url TEXT NOT NULL,
-                    sha256 TEXT NOT NULL UNIQUE,
-                    mimetype TEXT,
-                    source TEXT,
-                    indexed_at INTEGER,
-                    created_at TEXT NOT NULL
-                );
-                """
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_files_catalog_key "
+                "ON files(sha256, company, doc_type, IFNULL(year, -1));"
             )
             conn.execute(
                 "CREATE INDEX IF NOT EXISTS idx_files_company ON files(company);"
@@ -132,6 +441,43 @@ def init_database():
             conn.execute(
                 "CREATE INDEX IF NOT EXISTS idx_files_indexed_at ON files(indexed_at DESC);"
             )
+            # Keyset pagination walks (indexed_at, id) newest first; the
+            # filtered variants keep per-page cost flat for every /files
+            # filter, however rare its value.
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_files_indexed_at_id ON files(indexed_at DESC, id DESC);"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_files_company_indexed_at_id "
+                "ON files(company, indexed_at DESC, id DESC);"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_files_doc_type_indexed_at_id "
+                "ON files(doc_type, indexed_at DESC, id DESC);"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_files_year_indexed_at_id "
+                "ON files(year, indexed_at DESC, id DESC);"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_files_source_indexed_at_id "
+                "ON files(source, indexed_at DESC, id DESC);"
+            )
+            # Which search provider found what was downloaded, per company/doc type
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS provider_stats (
+                    company TEXT NOT NULL,
+                    doc_type TEXT NOT NULL,
+                    provider TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    wins INTEGER NOT NULL DEFAULT 0,
+                    updated_at INTEGER NOT NULL,
+                    PRIMARY KEY (company, doc_type, provider)
+                );
+                """
+            )
+            _init_sqlite_fts(conn)
         logger.info("SQLite database ready at %s", SQLITE_PATH)
     else:
         _get_supabase_client()
@@ -143,47 +489,47 @@ def init_database():
 
 
 def save_file_metadata(file_data: Dict) -> bool:
+    """
+    Catalog one file; returns whether the row was new. Unlike the bulk
+    variant, a failed write is raised after logging, so callers reporting
+    the file as stored can't miss it.
+    """
     doc = _normalize_metadata(file_data)
     try:
-        if DATABASE_BACKEND == "sqlite":
-            conn = _get_sqlite_conn()
-            with _sqlite_lock, conn:
-                cursor = conn.execute(
-                    """
-                    INSERT INTO files (
-                        company, doc_type, year, file_path, filename,
-                        url, sha256, mimetype, source, indexed_at, created_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ON CONFLICT(sha256) DO NOTHING;
-                    """,
-                    tuple(doc[field] for field in DB_FIELDS),
-                )
-                inserted = cursor.rowcount and cursor.rowcount > 0
-                if not inserted:
-                    logger.info(
-                        "File with sha256 %s already exists, skipping",
-                        doc["sha256"][:8],
-                    )
-                return inserted
-        else:
-            client = _get_supabase_client()
-            response = (
-                client.table(SUPABASE_TABLE)
-                .insert(doc)
-                .execute()
+        _ensure_backend()
+        # Includes waiting for the writer thread, i.e. what the caller feels
+        with timed(DB_WRITE_SECONDS, "save_file_metadata"):
+            inserted = _get_writer().submit(doc).result()
+        if not inserted:
+            logger.info(
+                "File with sha256 %s already catalogued for %s / %s / %s, skipping",
+                doc["sha256"][:8], doc["company"], doc["doc_type"], doc["year"],
             )
-            if getattr(response, "error", None):
-                raise RuntimeError(response.error)
-            return bool(response.data)
+        return inserted
     except Exception as exc:
         logger.error("Error saving file metadata: %s", exc, exc_info=True)
-        return False
+        raise
+
+
+def save_files_metadata(items: List[Dict]) -> List[bool]:
+    """Bulk variant of save_file_metadata; returns one "was new" flag per item."""
+    docs = [_normalize_metadata(item) for item in items]
+    if not docs:
+        return []
+    try:
+        _ensure_backend()
+        writer = _get_writer()
+        futures = [writer.submit(doc) for doc in docs]
+        return [future.result() for future in futures]
+    except Exception as exc:
+        logger.error("Error saving file metadata batch: %s", exc, exc_info=True)
+        return [False] * len(docs)
 
 
 def get_recent_files(limit: int = 100) -> List[Dict]:
     try:
         if DATABASE_BACKEND == "sqlite":
-            conn = _get_sqlite_conn()
+            conn = _get_sqlite_read_conn()
             cursor = conn.execute(
                 """
                 SELECT company, doc_type, year, file_path, filename,
@@ -195,17 +541,21 @@ def get_recent_files(limit: int = 100) -> List[Dict]:
                 (limit,),
             )
             return [dict(row) for row in cursor.fetchall()]
-        client = _get_supabase_client()
-        response = (
-            client.table(SUPABASE_TABLE)
-            .select("*")
-            .order("indexed_at", desc=True)
-            .limit(limit)
-            .execute()
-        )
-        if getattr(response, "error", None):
-            raise RuntimeError(response.error)
-        return response.data or []
+
+        def fetch() -> List[Dict]:
+            client = _get_supabase_client()
+            response = (
+                client.table(SUPABASE_TABLE)
+                .select("*")
+                .order("indexed_at", desc=True)
+                .limit(limit)
+                .execute()
+            )
+            if getattr(response, "error", None):
+                raise RuntimeError(response.error)
+            return response.data or []
+
+        return _cached_read(("recent", limit), fetch)
     except Exception as exc:
         logger.error("Error fetching recent files: %s", exc, exc_info=True)
         return []
@@ -227,7 +577,7 @@ def search_files(
 
     try:
         if DATABASE_BACKEND == "sqlite":
-            conn = _get_sqlite_conn()
+            conn = _get_sqlite_read_conn()
             where_clauses = []
             params: List[object] = []
             for key, value in filters.items():
@@ -250,19 +600,272 @@ def search_files(
             )
             return [dict(row) for row in cursor.fetchall()]
 
-        client = _get_supabase_client()
-        query = client.table(SUPABASE_TABLE).select("*")
-        for key, value in filters.items():
-            query = query.eq(key, value)
-        response = (
-            query.order("indexed_at", desc=True)
-            .limit(limit)
-            .execute()
-        )
-        if getattr(response, "error", None):
-            raise RuntimeError(response.error)
-        return response.data or []
+        def fetch() -> List[Dict]:
+            client = _get_supabase_client()
+            query = client.table(SUPABASE_TABLE).select("*")
+            for key, value in filters.items():
+                query = query.eq(key, value)
+            response = (
+                query.order("indexed_at", desc=True)
+                .limit(limit)
+                .execute()
+            )
+            if getattr(response, "error", None):
+                raise RuntimeError(response.error)
+            return response.data or []
+
+        return _cached_read(("search", tuple(sorted(filters.items())), limit), fetch)
     except Exception as exc:
         logger.error("Error searching files: %s", exc, exc_info=True)
         return []
 
+
+def list_files(
+    company: Optional[str] = None,
+    doc_type: Optional[str] = None,
+    year: Optional[int] = None,
+    source: Optional[str] = None,
+    limit: int = 100,
+    after: Optional[Tuple[int, int]] = None,
+) -> List[Dict]:
+    """
+    Page through the catalog newest first using keyset pagination.
+
+    `after` is the (indexed_at, id) of the last row of the previous page; rows
+    strictly older than it are returned, so every page costs one index seek
+    no matter how deep into the catalog it is.
+    """
+    filters: Dict = {}
+    if company:
+        filters["company"] = company
+    if doc_type:
+        filters["doc_type"] = doc_type
+    if year:
+        filters["year"] = year
+    if source:
+        filters["source"] = source
+
+    try:
+        if DATABASE_BACKEND == "sqlite":
+            conn = _get_sqlite_read_conn()
+            where_clauses = []
+            params: List[object] = []
+            for key, value in filters.items():
+                where_clauses.append(f"{key} = ?")
+                params.append(value)
+            if after is not None:
+                where_clauses.append("(indexed_at, id) < (?, ?)")
+                params.extend(after)
+            sql_where = ""
+            if where_clauses:
+                sql_where = "WHERE " + " AND ".join(where_clauses)
+            params.append(limit)
+            cursor = conn.execute(
+                f"""
+                SELECT id, company, doc_type, year, file_path, filename,
+                       url, sha256, mimetype, source, indexed_at, created_at
+                FROM files
+                {sql_where}
+                ORDER BY indexed_at DESC, id DESC
+                LIMIT ?;
+                """,
+                tuple(params),
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+        def fetch() -> List[Dict]:
+            client = _get_supabase_client()
+            query = client.table(SUPABASE_TABLE).select("*")
+            for key, value in filters.items():
+                query = query.eq(key, value)
+            if after is not None:
+                indexed_at, row_id = after
+                query = query.or_(
+                    f"indexed_at.lt.{int(indexed_at)},"
+                    f"and(indexed_at.eq.{int(indexed_at)},id.lt.{int(row_id)})"
+                )
+            response = (
+                query.order("indexed_at", desc=True)
+                .order("id", desc=True)
+                .limit(limit)
+                .execute()
+            )
+            if getattr(response, "error", None):
+                raise RuntimeError(response.error)
+            return response.data or []
+
+        key = ("list", tuple(sorted(filters.items())), limit, tuple(after) if after else None)
+        return _cached_read(key, fetch)
+    except Exception as exc:
+        logger.error("Error listing files: %s", exc, exc_info=True)
+        return []
+
+
+def has_document_text(sha256: str) -> bool:
+    """True once text extraction has been recorded for this file hash."""
+    if DATABASE_BACKEND != "sqlite":
+        return False
+    try:
+        conn = _get_sqlite_read_conn()
+        row = conn.execute("SELECT 1 FROM file_text WHERE sha256 = ?;", (sha256,)).fetchone()
+        return row is not None
+    except Exception as exc:
+        logger.error("Error checking document text: %s", exc, exc_info=True)
+        return False
+
+
+def save_document_text(sha256: str, text: str, pages: Optional[int] = None) -> bool:
+    """Index extracted text for the file with this hash (SQLite only)."""
+    if DATABASE_BACKEND != "sqlite":
+        logger.debug("Full-text indexing is only supported on the SQLite backend")
+        return False
+    try:
+        conn = _get_sqlite_conn()
+        with timed(DB_WRITE_SECONDS, "save_document_text"), _sqlite_lock, conn:
+            if conn.execute("SELECT 1 FROM files WHERE sha256 = ? LIMIT 1;", (sha256,)).fetchone() is None:
+                logger.warning("No catalog row for sha256 %s, text not indexed", sha256[:8])
+                return False
+            conn.execute(
+                """
+                INSERT INTO file_text (sha256, pages, chars, extracted_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(sha256) DO UPDATE SET
+                    pages = excluded.pages,
+                    chars = excluded.chars,
+                    extracted_at = excluded.extracted_at;
+                """,
+                (sha256, pages, len(text), int(datetime.utcnow().timestamp())),
+            )
+            if _fts_available:
+                text_id = conn.execute("SELECT id FROM file_text WHERE sha256 = ?;", (sha256,)).fetchone()[0]
+                conn.execute("DELETE FROM text_fts WHERE rowid = ?;", (text_id,))
+                conn.execute("INSERT INTO text_fts (rowid, body) VALUES (?, ?);", (text_id, text))
+        return True
+    except Exception as exc:
+        logger.error("Error saving document text: %s", exc, exc_info=True)
+        return False
+
+
+def _fts_query(q: str) -> str:
+    # Quote every term so user input can't trip FTS5 query syntax; terms are ANDed.
+    terms = [t.replace('"', '""') for t in q.split()]
+    return " ".join(f'"{t}"' for t in terms if t)
+
+
+def search_documents(q: str, limit: int = 20) -> List[Dict]:
+    """
+    Rank files by full-text match on their extracted text, one hit per file.
+    A file filed under several catalog rows shows its newest one.
+    """
+    match = _fts_query(q)
+    if not match:
+        return []
+    if DATABASE_BACKEND != "sqlite" or not _fts_available:
+        logger.warning("Document search requires the SQLite backend with FTS5")
+        return []
+    try:
+        conn = _get_sqlite_read_conn()
+        cursor = conn.execute(
+            """
+            SELECT f.id, f.company, f.doc_type, f.year, f.file_path, f.filename,
+                   f.url, f.sha256, f.mimetype, f.source, f.indexed_at, f.created_at,
+                   hit.snippet, hit.rank
+            FROM (
+                SELECT t.sha256,
+                       snippet(text_fts, 0, '[', ']', '…', 16) AS snippet,
+                       bm25(text_fts) AS rank
+                FROM text_fts
+                JOIN file_text t ON t.id = text_fts.rowid
+                WHERE text_fts MATCH ?
+                ORDER BY rank
+                LIMIT ?
+            ) hit
+            JOIN files f ON f.id = (SELECT MAX(id) FROM files WHERE sha256 = hit.sha256)
+            ORDER BY hit.rank;
+            """,
+            (match, limit),
+        )
+        return [dict(row) for row in cursor.fetchall()]
+    except Exception as exc:
+        logger.error("Error searching documents: %s", exc, exc_info=True)
+        return []
+
+
+def get_provider_stats(company: str, doc_type: str) -> Dict[str, Dict[str, int]]:
+    """Attempts and wins per search provider for one company/doc type."""
+    try:
+        if DATABASE_BACKEND == "sqlite":
+            conn = _get_sqlite_read_conn()
+            rows = conn.execute(
+                "SELECT provider, attempts, wins FROM provider_stats WHERE company = ? AND doc_type = ?;",
+                (company, doc_type),
+            ).fetchall()
+            rows = [dict(row) for row in rows]
+        else:
+            client = _get_supabase_client()
+            rows = (
+                client.table(SUPABASE_PROVIDER_STATS_TABLE)
+                .select("provider,attempts,wins")
+                .eq("company", company)
+                .eq("doc_type", doc_type)
+                .execute()
+                .data
+            ) or []
+        return {row["provider"]: {"attempts": row["attempts"], "wins": row["wins"]} for row in rows}
+    except Exception as exc:
+        logger.error("Error reading provider stats: %s", exc, exc_info=True)
+        return {}
+
+
+def record_provider_outcome(
+    company: str,
+    doc_type: str,
+    attempted: Iterable[str] = (),
+    won: Iterable[str] = (),
+) -> bool:
+    """Count a search attempt for each provider in `attempted` and a win for each in `won`."""
+    attempted, won = set(attempted), set(won)
+    providers = sorted(attempted | won)
+    if not providers:
+        return True
+    now = int(datetime.utcnow().timestamp())
+    rows = [(company, doc_type, p, int(p in attempted), int(p in won), now) for p in providers]
+    try:
+        if DATABASE_BACKEND == "sqlite":
+            conn = _get_sqlite_conn()
+            with timed(DB_WRITE_SECONDS, "record_provider_outcome"), _sqlite_lock, conn:
+                conn.executemany(
+                    """
+                    INSERT INTO provider_stats (company, doc_type, provider, attempts, wins, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(company, doc_type, provider) DO UPDATE SET
+                        attempts = attempts + excluded.attempts,
+                        wins = wins + excluded.wins,
+                        updated_at = excluded.updated_at;
+                    """,
+                    rows,
+                )
+        else:
+            # PostgREST can't increment in an upsert; these are routing hints, so
+            # a lost update between concurrent requests is acceptable
+            current = get_provider_stats(company, doc_type)
+            client = _get_supabase_client()
+            with timed(DB_WRITE_SECONDS, "record_provider_outcome"):
+                client.table(SUPABASE_PROVIDER_STATS_TABLE).upsert(
+                    [
+                        {
+                            "company": company,
+                            "doc_type": doc_type,
+                            "provider": provider,
+                            "attempts": current.get(provider, {}).get("attempts", 0) + attempts,
+                            "wins": current.get(provider, {}).get("wins", 0) + wins,
+                            "updated_at": updated_at,
+                        }
+                        for _, _, provider, attempts, wins, updated_at in rows
+                    ],
+                    on_conflict="company,doc_type,provider",
+                ).execute()
+        return True
+    except Exception as exc:
+        logger.error("Error recording provider stats: %s", exc, exc_info=True)
+        return False
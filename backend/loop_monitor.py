@@ -0,0 +1,104 @@
+"""
+Event-loop lag monitor.
+
+A heartbeat task sleeps LOOP_LAG_INTERVAL seconds at a time and records how
+late it wakes up in irfetcher_event_loop_lag_seconds; a late wake-up means
+something held the loop (sync SQLite, file writes, hashing a whole buffer).
+Wake-ups later than LOOP_BLOCK_THRESHOLD_MS also count as stalls.
+
+With LOOP_DEBUG set, a watchdog thread checks the heartbeat while the loop
+is blocked and logs the loop thread's stack. That stack runs through the
+coroutine step that is holding the loop, down to the blocking call.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from .config import LOOP_BLOCK_THRESHOLD_MS, LOOP_DEBUG, LOOP_LAG_INTERVAL
+from .metrics import LOOP_LAG_SECONDS, LOOP_STALLS
+
+logger = logging.getLogger(__name__)
+
+class LoopMonitor:
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL,
+                 threshold_ms: float = LOOP_BLOCK_THRESHOLD_MS, debug: bool = LOOP_DEBUG):
+        self.interval = interval
+        self.threshold = threshold_ms / 1000
+        self.debug = debug
+        self.max_lag = 0.0
+        self.samples = 0
+        self.stalls = 0
+        self._due = time.monotonic()
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Start sampling on the running loop."""
+        self._loop_thread = threading.get_ident()
+        self._due = time.monotonic() + self.interval
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        if self.debug:
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    async def _heartbeat(self):
+        while True:
+            self._due = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - self._due)
+            LOOP_LAG_SECONDS.observe(lag)
+            self.samples += 1
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.threshold:
+                self.stalls += 1
+                LOOP_STALLS.inc()
+
+    def _watch(self):
+        reported = None
+        while not self._stopped.wait(self.threshold / 2):
+            due = self._due
+            overdue = time.monotonic() - due
+            if overdue < self.threshold or reported == due:
+                continue
+            # One report per stall, taken while the loop is still stuck in it
+            reported = due
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is not None:
+                logger.warning(
+                    f"Event loop blocked for {overdue * 1000:.0f} ms; loop thread stack:\n"
+                    + "".join(traceback.format_stack(frame))
+                )
+
+_monitor: Optional[LoopMonitor] = None
+
+def start_loop_monitor() -> LoopMonitor:
+    global _monitor
+    if _monitor is None:
+        _monitor = LoopMonitor()
+        _monitor.start()
+    return _monitor
+
+async def stop_loop_monitor():
+    global _monitor
+    if _monitor is not None:
+        await _monitor.stop()
+        _monitor = None
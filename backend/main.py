@@ -1,14 +1,39 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+import base64
+import hashlib
+import json
 import logging
+from contextlib import asynccontextmanager
+from typing import Optional, Tuple
 from .models import DownloadRequest, DownloadResponse, ApiSettings
 from .pipeline import run_pipeline
 from .settings import load_settings_status, update_settings_env, SETTING_KEYS
+from .services.extraction_worker import extraction_stats, start_extraction_worker, stop_extraction_worker
+from .services.metadata import shutdown_metadata_writer
+from .database import list_files, search_documents, init_database
+from .loop_monitor import start_loop_monitor, stop_loop_monitor
+from .metrics import render_metrics
+from .util.breaker import breaker_states
+from .profiling import MEMORY_KEY_TYPES, admin_enabled, admin_token_ok, memory_diff, profile_pipeline, stop_memory_tracing
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
-app = FastAPI(title="IR Downloader", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing touches the database or spawns workers at import time, so cold
+    # starts (serverless, tests) only pay for it once the app actually serves.
+    init_database()
+    # Resumes whatever extraction work was queued before the last shutdown
+    start_extraction_worker()
+    start_loop_monitor()
+    yield
+    await stop_loop_monitor()
+    shutdown_metadata_writer()
+    stop_extraction_worker()
+
+app = FastAPI(title="IR Downloader", version="0.1.0", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -28,6 +53,9 @@ def root():
             "health": "/health",
             "download": "/download (POST)",
             "files": "/files",
+            "search": "/search?q=",
+            "metrics": "/metrics",
+            "breakers": "/breakers",
             "docs": "/docs"
         }
     }
@@ -36,21 +64,109 @@ def root():
 def health():
     return {"ok": True}
 
+@app.get("/breakers")
+def breakers():
+    """Circuit breaker state, error rate and slow rate for each provider."""
+    return breaker_states()
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus exposition of stage latencies and pipeline counters."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+def _require_admin(token: Optional[str]):
+    if not admin_enabled():
+        raise HTTPException(status_code=404, detail="Admin features are disabled (set ADMIN_TOKEN)")
+    if not admin_token_ok(token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
 @app.post("/download", response_model=DownloadResponse)
-async def download(req: DownloadRequest):
-    return await run_pipeline(req)
+async def download(
+    req: DownloadRequest,
+    x_profile: Optional[str] = Header(None),
+    profile: Optional[str] = Query(None, description="ADMIN_TOKEN; profiles this request"),
+):
+    token = x_profile or profile
+    if token is None:
+        return await run_pipeline(req)
+    _require_admin(token)
+    return await profile_pipeline(req)
+
+@app.post("/admin/tracemalloc")
+def tracemalloc_diff(
+    x_admin_token: Optional[str] = Header(None),
+    limit: int = Query(25, ge=1, le=500),
+    key_type: str = Query("lineno"),
+):
+    """
+    Allocation growth since the previous call. The first call starts
+    tracemalloc and takes the baseline.
+    """
+    _require_admin(x_admin_token)
+    if key_type not in MEMORY_KEY_TYPES:
+        raise HTTPException(status_code=400, detail=f"key_type must be one of {', '.join(MEMORY_KEY_TYPES)}")
+    return memory_diff(limit=limit, key_type=key_type)
 
-# handy: list recent files
-from .database import get_recent_files, init_database
+@app.delete("/admin/tracemalloc")
+def tracemalloc_stop(x_admin_token: Optional[str] = Header(None)):
+    _require_admin(x_admin_token)
+    return {"stopped": stop_memory_tracing()}
 
-# Initialize database on startup
-init_database()
+def _encode_cursor(row: dict) -> str:
+    raw = f"{row['indexed_at']}.{row['id']}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> Tuple[int, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        indexed_at, row_id = base64.urlsafe_b64decode(padded).decode().split(".")
+        return int(indexed_at), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @app.get("/files")
-def files():
-    """Get recent files from database."""
-    items = get_recent_files(limit=100)
-    return {"items": items}
+def files(
+    request: Request,
+    company: Optional[str] = None,
+    doc_type: Optional[str] = None,
+    year: Optional[int] = None,
+    source: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+):
+    """
+    Page through the file catalog, newest first.
+
+    Pass `next_cursor` from the previous page as `cursor` to continue. Pages
+    carry an ETag, and an unchanged page is answered with 304.
+    """
+    after = _decode_cursor(cursor) if cursor else None
+    items = list_files(
+        company=company, doc_type=doc_type, year=year, source=source,
+        limit=limit, after=after,
+    )
+    next_cursor = _encode_cursor(items[-1]) if len(items) == limit else None
+    # Rows are plain str/int values, so skip FastAPI's jsonable_encoder pass
+    body = json.dumps(
+        {"items": items, "next_cursor": next_cursor},
+        separators=(",", ":"),
+        ensure_ascii=False,
+    ).encode("utf-8")
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+@app.get("/search")
+def search(q: str = Query(..., min_length=1), limit: int = Query(20, ge=1, le=100)):
+    """Full-text search over extracted document text, best match first."""
+    return {"query": q, "items": search_documents(q, limit=limit)}
+
+@app.get("/search/stats")
+def search_stats():
+    """Text extraction queue depth and throughput (pages/second)."""
+    return extraction_stats()
 
 @app.get("/settings")
 def get_settings():
@@ -0,0 +1,133 @@
+"""
+Prometheus metrics, served by GET /metrics.
+
+Histograms time each pipeline stage, search provider, download and database
+write; counters track candidates per source, bytes downloaded, cache hits and
+provider errors. Everything lives on prometheus_client's default registry so
+the process/GC collectors come along for free.
+"""
+import time
+from contextlib import contextmanager
+from typing import Iterable
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily
+
+# Parse/filter steps are sub-millisecond; providers and downloads take seconds
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0, 160.0)
+
+STAGE_SECONDS = Histogram(
+    "irfetcher_stage_seconds",
+    "Time spent in each pipeline stage (parse, ticker, filter, probe).",
+    ["stage"],
+    buckets=FAST_BUCKETS + SLOW_BUCKETS[4:],
+)
+PROVIDER_SECONDS = Histogram(
+    "irfetcher_provider_seconds",
+    "Time for one search provider call (tavily, sec, ir).",
+    ["provider"],
+    buckets=SLOW_BUCKETS,
+)
+DOWNLOAD_SECONDS = Histogram(
+    "irfetcher_download_seconds",
+    "Time for one download_one call by outcome (ok, rejected, error).",
+    ["outcome"],
+    buckets=SLOW_BUCKETS,
+)
+DB_WRITE_SECONDS = Histogram(
+    "irfetcher_db_write_seconds",
+    "Time for a database write: a caller's save, a writer batch, or a text index.",
+    ["operation"],
+    buckets=FAST_BUCKETS + SLOW_BUCKETS[4:],
+)
+LOOP_LAG_SECONDS = Histogram(
+    "irfetcher_event_loop_lag_seconds",
+    "How late the loop monitor's heartbeat woke up; time the event loop was held by something else.",
+    buckets=FAST_BUCKETS + SLOW_BUCKETS[4:],
+)
+
+CANDIDATES = Counter(
+    "irfetcher_candidates_total",
+    "Search candidates per source: found by providers, filtered out "
+    "(company, doc type, probe), and accepted (downloaded).",
+    ["source", "stage"],
+)
+DOWNLOADED_BYTES = Counter(
+    "irfetcher_downloaded_bytes_total",
+    "Bytes of documents downloaded, per source.",
+    ["source"],
+)
+CACHE_HITS = Counter(
+    "irfetcher_cache_hits_total",
+    "Lookups answered from an in-process cache.",
+    ["cache"],
+)
+PROVIDER_ERRORS = Counter(
+    "irfetcher_provider_errors_total",
+    "Failed calls to search/lookup providers.",
+    ["provider"],
+)
+LOOP_STALLS = Counter(
+    "irfetcher_event_loop_stalls_total",
+    "Heartbeats late by more than LOOP_BLOCK_THRESHOLD_MS.",
+)
+BREAKER_REJECTIONS = Counter(
+    "irfetcher_breaker_rejections_total",
+    "Provider calls failed fast by an open circuit breaker.",
+    ["provider"],
+)
+HTTP_RETRIES = Counter(
+    "irfetcher_http_retries_total",
+    "GETs retried after a transient failure, by reason (status, connection, payload).",
+    ["reason"],
+)
+HEDGED_REQUESTS = Counter(
+    "irfetcher_hedged_requests_total",
+    "GETs that sent a second copy after a late first byte, by which copy answered first.",
+    ["winner"],
+)
+BREAKER_STATE = Gauge(
+    "irfetcher_breaker_state",
+    "Circuit breaker state per provider: 0 closed, 1 half-open, 2 open.",
+    ["provider"],
+)
+
+@contextmanager
+def timed(histogram: Histogram, *labels: str):
+    """Observe the duration of the block, including when it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(*labels).observe(time.perf_counter() - started)
+
+def count_candidates(stage: str, files: Iterable) -> None:
+    counts = {}
+    for f in files:
+        counts[f.source] = counts.get(f.source, 0) + 1
+    for source, n in counts.items():
+        CANDIDATES.labels(source, stage).inc(n)
+
+class _ParseCacheCollector:
+    """Reads the parser's lru_cache stats at scrape time instead of per call."""
+
+    def describe(self):
+        # Lets the registry check names without importing the parser
+        yield CounterMetricFamily("irfetcher_parse_cache_hits", "Prompts answered from the parse_prompt cache.")
+
+    def collect(self):
+        from .agents.parser import parse_cache_info
+
+        family = CounterMetricFamily(
+            "irfetcher_parse_cache_hits",
+            "Prompts answered from the parse_prompt cache.",
+        )
+        family.add_metric([], parse_cache_info()["hits"])
+        yield family
+
+REGISTRY.register(_ParseCacheCollector())
+
+def render_metrics():
+    """Exposition body and content type for the /metrics endpoint."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
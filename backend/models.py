@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict
 
 class DownloadRequest(BaseModel):
     prompt: str = Field(..., description="Natural language ask")
@@ -8,6 +8,8 @@ class DownloadRequest(BaseModel):
     company_hint: Optional[str] = None
     ticker: Optional[str] = None
     year_window: Optional[int] = None
+    debug_timings: bool = Field(False, description="Attach a span tree of where the time went")
+    deadline_ms: Optional[int] = Field(None, gt=0, description="Time budget; when it runs out, what was found so far is returned")
 
 class Intent(BaseModel):
     company: str
@@ -36,9 +38,25 @@ class DownloadedFile(BaseModel):
     mimetype: str
     source: str
 
+class TimingSpan(BaseModel):
+    name: str
+    start_ms: float                      # offset from the start of the request
+    duration_ms: float
+    attributes: Dict[str, Any] = Field(default_factory=dict)
+    children: List["TimingSpan"] = Field(default_factory=list)
+
+class YearCoverage(BaseModel):
+    doc_type: str
+    year: Optional[int]                  # None when no year was asked for
+    status: str                          # "downloaded", "not_found", "incomplete" (deadline reached first),
+                                         # or "not_saved" (downloaded, but its catalog write failed)
+
 class DownloadResponse(BaseModel):
     intent: Intent
     results: List[DownloadedFile]
+    coverage: List[YearCoverage] = Field(default_factory=list)
+    timings: Optional[TimingSpan] = None  # only with DownloadRequest.debug_timings
+    profile: Optional[str] = None         # saved cProfile output, only for profiled requests
 
 class ApiSettings(BaseModel):
     openai_api_key: Optional[str] = None
@@ -46,3 +64,15 @@ class ApiSettings(BaseModel):
     google_api_key: Optional[str] = None
     google_cse_id: Optional[str] = None
     default_provider: Optional[str] = None
+
+class ProbeResult(BaseModel):
+    url: str
+    ok: bool
+    status: Optional[int] = None
+    content_length: Optional[int] = None
+    mimetype: Optional[str] = None
+    kind: Optional[str] = None           # "pdf", "ole", "zip", "html" (see util.sniff)
+    accepts_ranges: bool = False
+    title: Optional[str] = None          # from the PDF /Info dictionary or XMP
+    created_year: Optional[int] = None
+    error: Optional[str] = None
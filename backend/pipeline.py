@@ -1,19 +1,31 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
+import asyncio
 from datetime import datetime
 import re
 import logging
 from copy import deepcopy
-from .models import DownloadRequest, DownloadResponse, FoundFile, DownloadedFile, Intent
+from .metrics import CACHE_HITS, STAGE_SECONDS, count_candidates, timed
+from .models import DownloadRequest, DownloadResponse, FoundFile, DownloadedFile, Intent, YearCoverage
+from .tracing import schedule_export, span, trace_request, tracing_requested
 from .agents.parser import parse_prompt
-from .agents.search_router import route_search
+from .agents.search_router import record_download_sources, route_search
 from .agents.validators import validate_found
-from .services.downloader import download_one
-from .services.metadata import write_metadata
+from .services.downloader import download_one, is_rejected
+from .services.metadata import write_metadata_async
+from .services.probe import rank_candidate_groups
 from .services.ticker import resolve_company_from_ticker
+from .util.deadline import Deadline, ends_with, expired
+from .util.singleflight import SingleFlight
 from .util.text import guess_year_from_title
 
 logger = logging.getLogger(__name__)
 
+# Candidates tried per target year before giving that year up
+MAX_ATTEMPTS_PER_SLOT = 3
+
+# Identical intents in flight at the same time share one search + download run
+_intent_flights = SingleFlight()
+
 def _years_from_window(window: int) -> List[int]:
     """Return a list of years representing the last `window` completed years."""
     current_year = datetime.utcnow().year - 1
@@ -64,37 +76,78 @@ def _matches_company(found: FoundFile, preferred: Optional[str], original: Optio
     # Require at least one significant token match
     return any(tok and len(tok) >= 3 and tok in hay_norm for tok in all_tokens)
 
+def _intent_key(req: DownloadRequest, intent: Intent) -> tuple:
+    """What makes two per-doc-type runs interchangeable: who, what, which years and period."""
+    if req.ticker:
+        who = ("ticker", req.ticker.strip().upper())
+    else:
+        who = ("company", _normalize(intent.company))
+    if req.year_window and req.year_window > 0:
+        years = tuple(_years_from_window(req.year_window))
+    else:
+        years = tuple(sorted(intent.years))
+    extras = intent.extras or {}
+    return who, intent.doc_type.lower(), years, extras.get("quarter"), extras.get("half")
+
 def _infer_year(f: FoundFile) -> Optional[int]:
     return f.year or guess_year_from_title(f.title) or guess_year_from_title(f.url)
 
-def _select_best_matches(files: List[FoundFile], years: List[int]) -> List[FoundFile]:
+def _candidate_groups(files: List[FoundFile], years: List[int]) -> List[List[FoundFile]]:
+    """
+    Group candidates into one slot per target year (or a single slot when no
+    year was asked for), best first. The head of each group is what gets
+    downloaded; the rest are fallbacks if that download fails or is rejected.
+    """
     if not files:
         return []
 
-    selected: List[FoundFile] = []
-    used = set()
-
     if years:
+        groups: List[List[FoundFile]] = []
         for target_year in years:
-            for idx, f in enumerate(files):
-                if idx in used:
-                    continue
-                y = _infer_year(f)
-                if y == target_year:
-                    selected.append(f)
-                    used.add(idx)
-                    break
-        return selected
+            group = [f for f in files if _infer_year(f) == target_year]
+            if group:
+                groups.append(group[:MAX_ATTEMPTS_PER_SLOT])
+        return groups
 
     # If no year specified, only return the top match
-    return files[:1]
+    return [files[:MAX_ATTEMPTS_PER_SLOT]]
+
+def _coverage(
+    doc_type: str, targets: List[Optional[int]], covered: set, cut: set, unsaved: Optional[set] = None,
+) -> List[YearCoverage]:
+    """
+    Per target year: downloaded, downloaded but not catalogued (in
+    `unsaved`), cut short by the deadline (in `cut`), or not found.
+    """
+    def status(year):
+        if year in covered:
+            return "downloaded"
+        if unsaved and year in unsaved:
+            return "not_saved"
+        if year in cut:
+            return "incomplete"
+        return "not_found"
+
+    return [YearCoverage(doc_type=doc_type, year=year, status=status(year)) for year in targets]
 
 async def run_pipeline(req: DownloadRequest) -> DownloadResponse:
-    base_intent = parse_prompt(req.prompt)
+    with trace_request("pipeline", tracing_requested(req.debug_timings), prompt=req.prompt) as root:
+        response = await _run_pipeline(req)
+    if root is not None:
+        if req.debug_timings:
+            response.timings = root.to_model()
+        schedule_export(root)
+    return response
+
+async def _run_pipeline(req: DownloadRequest) -> DownloadResponse:
+    with timed(STAGE_SECONDS, "parse"), span("parse"):
+        base_intent = parse_prompt(req.prompt)
     logger.info(f"Processing request: {req.prompt} -> {base_intent}")
 
     doc_types = base_intent.doc_types or [base_intent.doc_type]
+    deadline = Deadline.from_ms(req.deadline_ms)
     aggregated_results: List[DownloadedFile] = []
+    coverage: List[YearCoverage] = []
 
     for doc_type in doc_types:
         current_intent = Intent(
@@ -105,18 +158,36 @@ async def run_pipeline(req: DownloadRequest) -> DownloadResponse:
             doc_types=doc_types,
             extras=deepcopy(base_intent.extras),
         )
-        results = await _run_single_intent(req, current_intent)
+        key = _intent_key(req, current_intent)
+        with span("doc_type", doc_type=doc_type) as s:
+            # Only a run on (about) this request's deadline is joined. One that
+            # stops sooner would cut the results short, and one that runs
+            # longer would leave this request with nothing when its own time
+            # is up; either way this request runs on its own budget instead.
+            (results, years_coverage), shared = await _intent_flights.do(
+                key, lambda intent=current_intent: _run_single_intent(req, intent, deadline), deadline, ends_with,
+            )
+            if shared:
+                logger.info(f"Joined in-flight run for {current_intent.company} / {doc_type}")
+                CACHE_HITS.labels("inflight_intent").inc()
+            if s:
+                s.set(downloaded=len(results), coalesced=shared,
+                      incomplete=sum(c.status == "incomplete" for c in years_coverage))
         aggregated_results.extend(results)
+        coverage.extend(years_coverage)
 
     base_intent.doc_type = doc_types[0]
     base_intent.doc_types = doc_types
-    return DownloadResponse(intent=base_intent, results=aggregated_results)
+    return DownloadResponse(intent=base_intent, results=aggregated_results, coverage=coverage)
 
-async def _run_single_intent(req: DownloadRequest, intent: Intent) -> List[DownloadedFile]:
+async def _run_single_intent(
+    req: DownloadRequest, intent: Intent, deadline: Optional[Deadline] = None,
+) -> Tuple[List[DownloadedFile], List[YearCoverage]]:
     parsed_company = intent.company
 
     if req.ticker:
-        resolved_name = resolve_company_from_ticker(req.ticker)
+        with timed(STAGE_SECONDS, "ticker"), span("ticker", ticker=req.ticker):
+            resolved_name = resolve_company_from_ticker(req.ticker, deadline)
         intent.extras["ticker"] = req.ticker.upper()
         intent.extras["parsed_company"] = parsed_company
         if resolved_name:
@@ -131,38 +202,87 @@ async def _run_single_intent(req: DownloadRequest, intent: Intent) -> List[Downl
         logger.info(f"Applying year window ({req.year_window}): {target_years}")
 
     logger.info(f"Searching for {intent.company} / {intent.doc_type} / years {intent.years}")
-    found: List[FoundFile] = await route_search(intent)
+    with span("search", company=intent.company, years=",".join(map(str, intent.years))) as s:
+        found: List[FoundFile] = await route_search(intent, deadline)
+        if s:
+            s.set(candidates=len(found))
+    # Years missing from a search that ran out of time may still exist
+    search_cut = expired(deadline)
     logger.info(f"Found {len(found)} files for {intent.doc_type}")
 
-    ticker_code = intent.extras.get("ticker")
-    company_filtered = [
-        f for f in found
-        if _matches_company(f, intent.company, parsed_company, ticker_code)
-    ]
-    if req.ticker:
-        found = company_filtered
-        logger.info(f"Ticker provided; {len(found)} results match company/ticker filter")
-    elif company_filtered:
-        logger.info(f"Company filter retained {len(company_filtered)} results")
-        found = company_filtered
-    else:
-        logger.info("Company filter removed all results; using unfiltered list")
+    count_candidates("found", found)
+    all_found = found
 
-    filtered = [f for f in found if validate_found(f, intent.doc_type, intent.extras, intent.years)]
+    with timed(STAGE_SECONDS, "filter"), span("filter"):
+        ticker_code = intent.extras.get("ticker")
+        company_filtered = [
+            f for f in found
+            if _matches_company(f, intent.company, parsed_company, ticker_code)
+        ]
+        if req.ticker:
+            found = company_filtered
+            logger.info(f"Ticker provided; {len(found)} results match company/ticker filter")
+        elif company_filtered:
+            logger.info(f"Company filter retained {len(company_filtered)} results")
+            found = company_filtered
+        else:
+            logger.info("Company filter removed all results; using unfiltered list")
 
-    filtered = _select_best_matches(filtered, intent.years if intent.years else [])
+        filtered = [f for f in found if validate_found(f, intent.doc_type, intent.extras, intent.years)]
 
-    logger.info(f"Filtered to {len(filtered)} files for {intent.doc_type}")
+        groups = _candidate_groups(filtered, intent.years if intent.years else [])
+        group_years = [_infer_year(g[0]) if intent.years else None for g in groups]
+    with timed(STAGE_SECONDS, "probe"), span("probe", groups=len(groups)):
+        groups = await rank_candidate_groups(groups, group_years, deadline)
+
+    kept = {id(f) for group in groups for f in group}
+    count_candidates("filtered", [f for f in all_found if id(f) not in kept])
+
+    logger.info(f"Filtered to {len(groups)} files for {intent.doc_type}")
 
     results: List[DownloadedFile] = []
-    for f in filtered:
-        default_year = intent.years[0] if intent.years else None
-        df = await download_one(intent.company, intent.doc_type, (f.year or default_year), f)
-        if df:
-            write_metadata(df)
-            results.append(df)
-        else:
+    pending_writes = []
+    default_year = intent.years[0] if intent.years else None
+    targets = list(intent.years) or [None]
+    covered = set()
+    cut = set(targets) if search_cut else set()
+    for group in groups:
+        target = _infer_year(group[0]) if intent.years else None
+        for f in group:
+            if expired(deadline):
+                break
+            if is_rejected(f.url):
+                logger.info(f"Skipping previously rejected {f.url}")
+                CACHE_HITS.labels("rejected_url").inc()
+                continue
+            df = await download_one(intent.company, intent.doc_type, (f.year or default_year), f, deadline)
+            if df:
+                count_candidates("accepted", [f])
+                # Persist in the background while the next download runs
+                pending_writes.append((target, df, asyncio.ensure_future(write_metadata_async(df))))
+                results.append(df)
+                covered.add(target)
+                break
             logger.warning(f"Download failed for {f.url}")
+        if target not in covered and expired(deadline):
+            cut.add(target)
+
+    unsaved = set()
+    if pending_writes:
+        outcomes = await asyncio.gather(*(write for _, _, write in pending_writes), return_exceptions=True)
+        for (target, df, _), outcome in zip(pending_writes, outcomes):
+            if isinstance(outcome, Exception):
+                # Not in the catalog, so not reported as stored
+                logger.error(f"Could not save metadata for {df.file_path}: {outcome}")
+                results.remove(df)
+                covered.discard(target)
+                unsaved.add(target)
+    if results:
+        await record_download_sources(intent, [df.source for df in results])
 
+    coverage = _coverage(intent.doc_type, targets, covered, cut, unsaved)
+    incomplete = [c.year for c in coverage if c.status == "incomplete"]
+    if incomplete:
+        logger.warning(f"Deadline reached; {intent.doc_type} incomplete for {incomplete}")
     logger.info(f"Successfully downloaded {len(results)} files for {intent.doc_type}")
-    return results
+    return results, coverage
@@ -0,0 +1,118 @@
+"""
+On-demand profiling for a single request and tracemalloc snapshot diffs.
+
+A /download call carrying the admin token (`X-Profile` header or `profile`
+query parameter) runs its pipeline under cProfile. The run gets a private
+event loop on its own thread, so the profile holds that request and nothing
+else the server is doing. Work the pipeline hands to worker threads
+(provider calls, hashing, metadata writes) shows up as time spent waiting
+for it. The stats are written to PROFILE_DIR as `<id>.prof`, which pstats
+and snakeviz can open, plus `<id>.txt` with the top functions by cumulative
+time. The response names the .prof file.
+
+`memory_diff` backs POST /admin/tracemalloc. The first call starts
+tracemalloc and takes a baseline snapshot. Each later call diffs a new
+snapshot against the previous one and returns the allocation sites that
+grew, such as download buffers or candidate lists kept past their request.
+"""
+import asyncio
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from typing import Dict, List, Optional
+
+from .config import ADMIN_TOKEN, PROFILE_DIR, TRACEMALLOC_FRAMES
+from .models import DownloadRequest, DownloadResponse
+from .pipeline import run_pipeline
+
+SUMMARY_LINES = 60
+MEMORY_KEY_TYPES = ("lineno", "filename", "traceback")
+
+_snapshot: Optional[tracemalloc.Snapshot] = None
+_snapshot_lock = threading.Lock()
+
+def admin_enabled() -> bool:
+    return bool(ADMIN_TOKEN)
+
+def admin_token_ok(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+def _save_profile(profiler: cProfile.Profile, req: DownloadRequest, elapsed: float) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile_id = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:8]}"
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.prof")
+    profiler.dump_stats(path)
+
+    summary = io.StringIO()
+    summary.write(f"prompt: {req.prompt}\nwall: {elapsed:.3f}s\n\n")
+    pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(SUMMARY_LINES)
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.txt"), "w", encoding="utf-8") as f:
+        f.write(summary.getvalue())
+    return path
+
+def _run_profiled(req: DownloadRequest) -> DownloadResponse:
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        response = asyncio.run(run_pipeline(req))
+    finally:
+        profiler.disable()
+    response.profile = _save_profile(profiler, req, time.perf_counter() - started)
+    return response
+
+async def profile_pipeline(req: DownloadRequest) -> DownloadResponse:
+    """Run one pipeline under cProfile; `response.profile` is the saved .prof path."""
+    return await asyncio.to_thread(_run_profiled, req)
+
+def _take_snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+
+def memory_diff(limit: int = 25, key_type: str = "lineno") -> Dict:
+    """
+    Diff a fresh snapshot against the previous one, largest growth first.
+    Starts tracing (and returns an empty diff) when it isn't already on.
+    """
+    global _snapshot
+    with _snapshot_lock:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        current = _take_snapshot()
+        previous, _snapshot = _snapshot, current
+    stats = [] if started or previous is None else current.compare_to(previous, key_type)
+
+    entries: List[Dict] = []
+    for stat in stats[:limit]:
+        entry = {
+            "location": str(stat.traceback[0]),
+            "size_diff": stat.size_diff,
+            "size": stat.size,
+            "count_diff": stat.count_diff,
+            "count": stat.count,
+        }
+        if key_type == "traceback":
+            entry["traceback"] = stat.traceback.format()
+        entries.append(entry)
+    traced, peak = tracemalloc.get_traced_memory()
+    return {"started": started, "traced_bytes": traced, "peak_bytes": peak, "diff": entries}
+
+def stop_memory_tracing() -> bool:
+    """Stop tracemalloc and drop the baseline; False if it wasn't running."""
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
+        if not tracemalloc.is_tracing():
+            return False
+        tracemalloc.stop()
+    return True
@@ -1,38 +1,195 @@
 import os, hashlib, mimetypes
+import asyncio
 import logging
+import shutil
+import time
+import uuid
+from collections import OrderedDict
+from ..metrics import CACHE_HITS, DOWNLOAD_SECONDS, DOWNLOADED_BYTES
 from ..models import FoundFile, DownloadedFile
+from ..tracing import annotate, span
 from ..agents.naming import build_path
-from ..util.http import get_bytes
+from ..util.deadline import Deadline, budget, outlasts
+from ..util.http import canonical_url, with_retries
+from ..util.singleflight import SingleFlight
+from ..util.transfer import TIMEOUT, download_to_file, discard_partial, RejectedContent
+from ..util.sniff import KIND_MIMETYPES, sniff_kind
 from ..util.text import safe_name
 from ..config import DOWNLOAD_ROOT
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+MAX_REJECTED_URLS = 10000
+
+# URLs whose content turned out not to be a document; oldest entries roll off
+_rejected_urls: "OrderedDict[str, str]" = OrderedDict()
+
+# Transfers in flight by canonical URL: concurrent download_one calls for one
+# document share a single download and hash, then each files its own copy
+_transfers = SingleFlight()
+# Callers of each URL that haven't filed their copy yet; the last one
+# removes the URL's staged files
+_transfer_users: Dict[str, int] = {}
+# Finished transfers by canonical URL, each moved off its part file so that
+# a new transfer of the URL can't write into a file callers are filing from
+_staged: Dict[str, List[str]] = {}
+
 def _ext_from_mime(mt: Optional[str]) -> str:
     if not mt:
         return ".bin"
     guess = mimetypes.guess_extension(mt.split(";")[0].strip())
     return guess or ".bin"
 
-async def download_one(company: str, doc_type: str, year: Optional[int], f: FoundFile) -> Optional[DownloadedFile]:
+def mark_rejected(url: str, reason: str):
+    _rejected_urls[url] = reason
+    _rejected_urls.move_to_end(url)
+    while len(_rejected_urls) > MAX_REJECTED_URLS:
+        _rejected_urls.popitem(last=False)
+
+def is_rejected(url: str) -> bool:
+    return url in _rejected_urls
+
+def _resolve_mime(mime: Optional[str], data: bytes) -> Optional[str]:
+    # Servers often send PDFs as application/octet-stream; trust the bytes
+    kind = sniff_kind(data[:1024])
+    if kind in KIND_MIMETYPES:
+        base = (mime or "").split(";")[0].strip().lower()
+        if kind == "pdf" and base != "application/pdf":
+            return KIND_MIMETYPES[kind]
+        if not base or base in ("application/octet-stream", "binary/octet-stream"):
+            return KIND_MIMETYPES[kind]
+    return mime
+
+def partial_path_for(url: str) -> str:
+    """Where an in-progress download of `url` is staged until it completes."""
+    key = canonical_url(url)
+    return os.path.join(DOWNLOAD_ROOT, ".partial", hashlib.sha1(key.encode("utf-8")).hexdigest() + ".part")
+
+def _hash_and_sniff(path: str):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        head = f.read(1024)
+        digest.update(head)
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest(), head
+
+async def _fetch(url: str, part_path: str, deadline: Optional[Deadline]) -> Tuple[Optional[str], int, str, str]:
+    """
+    Download `url` to `part_path`, hash it and stage it for filing; the
+    shared half of download_one. Returns the mimetype, size, hash and the
+    staged file's path.
+    """
+    # Each retry resumes from what the failed attempt left in part_path
+    mime, size = await with_retries(
+        lambda: download_to_file(url, part_path, timeout=budget(deadline, TIMEOUT)),
+        deadline=deadline,
+    )
+    # Hash the combined file (resumed downloads arrive in pieces) off the loop
+    sha256, head = await asyncio.to_thread(_hash_and_sniff, part_path)
+    staged = f"{part_path}.{uuid.uuid4().hex[:8]}.staged"
+    os.replace(part_path, staged)
+    discard_partial(part_path)
+    key = canonical_url(url)
+    if _transfer_users.get(key):
+        _staged.setdefault(key, []).append(staged)
+    else:
+        os.remove(staged)  # every caller gave up waiting
+    return _resolve_mime(mime, head), size, sha256, staged
+
+def _file_copy(src: str, dst: str):
+    """Give `dst` the content of `src`, leaving `src` for the transfer's other callers."""
+    # Callers filing into the same path at once each need their own temp name
+    tmp = f"{dst}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)  # no hard links on this filesystem
+    os.replace(tmp, dst)
+
+async def download_one(
+    company: str, doc_type: str, year: Optional[int], f: FoundFile, deadline: Optional[Deadline] = None,
+) -> Optional[DownloadedFile]:
+    started = time.perf_counter()
+    outcome = "error"
+    with span("download", url=f.url, source=f.source) as s:
+        try:
+            df = await _download_one(company, doc_type, year, f, deadline)
+            if df is not None:
+                outcome = "ok"
+            elif is_rejected(f.url):
+                outcome = "rejected"
+            return df
+        finally:
+            elapsed = time.perf_counter() - started
+            DOWNLOAD_SECONDS.labels(outcome).observe(elapsed)
+            if s:
+                s.set(outcome=outcome)
+                if s.attributes.get("bytes") and elapsed > 0:
+                    s.set(mb_per_s=round(s.attributes["bytes"] / elapsed / 1e6, 3))
+
+async def _download_one(
+    company: str, doc_type: str, year: Optional[int], f: FoundFile, deadline: Optional[Deadline],
+) -> Optional[DownloadedFile]:
+    key = canonical_url(f.url)
+    part_path = partial_path_for(f.url)
+    # Only a transfer given at least as long as this call is joined
+    joining = _transfers.in_flight(key, deadline, outlasts)
+    # A transfer this call can't join (one stopping sooner, or a profiled
+    # request's on another loop) owns the part file
+    private = not joining and _transfers.held(key)
+    if private:
+        part_path = f"{part_path}.{uuid.uuid4().hex[:8]}"
+    _transfer_users[key] = _transfer_users.get(key, 0) + 1
     try:
         logger.info(f"Downloading {f.url} for {company} {doc_type} {year}")
-        data, mime = await get_bytes(f.url)
-        sha256 = hashlib.sha256(data).hexdigest()
+        flight = _transfers.do(key, lambda: _fetch(f.url, part_path, deadline), deadline, outlasts)
+        if deadline is not None and joining:
+            # A joined transfer may outlast this call
+            flight = asyncio.wait_for(flight, deadline.remaining())
+        (mime, size, sha256, staged), shared = await flight
         ext = _ext_from_mime(mime)
         folder, filename = build_path(company, doc_type, year, ext)
         out_dir = os.path.join(DOWNLOAD_ROOT, safe_name(company), safe_name(doc_type), str(year) if year else "unknown")
         os.makedirs(out_dir, exist_ok=True)
         out_path = os.path.join(out_dir, filename)
-        with open(out_path, "wb") as w:
-            w.write(data)
-        logger.info(f"Successfully downloaded to {out_path}")
+        await asyncio.to_thread(_file_copy, staged, out_path)
+        if shared:
+            logger.info(f"Shared in-flight download of {f.url} ({size} bytes) to {out_path}")
+            CACHE_HITS.labels("inflight_download").inc()
+        else:
+            logger.info(f"Successfully downloaded {size} bytes to {out_path}")
+            DOWNLOADED_BYTES.labels(f.source).inc(size)
+        annotate(bytes=size, shared=shared)
         return DownloadedFile(
             company=company, doc_type=doc_type, year=year,
             file_path=out_path, filename=filename, url=f.url,
             sha256=sha256, mimetype=mime or "", source=f.source
         )
+    except RejectedContent as e:
+        logger.info(f"Rejected {f.url}: {e}")
+        mark_rejected(f.url, str(e))
+        return None
+    except asyncio.TimeoutError:
+        kept = os.path.exists(part_path)
+        logger.warning(f"Timed out downloading {f.url}" + (" (partial file kept for resume)" if kept else ""))
+        return None
     except Exception as e:
-        logger.error(f"Failed to download {f.url}: {str(e)}", exc_info=True)
+        kept = os.path.exists(part_path)
+        logger.error(
+            f"Failed to download {f.url}: {str(e)}" + (" (partial file kept for resume)" if kept else ""),
+            exc_info=True,
+        )
         return None
+    finally:
+        if private:
+            discard_partial(part_path)
+        _transfer_users[key] -= 1
+        if not _transfer_users[key]:
+            del _transfer_users[key]
+            for staged in _staged.pop(key, []):
+                try:
+                    os.remove(staged)
+                except FileNotFoundError:
+                    pass
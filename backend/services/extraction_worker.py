@@ -0,0 +1,319 @@
+"""
+Background text extraction on a process pool.
+
+write_metadata enqueues each new file's sha256 into a small SQLite queue that
+lives next to the text cache, so pending work survives restarts. A dispatcher
+thread feeds queued hashes to a ProcessPoolExecutor; children write
+`<TEXT_CACHE_ROOT>/<sha[:2]>/<sha>.json` and the dispatcher indexes the
+cached text into the catalog. Hashes that already have a cache file are
+indexed from it without being parsed again.
+
+Run `python -m backend.services.extraction_worker` to drain the queue in the
+foreground and print pages/second for sizing EXTRACTION_WORKERS.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Set, Tuple
+from ..config import EXTRACTION_WORKERS, TEXT_CACHE_ROOT
+from ..database import has_document_text, save_document_text
+from ..metrics import CACHE_HITS
+from ..models import DownloadedFile
+from .extractor import extract_to_cache
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+POLL_SECONDS = 2.0
+
+_queue_conn: Optional[sqlite3.Connection] = None
+_queue_lock = threading.Lock()
+_worker: Optional["ExtractionWorker"] = None
+
+def cache_path_for(sha256: str) -> str:
+    return os.path.join(TEXT_CACHE_ROOT, sha256[:2], f"{sha256}.json")
+
+def _get_queue_conn() -> sqlite3.Connection:
+    global _queue_conn
+    if _queue_conn is not None:
+        return _queue_conn
+    with _queue_lock:
+        if _queue_conn is not None:
+            return _queue_conn
+        os.makedirs(TEXT_CACHE_ROOT, exist_ok=True)
+        conn = sqlite3.connect(os.path.join(TEXT_CACHE_ROOT, "queue.db"), check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        with conn:
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS extraction_queue (
+                    sha256 TEXT PRIMARY KEY,
+                    file_path TEXT NOT NULL,
+                    mimetype TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    enqueued_at INTEGER NOT NULL
+                );
+                """
+            )
+        # Published only once the schema exists; writer threads race to get here first
+        _queue_conn = conn
+    return _queue_conn
+
+def enqueue_extraction(df: DownloadedFile) -> bool:
+    """Queue a downloaded file for text extraction unless its hash is already indexed."""
+    if has_document_text(df.sha256):
+        return False
+    conn = _get_queue_conn()
+    with _queue_lock, conn:
+        cursor = conn.execute(
+            """
+            INSERT INTO extraction_queue (sha256, file_path, mimetype, enqueued_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(sha256) DO NOTHING;
+            """,
+            (df.sha256, df.file_path, df.mimetype, int(time.time())),
+        )
+    if _worker is not None:
+        _worker.notify()
+    return cursor.rowcount > 0
+
+def pending_count() -> int:
+    conn = _get_queue_conn()
+    with _queue_lock:
+        return conn.execute("SELECT COUNT(*) FROM extraction_queue;").fetchone()[0]
+
+def _claim(limit: int, exclude: Set[str]) -> List[sqlite3.Row]:
+    conn = _get_queue_conn()
+    with _queue_lock:
+        rows = conn.execute(
+            "SELECT sha256, file_path, mimetype, attempts FROM extraction_queue "
+            "ORDER BY enqueued_at LIMIT ?;",
+            (limit + len(exclude),),
+        ).fetchall()
+    return [row for row in rows if row["sha256"] not in exclude][:limit]
+
+def _dequeue(sha256: str):
+    conn = _get_queue_conn()
+    with _queue_lock, conn:
+        conn.execute("DELETE FROM extraction_queue WHERE sha256 = ?;", (sha256,))
+
+def _record_failure(sha256: str, attempts: int):
+    conn = _get_queue_conn()
+    with _queue_lock, conn:
+        if attempts + 1 >= MAX_ATTEMPTS:
+            conn.execute("DELETE FROM extraction_queue WHERE sha256 = ?;", (sha256,))
+        else:
+            conn.execute(
+                "UPDATE extraction_queue SET attempts = attempts + 1 WHERE sha256 = ?;",
+                (sha256,),
+            )
+
+def _index_from_cache(sha256: str) -> bool:
+    with open(cache_path_for(sha256), "r", encoding="utf-8") as f:
+        record = json.load(f)
+    return save_document_text(sha256, record.get("text") or "", record.get("pages"))
+
+class ExtractionWorker:
+    """Dispatcher thread that drains the extraction queue through a process pool."""
+
+    def __init__(self, workers: int = EXTRACTION_WORKERS):
+        self.workers = max(1, workers)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._in_flight: Dict[str, Tuple[sqlite3.Row, Future]] = {}
+        self._stats_lock = threading.Lock()
+        self._files = 0
+        self._pages = 0
+        self._failures = 0
+        self._cache_hits = 0
+        self._cpu_seconds = 0.0
+        self._busy_since: Optional[float] = None
+        self._busy_seconds = 0.0
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # spawn keeps children from inheriting the server's threads and sockets
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._pool = self._new_pool()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="extraction-dispatcher", daemon=True)
+        self._thread.start()
+        logger.info("Extraction worker started with %d processes", self.workers)
+
+    def stop(self, wait: bool = True):
+        """Stop dispatching; queued hashes stay queued for the next start."""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=not wait)
+            self._pool = None
+
+    def notify(self):
+        self._wake.set()
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Block until the queue is empty and nothing is in flight."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while pending_count() or self._in_flight:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            self._wake.set()
+            time.sleep(0.05)
+        return True
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            busy = self._busy_seconds
+            if self._busy_since is not None:
+                busy += time.monotonic() - self._busy_since
+            return {
+                "workers": self.workers,
+                "pending": pending_count(),
+                "in_flight": len(self._in_flight),
+                "files": self._files,
+                "pages": self._pages,
+                "cache_hits": self._cache_hits,
+                "failures": self._failures,
+                # Wall-clock rate while there was work, and the rate of a single
+                # process; their ratio shows how well the pool is using its cores.
+                "pages_per_second": round(self._pages / busy, 2) if busy else 0.0,
+                "pages_per_worker_second": round(self._pages / self._cpu_seconds, 2) if self._cpu_seconds else 0.0,
+            }
+
+    def _run(self):
+        # All queue/pool bookkeeping happens on this thread; pool callbacks
+        # only wake it up.
+        while not self._stopping.is_set():
+            try:
+                self._step()
+            except Exception:
+                # Claimed rows are still queued, so the next pass retries them
+                logger.exception("Extraction dispatcher pass failed")
+            self._wake.wait(POLL_SECONDS)
+            self._wake.clear()
+
+    def _step(self):
+        for sha256, (row, future) in list(self._in_flight.items()):
+            if future.done():
+                del self._in_flight[sha256]
+                self._complete(row, future)
+        free = self.workers * 2 - len(self._in_flight)
+        rows = _claim(free, set(self._in_flight)) if free > 0 else []
+        for row in rows:
+            self._dispatch(row)
+        self._update_busy()
+
+    def _replace_broken_pool(self):
+        """A child died (segfault, OOM kill) and took the pool with it; start a new one."""
+        logger.error("Extraction process pool broke; starting a new one")
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = self._new_pool()
+        # Rows left unsubmitted are still queued; pick them up without waiting a poll
+        self._wake.set()
+
+    def _dispatch(self, row: sqlite3.Row):
+        sha256 = row["sha256"]
+        if os.path.exists(cache_path_for(sha256)):
+            try:
+                _index_from_cache(sha256)
+                with self._stats_lock:
+                    self._cache_hits += 1
+                CACHE_HITS.labels("text").inc()
+                _dequeue(sha256)
+                return
+            except Exception as exc:
+                logger.warning("Unreadable text cache for %s, re-extracting: %s", sha256[:8], exc)
+        if not os.path.exists(row["file_path"]):
+            logger.warning("Dropping extraction for %s: %s is missing", sha256[:8], row["file_path"])
+            _dequeue(sha256)
+            return
+        try:
+            future = self._pool.submit(extract_to_cache, row["file_path"], row["mimetype"], cache_path_for(sha256))
+        except BrokenProcessPool:
+            self._replace_broken_pool()
+            return
+        self._in_flight[sha256] = (row, future)
+        future.add_done_callback(lambda _: self._wake.set())
+
+    def _complete(self, row: sqlite3.Row, future: Future):
+        sha256 = row["sha256"]
+        try:
+            summary = future.result()
+            _index_from_cache(sha256)
+            _dequeue(sha256)
+            with self._stats_lock:
+                self._files += 1
+                self._pages += summary["pages"]
+                self._cpu_seconds += summary["seconds"]
+        except Exception as exc:
+            logger.warning("Text extraction failed for %s: %s", row["file_path"], exc)
+            _record_failure(sha256, row["attempts"])
+            with self._stats_lock:
+                self._failures += 1
+
+    def _update_busy(self):
+        with self._stats_lock:
+            now = time.monotonic()
+            if self._in_flight and self._busy_since is None:
+                self._busy_since = now
+            elif not self._in_flight and self._busy_since is not None:
+                self._busy_seconds += now - self._busy_since
+                self._busy_since = None
+
+def start_extraction_worker(workers: int = EXTRACTION_WORKERS) -> ExtractionWorker:
+    global _worker
+    if _worker is None:
+        _worker = ExtractionWorker(workers)
+        _worker.start()
+    return _worker
+
+def stop_extraction_worker(wait: bool = True):
+    global _worker
+    if _worker is not None:
+        _worker.stop(wait=wait)
+        _worker = None
+
+def extraction_stats() -> Dict:
+    if _worker is None:
+        return {"running": False, "pending": pending_count()}
+    return {"running": _worker.running, **_worker.stats()}
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Drain the text extraction queue and report throughput.")
+    parser.add_argument("--workers", type=int, default=EXTRACTION_WORKERS)
+    args = parser.parse_args()
+
+    from ..database import init_database
+
+    init_database()
+    worker = start_extraction_worker(args.workers)
+    started = time.perf_counter()
+    worker.drain()
+    stats = worker.stats()
+    stop_extraction_worker()
+    print(json.dumps({**stats, "elapsed_seconds": round(time.perf_counter() - started, 2)}, indent=2))
@@ -0,0 +1,62 @@
+import json
+import logging
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TEXT_MIME_PREFIXES = ("text/plain", "text/csv")
+HTML_MIME_PREFIXES = ("text/html", "application/xhtml")
+
+def _extract_pdf(path: str) -> Tuple[str, int]:
+    import pdfplumber  # optional dependency, only needed once something is indexed
+
+    parts = []
+    with pdfplumber.open(path) as pdf:
+        for page in pdf.pages:
+            parts.append(page.extract_text() or "")
+            page.flush_cache()
+        return "\n".join(parts), len(pdf.pages)
+
+def _extract_html(path: str) -> Tuple[str, int]:
+    from bs4 import BeautifulSoup
+
+    with open(path, "rb") as f:
+        soup = BeautifulSoup(f.read(), "lxml")
+    return soup.get_text(" ", strip=True), 1
+
+def extract_text(file_path: str, mimetype: Optional[str] = None) -> Optional[Tuple[str, int]]:
+    """
+    Pull plain text and a page count out of a downloaded document.
+
+    Returns None for formats we don't extract (Office files, images, ...).
+    """
+    mt = (mimetype or "").lower()
+    ext = os.path.splitext(file_path)[1].lower()
+    if "pdf" in mt or ext == ".pdf":
+        return _extract_pdf(file_path)
+    if mt.startswith(HTML_MIME_PREFIXES) or ext in (".htm", ".html"):
+        return _extract_html(file_path)
+    if mt.startswith(TEXT_MIME_PREFIXES) or ext in (".txt", ".csv"):
+        with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read(), 1
+    return None
+
+def extract_to_cache(file_path: str, mimetype: Optional[str], cache_path: str) -> Dict:
+    """
+    Extract one file and write the result to `cache_path` as JSON.
+
+    Runs inside the extraction process pool, so the (possibly large) text goes
+    to disk rather than back through the pipe; only the summary is returned.
+    """
+    started = time.perf_counter()
+    extracted = extract_text(file_path, mimetype)
+    text, pages = extracted if extracted is not None else ("", 0)
+    record = {"pages": pages, "chars": len(text), "supported": extracted is not None, "text": text}
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(record, f, ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
+    return {"pages": pages, "chars": len(text), "seconds": time.perf_counter() - started}
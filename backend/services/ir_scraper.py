@@ -1,10 +1,11 @@
-from typing import List
+from typing import List, Optional
 from ..models import Intent, FoundFile
+from ..util.breaker import OPEN, breaker, guarded, provider_error
+from ..util.deadline import Deadline, budget, expired
 import requests
-from bs4 import BeautifulSoup
 import logging
 from ..util.text import guess_year_from_title
-from tavily import TavilyClient
+from .web_search import SEARCH_TIMEOUT, tavily_client
 import os
 
 logger = logging.getLogger(__name__)
@@ -21,16 +22,16 @@ def candidate_ir_urls(company: str):
         f"https://www.{base}.com/investors",
     ]
 
-def find_ir_pages_with_tavily(company: str) -> List[str]:
+def find_ir_pages_with_tavily(company: str, deadline: Optional[Deadline] = None) -> List[str]:
     """Use Tavily to find actual IR page URLs"""
     api_key = os.getenv("TAVILY_API_KEY")
-    if not api_key:
+    if not api_key or expired(deadline) or breaker("tavily").state == OPEN:
         return []
     
     try:
-        tv = TavilyClient(api_key=api_key)
+        tv = tavily_client(api_key)
         query = f'"{company}" investor relations site'
-        res = tv.search(query, max_results=5)
+        res = tv.search(query, max_results=5, timeout=budget(deadline, SEARCH_TIMEOUT))
         
         ir_urls = []
         for item in res.get("results", []):
@@ -41,21 +42,30 @@ def find_ir_pages_with_tavily(company: str) -> List[str]:
         return ir_urls[:5]
     except Exception as e:
         logger.error(f"Error finding IR pages with Tavily: {e}")
+        provider_error("tavily")
         return []
 
-def find_ir_documents(intent: Intent) -> List[FoundFile]:
+# Guessed IR hosts often don't exist, so page errors aren't held against
+# the provider; only slow calls trip its breaker
+@guarded("ir", fallback=list)
+def find_ir_documents(intent: Intent, deadline: Optional[Deadline] = None) -> List[FoundFile]:
+    from bs4 import BeautifulSoup
+
     titles = ["annual report", "10-k", "20-f", "investor presentation", "results", "financials", "quarterly", "earnings"]
     found = []
     
     # First, try to find IR pages using Tavily
-    tavily_ir_urls = find_ir_pages_with_tavily(intent.company)
+    tavily_ir_urls = find_ir_pages_with_tavily(intent.company, deadline)
     all_ir_urls = list(set(tavily_ir_urls + candidate_ir_urls(intent.company)))
     
     logger.info(f"Checking {len(all_ir_urls)} IR URLs for {intent.company}")
     
     for u in all_ir_urls:
+        if expired(deadline):
+            logger.info(f"Deadline reached; {intent.company} IR pages left unchecked")
+            break
         try:
-            html = requests.get(u, timeout=15, headers={"User-Agent": "Mozilla/5.0"}).text
+            html = requests.get(u, timeout=budget(deadline, 15), headers={"User-Agent": "Mozilla/5.0"}).text
             soup = BeautifulSoup(html, "lxml")
             
             # Look for PDF links
@@ -0,0 +1,216 @@
+"""
+Append-only metadata manifest.
+
+Every saved download is appended as one JSON line to a per-day segment,
+`<METADATA_ROOT>/<YYYY-MM-DD>.jsonl` (UTC day of `indexed_at`). Segments are
+only ever appended to, so writing a record costs one `write()` and the whole
+history can be replayed sequentially to rebuild the catalog. Finished days
+are gzip-compressed by `compact` when MANIFEST_COMPRESS is set; readers
+accept both forms.
+
+Run `python -m backend.services.manifest compact` to fold legacy per-file
+JSON sidecars into the manifest, and `... replay` to rebuild the database.
+"""
+import glob
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+from ..config import MANIFEST_COMPRESS, METADATA_ROOT
+
+logger = logging.getLogger(__name__)
+
+REPLAY_BATCH = 500
+
+_SEGMENT_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})\.jsonl(\.gz)?$")
+
+_lock = threading.Lock()
+_open_segment: Optional[Tuple[str, TextIO]] = None
+
+def _day(ts: Optional[int]) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(ts if ts is not None else time.time()))
+
+def segment_path(day: str, compressed: bool = False, root: Optional[str] = None) -> str:
+    return os.path.join(root or METADATA_ROOT, f"{day}.jsonl" + (".gz" if compressed else ""))
+
+def _encode(record: Dict) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+def append_record(record: Dict) -> str:
+    """Append one metadata record to today's segment and return its path."""
+    global _open_segment
+    line = _encode(record)
+    path = segment_path(_day(record.get("indexed_at")))
+    with _lock:
+        if _open_segment is None or _open_segment[0] != path:
+            close_manifest()
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            _open_segment = (path, open(path, "a", encoding="utf-8"))
+        out = _open_segment[1]
+        # One write per record keeps lines whole even if the process dies mid-batch
+        out.write(line)
+        out.flush()
+    return path
+
+def close_manifest():
+    """Close the cached segment handle; the next append reopens it."""
+    global _open_segment
+    if _open_segment is not None:
+        _open_segment[1].close()
+        _open_segment = None
+
+def list_segments(root: Optional[str] = None) -> List[str]:
+    """Segment paths in chronological order."""
+    root = root or METADATA_ROOT
+    if not os.path.isdir(root):
+        return []
+    segments = [name for name in os.listdir(root) if _SEGMENT_RE.match(name)]
+    # A day can briefly exist in both forms while compaction runs; read the gzip
+    segments.sort(key=lambda name: (_SEGMENT_RE.match(name).group(1), not name.endswith(".gz")))
+    seen, ordered = set(), []
+    for name in segments:
+        day = _SEGMENT_RE.match(name).group(1)
+        if day not in seen:
+            seen.add(day)
+            ordered.append(os.path.join(root, name))
+    return ordered
+
+def _open_segment_for_read(path: str) -> TextIO:
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+def iter_records(root: Optional[str] = None) -> Iterator[Dict]:
+    """Yield every record in the manifest, oldest segment first."""
+    for path in list_segments(root):
+        with _open_segment_for_read(path) as f:
+            for lineno, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash; everything before it is intact
+                    logger.warning("Skipping malformed manifest line %s:%d", path, lineno)
+
+def replay(root: Optional[str] = None, batch_size: int = REPLAY_BATCH) -> Dict[str, int]:
+    """Re-insert every manifest record into the catalog; entries already catalogued are skipped."""
+    from ..database import save_files_metadata
+
+    records = inserted = 0
+    batch: List[Dict] = []
+    for record in iter_records(root):
+        batch.append(record)
+        if len(batch) >= batch_size:
+            inserted += sum(save_files_metadata(batch))
+            records += len(batch)
+            batch = []
+    if batch:
+        inserted += sum(save_files_metadata(batch))
+        records += len(batch)
+    return {"records": records, "inserted": inserted}
+
+def _append_lines(path: str, lines: List[str]):
+    if path.endswith(".gz"):
+        # Concatenated gzip members read back as one stream
+        with gzip.open(path, "at", encoding="utf-8") as out:
+            out.writelines(lines)
+    else:
+        with open(path, "a", encoding="utf-8") as out:
+            out.writelines(lines)
+
+def compact(root: Optional[str] = None, compress: bool = MANIFEST_COMPRESS) -> Dict[str, int]:
+    """
+    Fold legacy `<name>.json` sidecars into the manifest and optionally
+    gzip finished segments.
+
+    Sidecars already in the manifest (same catalog key) are dropped; the rest
+    are appended to the segment for their `indexed_at` day. Each sidecar is
+    deleted only after its segment has been written and fsynced.
+    """
+    from ..database import catalog_key
+
+    root = root or METADATA_ROOT
+    known = {catalog_key(record) for record in iter_records(root)}
+    by_day: Dict[str, List[Tuple[str, Dict]]] = {}
+    stats = {"sidecars": 0, "folded": 0, "duplicates": 0, "unreadable": 0, "compressed": 0}
+
+    for path in sorted(glob.glob(os.path.join(root, "*.json"))):
+        stats["sidecars"] += 1
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError) as exc:
+            logger.warning("Leaving unreadable sidecar %s: %s", path, exc)
+            stats["unreadable"] += 1
+            continue
+        by_day.setdefault(_day(record.get("indexed_at")), []).append((path, record))
+
+    existing = {os.path.basename(p).split(".")[0]: p for p in list_segments(root)}
+    for day, entries in sorted(by_day.items()):
+        entries.sort(key=lambda entry: entry[1].get("indexed_at") or 0)
+        lines = []
+        for _, record in entries:
+            if catalog_key(record) in known:
+                stats["duplicates"] += 1
+                continue
+            known.add(catalog_key(record))
+            lines.append(_encode(record))
+        target = existing.get(day) or segment_path(day, root=root)
+        if lines:
+            with _lock:
+                if _open_segment is not None and _open_segment[0] == target:
+                    close_manifest()
+                _append_lines(target, lines)
+            with open(target, "rb") as f:
+                os.fsync(f.fileno())
+            stats["folded"] += len(lines)
+        for path, _ in entries:
+            os.remove(path)
+
+    if compress:
+        today = _day(None)
+        for path in list_segments(root):
+            day = os.path.basename(path).split(".")[0]
+            if path.endswith(".gz") or day >= today:
+                continue
+            gz_path = path + ".gz"
+            with open(path, "rb") as src, gzip.open(gz_path + ".tmp", "wb") as dst:
+                dst.writelines(src)
+            os.replace(gz_path + ".tmp", gz_path)
+            os.remove(path)
+            stats["compressed"] += 1
+    return stats
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Maintain the append-only metadata manifest.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_compact = sub.add_parser("compact", help="fold JSON sidecars into the manifest")
+    p_compact.add_argument("--root", default=METADATA_ROOT)
+    p_compact.add_argument("--compress", action="store_true", default=MANIFEST_COMPRESS,
+                           help="gzip segments for days before today")
+    p_replay = sub.add_parser("replay", help="rebuild the database from the manifest")
+    p_replay.add_argument("--root", default=METADATA_ROOT)
+    p_replay.add_argument("--batch", type=int, default=REPLAY_BATCH)
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        result = compact(args.root, compress=args.compress)
+    else:
+        from ..database import close_database, init_database
+
+        init_database()
+        started = time.perf_counter()
+        result = replay(args.root, batch_size=args.batch)
+        close_database()
+        elapsed = time.perf_counter() - started
+        result["seconds"] = round(elapsed, 2)
+        result["records_per_second"] = round(result["records"] / elapsed) if elapsed else 0
+    print(json.dumps(result, indent=2))
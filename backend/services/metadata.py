@@ -1,14 +1,21 @@
-import os, json, time
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 from ..models import DownloadedFile
-from ..config import METADATA_ROOT
-from ..util.text import safe_name
-from ..database import save_file_metadata, init_database
+from ..tracing import run_in_context, span
+from ..config import METADATA_WRITER_THREADS
+from ..database import save_file_metadata
+from .extraction_worker import enqueue_extraction
+from .manifest import append_record, close_manifest
 
-# Initialize database on import
-init_database()
+_writer_pool: Optional[ThreadPoolExecutor] = None
 
 def write_metadata(df: DownloadedFile):
-    """Write metadata to both database and JSON file (for backward compatibility)."""
+    """
+    Write metadata to the database and append it to the day's manifest
+    segment. Raises if the database write fails; nothing else is written then.
+    """
     metadata_dict = {
         "company": df.company,
         "doc_type": df.doc_type,
@@ -23,12 +30,42 @@ def write_metadata(df: DownloadedFile):
     }
     
     # Save to database (primary storage)
-    save_file_metadata(metadata_dict)
-    
-    # Also save to JSON file for backward compatibility
-    os.makedirs(METADATA_ROOT, exist_ok=True)
-    name = safe_name(df.company, df.doc_type, str(df.year) if df.year else "unknown", df.sha256[:8]) + ".json"
-    path = os.path.join(METADATA_ROOT, name)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(metadata_dict, f, indent=2)
+    with span("db_write", sha256=df.sha256[:12]) as s:
+        inserted = save_file_metadata(metadata_dict)
+        if s:
+            s.set(inserted=inserted)
+
+    # Append-only log the database can be rebuilt from
+    with span("manifest_append"):
+        path = append_record(metadata_dict)
+
+    # Text extraction picks this up from its persistent queue
+    enqueue_extraction(df)
     return path
+
+def _get_writer_pool() -> ThreadPoolExecutor:
+    global _writer_pool
+    if _writer_pool is None:
+        _writer_pool = ThreadPoolExecutor(
+            max_workers=METADATA_WRITER_THREADS,
+            thread_name_prefix="metadata-writer",
+        )
+    return _writer_pool
+
+async def write_metadata_async(df: DownloadedFile) -> str:
+    """
+    Persist metadata on the writer threads without blocking the event loop.
+
+    Resolves once the database row and manifest line are written, so awaiting
+    it confirms the record is durable; a failed write raises here.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_writer_pool(), run_in_context(write_metadata, df))
+
+def shutdown_metadata_writer():
+    """Wait for queued metadata writes to finish and release the writer threads."""
+    global _writer_pool
+    if _writer_pool is not None:
+        _writer_pool.shutdown(wait=True)
+        _writer_pool = None
+    close_manifest()
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+import aiohttp
+from ..config import PROBE_BYTES, PROBE_CANDIDATES, PROBE_TIMEOUT
+from ..models import FoundFile, ProbeResult
+from ..util.deadline import Deadline, budget, expired
+from ..util.http import content_total_length, get_range
+from ..util.sniff import pdf_info, sniff_kind
+from ..util.text import guess_year_from_title
+from .downloader import mark_rejected
+
+logger = logging.getLogger(__name__)
+
+# Anything smaller is almost certainly a cover letter or an error page
+MIN_DOCUMENT_BYTES = 20 * 1024
+# Past this size, prefer a comparable smaller candidate for the same year
+LARGE_DOCUMENT_BYTES = 150 * 1024 * 1024
+# Probing only reorders candidates, so it may spend at most this much of the time left
+PROBE_DEADLINE_SHARE = 0.25
+
+async def probe_candidate(s: aiohttp.ClientSession, f: FoundFile, timeout: float = PROBE_TIMEOUT) -> ProbeResult:
+    try:
+        status, headers, head = await get_range(s, f.url, PROBE_BYTES, timeout=timeout)
+    except Exception as exc:
+        return ProbeResult(url=f.url, ok=False, error=str(exc) or type(exc).__name__)
+    kind = sniff_kind(head)
+    content_type = headers.get("Content-Type")
+    if kind is None and content_type and content_type.lower().startswith("text/html"):
+        kind = "html"
+    info = pdf_info(head) if kind == "pdf" else {"title": None, "created_year": None}
+    return ProbeResult(
+        url=f.url,
+        ok=True,
+        status=status,
+        content_length=content_total_length(headers),
+        mimetype=content_type,
+        kind=kind,
+        accepts_ranges=status == 206 or headers.get("Accept-Ranges", "").lower() == "bytes",
+        title=info["title"],
+        created_year=int(info["created_year"]) if info["created_year"] else None,
+    )
+
+async def probe_candidates(files: List[FoundFile], timeout: float = PROBE_TIMEOUT) -> Dict[str, ProbeResult]:
+    """Probe all `files` concurrently over one session, keyed by URL."""
+    if not files:
+        return {}
+    async with aiohttp.ClientSession() as s:
+        results = await asyncio.gather(*(probe_candidate(s, f, timeout) for f in files))
+    return {r.url: r for r in results}
+
+def probe_score(f: FoundFile, probe: Optional[ProbeResult], target_year: Optional[int]) -> Optional[float]:
+    """
+    Search confidence adjusted by what the probe saw; None drops the candidate.
+    """
+    score = f.confidence
+    if probe is None:
+        return score
+    if not probe.ok:
+        return score - 0.5
+    if probe.kind == "html":
+        return None
+    if probe.kind == "pdf":
+        score += 0.1
+    if probe.content_length is not None:
+        if probe.content_length < MIN_DOCUMENT_BYTES:
+            score -= 0.2
+        elif probe.content_length > LARGE_DOCUMENT_BYTES:
+            score -= 0.15
+    if target_year:
+        title_year = guess_year_from_title(probe.title) if probe.title else None
+        if title_year == target_year:
+            score += 0.3
+        elif title_year:
+            score -= 0.3
+        # Reports are usually produced during or just after the fiscal year
+        if probe.created_year in (target_year, target_year + 1):
+            score += 0.1
+        elif probe.created_year and probe.created_year < target_year:
+            score -= 0.2
+    return score
+
+async def rank_candidate_groups(
+    groups: List[List[FoundFile]],
+    group_years: List[Optional[int]],
+    deadline: Optional[Deadline] = None,
+) -> List[List[FoundFile]]:
+    """
+    Probe the top candidates of every multi-candidate group concurrently and
+    reorder each group by probe-adjusted score. `group_years` holds the target
+    year of each group (None when no year was asked for). Groups of one are
+    left alone since there is nothing to choose between. Probes share what
+    is left of `deadline`; with nothing left the groups keep their order.
+    """
+    if PROBE_CANDIDATES <= 0 or expired(deadline):
+        return groups
+    to_probe = [f for group in groups if len(group) > 1 for f in group[:PROBE_CANDIDATES]]
+    probes = await probe_candidates(to_probe, budget(deadline, PROBE_TIMEOUT, PROBE_DEADLINE_SHARE))
+    if not probes:
+        return groups
+
+    ranked: List[List[FoundFile]] = []
+    for group, target_year in zip(groups, group_years):
+        scored = []
+        for position, f in enumerate(group):
+            score = probe_score(f, probes.get(f.url), target_year)
+            if score is None:
+                logger.info(f"Probe dropped {f.url}: not a document")
+                mark_rejected(f.url, "probe: HTML page")
+                continue
+            scored.append((-score, position, f))
+        scored.sort(key=lambda item: (item[0], item[1]))
+        ranked_group = [f for _, _, f in scored]
+        if ranked_group and ranked_group[0] is not group[0]:
+            logger.info(f"Probe re-ranked {ranked_group[0].url} ahead of {group[0].url}")
+        if ranked_group:
+            ranked.append(ranked_group)
+    return ranked
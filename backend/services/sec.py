@@ -1,5 +1,8 @@
-from typing import List
+from typing import List, Optional
+from ..config import SEC_BASE_URL
 from ..models import Intent, FoundFile
+from ..util.breaker import guarded, provider_error
+from ..util.deadline import Deadline, budget, expired
 from ..util.text import guess_year_from_title
 import requests
 
@@ -8,13 +11,17 @@ import requests
 
 UA = {"User-Agent": "IR-Downloader/1.0 contact@example.com"}
 
-def find_sec_documents(intent: Intent) -> List[FoundFile]:
+@guarded("sec", fallback=list)
+def find_sec_documents(intent: Intent, deadline: Optional[Deadline] = None) -> List[FoundFile]:
+    if expired(deadline):
+        return []
     # heuristic: search sec for company then look for 10-K or annual report filings via "full-text search" page.
     q = intent.company
     try:
-        search_url = f"https://www.sec.gov/cgi-bin/browse-edgar?company={q}&owner=exclude&action=getcompany"
-        r = requests.get(search_url, headers=UA, timeout=30)
+        search_url = f"{SEC_BASE_URL}/cgi-bin/browse-edgar?company={q}&owner=exclude&action=getcompany"
+        r = requests.get(search_url, headers=UA, timeout=budget(deadline, 30))
         if r.status_code != 200:
+            provider_error("sec")
             return []
         # naive scrape for 10-K document links (MVP); improve with edgar API later
         hits = []
@@ -26,7 +33,7 @@ def find_sec_documents(intent: Intent) -> List[FoundFile]:
                     if '"' in m:
                         url_parts = m.split('"')
                         if len(url_parts) > 1:
-                            url = "https://www.sec.gov" + url_parts[1]
+                            url = SEC_BASE_URL + url_parts[1]
                         else:
                             url = search_url
                     else:
@@ -37,4 +44,5 @@ def find_sec_documents(intent: Intent) -> List[FoundFile]:
                     continue
         return hits[:30]
     except Exception:
+        provider_error("sec")
         return []
@@ -3,6 +3,9 @@ from typing import Optional
 
 import requests
 
+from ..util.breaker import guarded, provider_error
+from ..util.deadline import Deadline, budget, expired
+
 logger = logging.getLogger(__name__)
 
 YAHOO_SEARCH_URL = "https://query1.finance.yahoo.com/v1/finance/search"
@@ -17,12 +20,13 @@ def _extract_name(quote: dict) -> Optional[str]:
     )
 
 
-def resolve_company_from_ticker(ticker: str) -> Optional[str]:
+@guarded("ticker", fallback=lambda: None)
+def resolve_company_from_ticker(ticker: str, deadline: Optional[Deadline] = None) -> Optional[str]:
     """
     Resolve a ticker (e.g., AAPL) to its company name using Yahoo Finance's public search endpoint.
     Falls back to None if the lookup fails.
     """
-    if not ticker:
+    if not ticker or expired(deadline):
         return None
 
     symbol = ticker.strip().upper()
@@ -33,7 +37,7 @@ def resolve_company_from_ticker(ticker: str) -> Optional[str]:
         resp = requests.get(
             YAHOO_SEARCH_URL,
             params={"q": symbol, "quotesCount": 10, "newsCount": 0, "lang": "en-US", "region": "US"},
-            timeout=5,
+            timeout=budget(deadline, 5),
             headers={"User-Agent": "IR-Downloader/1.0"},
         )
         resp.raise_for_status()
@@ -52,5 +56,6 @@ def resolve_company_from_ticker(ticker: str) -> Optional[str]:
                 return fallback
     except Exception as exc:
         logger.warning("Failed to resolve ticker %s: %s", symbol, exc)
+        provider_error("ticker")
     return None
 
@@ -1,61 +1,118 @@
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Set
+from ..agents.validators import validate_found
+from ..config import TAVILY_API_BASE_URL, TAVILY_QUERY_CONCURRENCY, YEAR_CONFIDENCE_THRESHOLD
 from ..models import Intent, FoundFile
-from tavily import TavilyClient
+from ..tracing import annotate, run_in_context, span
+from ..util.breaker import guarded, provider_error
+from ..util.deadline import Deadline, budget, expired
 import os
+import re
 import logging
 from ..util.text import guess_year_from_title
 
 logger = logging.getLogger(__name__)
 
-def web_find_documents(intent: Intent) -> List[FoundFile]:
+# The Tavily client's own default, per query
+SEARCH_TIMEOUT = 60
+
+def tavily_client(api_key: str):
+    from tavily import TavilyClient  # imported on first use to keep startup fast
+
+    if TAVILY_API_BASE_URL:
+        return TavilyClient(api_key=api_key, api_base_url=TAVILY_API_BASE_URL)
+    return TavilyClient(api_key=api_key)
+
+def _period_terms(extras) -> List[str]:
+    if extras.get("quarter"):
+        quarter = extras["quarter"]
+        return {
+            "Q1": ['"Q1"', '"first quarter"'],
+            "Q2": ['"Q2"', '"second quarter"'],
+            "Q3": ['"Q3"', '"third quarter"'],
+            "Q4": ['"Q4"', '"fourth quarter"'],
+        }.get(quarter, [f'"{quarter}"'])
+    if extras.get("half"):
+        half = extras["half"]
+        return {
+            "H1": ['"H1"', '"first half"', '"semi annual"'],
+            "H2": ['"H2"', '"second half"'],
+        }.get(half, [f'"{half}"'])
+    return []
+
+def _company_tokens(company: str) -> List[str]:
+    return [t for t in (re.sub(r"[^a-z0-9]", "", tok) for tok in company.lower().split()) if len(t) >= 3]
+
+class _YearPlan:
+    """
+    Which target years still lack a convincing candidate. A year counts as
+    covered once a result that names the company, passes validate_found and
+    scores at least YEAR_CONFIDENCE_THRESHOLD has been seen for it. Without
+    target years, one such result covers the request.
+    """
+
+    def __init__(self, intent: Intent):
+        self.intent = intent
+        self.tokens = _company_tokens(intent.company)
+        self.pending: Set[Optional[int]] = set(intent.years) if intent.years else {None}
+
+    @property
+    def done(self) -> bool:
+        return not self.pending
+
+    def observe(self, f: FoundFile, evidence_year: Optional[int]):
+        if f.confidence < YEAR_CONFIDENCE_THRESHOLD:
+            return
+        haystack = re.sub(r"[^a-z0-9]", "", f"{f.title} {f.url}".lower())
+        if self.tokens and not any(t in haystack for t in self.tokens):
+            return
+        if not validate_found(f, self.intent.doc_type, self.intent.extras, self.intent.years):
+            return
+        if self.intent.years:
+            self.pending.discard(evidence_year)
+        else:
+            self.pending.clear()
+
+def _search(tv, query: str, max_results: int, deadline: Optional[Deadline] = None) -> List[dict]:
+    if expired(deadline):
+        return []
+    try:
+        logger.info(f"Tavily search query: {query}")
+        with span("tavily_query", query=query):
+            res = tv.search(
+                query, max_results=max_results, search_depth="advanced",
+                timeout=budget(deadline, SEARCH_TIMEOUT),
+            )
+            annotate(results=len(res.get("results", [])))
+        return res.get("results", [])
+    except Exception as e:
+        logger.error(f"Tavily search error for query '{query}': {e}")
+        provider_error("tavily")
+        return []
+
+@guarded("tavily", fallback=list)
+def web_find_documents(intent: Intent, deadline: Optional[Deadline] = None) -> List[FoundFile]:
     api_key = os.getenv("TAVILY_API_KEY")
     if not api_key:
         logger.warning("TAVILY_API_KEY not found in environment variables")
         return []
     
     try:
-        tv = TavilyClient(api_key=api_key)
+        tv = tavily_client(api_key)
         
         # Build better search query for PDFs
         company = intent.company
         doc_type = intent.doc_type
         
-        period_terms = []
-        extras = intent.extras or {}
-        if extras.get("quarter"):
-            quarter = extras["quarter"]
-            period_terms = {
-                "Q1": ['"Q1"', '"first quarter"'],
-                "Q2": ['"Q2"', '"second quarter"'],
-                "Q3": ['"Q3"', '"third quarter"'],
-                "Q4": ['"Q4"', '"fourth quarter"'],
-            }.get(quarter, [f'"{quarter}"'])
-        elif extras.get("half"):
-            half = extras["half"]
-            period_terms = {
-                "H1": ['"H1"', '"first half"', '"semi annual"'],
-                "H2": ['"H2"', '"second half"'],
-            }.get(half, [f'"{half}"'])
-
+        period_terms = _period_terms(intent.extras or {})
         period_str = ""
         if period_terms:
             period_str = " " + " ".join(period_terms)
 
-        # If multiple years specified (year window), search more broadly
-        # Otherwise use specific year
-        if intent.years and len(intent.years) > 1:
-            # Year window: search without specific year to get broader results
-            year_str = ""
-            # Also add queries for each year in the window
-            year_queries = []
-            for year in intent.years[:3]:  # Limit to first 3 years to avoid too many queries
-                year_queries.extend([
-                    f'"{company}" "{doc_type}"{period_str} {year} filetype:pdf',
-                    f'"{company}" investor relations "{doc_type}"{period_str} {year} PDF',
-                ])
-        else:
-            year_str = f" {intent.years[0]}" if intent.years else ""
-            year_queries = []
+        window = bool(intent.years) and len(intent.years) > 1
+        # Year window: the generic queries go without a year to cover as many
+        # years as possible; years they miss get targeted queries afterwards
+        year_str = "" if window or not intent.years else f" {intent.years[0]}"
         
         # Multiple search strategies
         queries = [
@@ -68,59 +125,88 @@ def web_find_documents(intent: Intent) -> List[FoundFile]:
             # Generic search
             f'{company} {doc_type}{period_str}{year_str} PDF download',
         ]
-        
-        # Add year-specific queries if year window is used
-        queries.extend(year_queries)
+        # Tried in order for each year the generic queries left uncovered
+        year_templates = [
+            '"{company}" "{doc_type}"{period} {year} filetype:pdf',
+            '"{company}" investor relations "{doc_type}"{period} {year} PDF',
+        ]
         
         all_results = []
         seen_urls = set()
-        
-        for query in queries:
-            try:
-                logger.info(f"Tavily search query: {query}")
-                # Increase max_results when searching for year window to get more results
-                max_res = 20 if intent.years and len(intent.years) > 1 else 10
-                res = tv.search(query, max_results=max_res, search_depth="advanced")
+        plan = _YearPlan(intent)
+        # Increase max_results when searching for year window to get more results
+        max_res = 20 if window else 10
+
+        def collect(items: List[dict], default_year: Optional[int]):
+            for item in items:
+                url = item.get("url", "")
+                if not url or url in seen_urls:
+                    continue
+                seen_urls.add(url)
+                
+                # Prefer PDF URLs
+                is_pdf = url.lower().endswith('.pdf') or 'pdf' in url.lower()
+                title = item.get("title") or item.get("url", "")
+                content = item.get("content", "")
+                evidence_year = guess_year_from_title(title) or guess_year_from_title(url) or guess_year_from_title(content)
+                year = guess_year_from_title(title) or default_year
+                
+                # Extract year from content if available
+                if not year and content:
+                    year = guess_year_from_title(content)
+                
+                confidence = item.get("score", 0.5)
+                if is_pdf:
+                    confidence += 0.2  # Boost PDFs
                 
-                for item in res.get("results", []):
-                    url = item.get("url", "")
-                    if not url or url in seen_urls:
-                        continue
-                    seen_urls.add(url)
-                    
-                    # Prefer PDF URLs
-                    is_pdf = url.lower().endswith('.pdf') or 'pdf' in url.lower()
-                    title = item.get("title") or item.get("url", "")
-                    year = guess_year_from_title(title) or (intent.years[0] if intent.years else None)
-                    
-                    # Extract year from content if available
-                    content = item.get("content", "")
-                    if not year and content:
-                        year = guess_year_from_title(content)
-                    
-                    confidence = item.get("score", 0.5)
-                    if is_pdf:
-                        confidence += 0.2  # Boost PDFs
-                    
-                    all_results.append(FoundFile(
-                        url=url,
-                        title=title,
-                        year=year,
-                        mimetype="application/pdf" if is_pdf else None,
-                        source="Tavily",
-                        confidence=min(confidence, 1.0)
-                    ))
-            except Exception as e:
-                logger.error(f"Tavily search error for query '{query}': {e}")
-                continue
+                found = FoundFile(
+                    url=url,
+                    title=title,
+                    year=year,
+                    mimetype="application/pdf" if is_pdf else None,
+                    source="Tavily",
+                    confidence=min(confidence, 1.0)
+                )
+                all_results.append(found)
+                plan.observe(found, evidence_year)
+
+        default_year = intent.years[0] if intent.years else None
+        issued = 0
+        for query in queries:
+            if plan.done or expired(deadline):
+                break
+            pending = len(plan.pending)
+            collect(_search(tv, query, max_res, deadline), default_year)
+            issued += 1
+            if window and len(plan.pending) == pending:
+                # Broad queries have stopped turning up new years; target the rest
+                break
+
+        if window and not plan.done:
+            with ThreadPoolExecutor(max_workers=TAVILY_QUERY_CONCURRENCY) as pool:
+                for template in year_templates:
+                    years = sorted(y for y in plan.pending if y is not None)
+                    if not years or expired(deadline):
+                        break
+                    targeted = [
+                        template.format(company=company, doc_type=doc_type, period=period_str, year=year)
+                        for year in years
+                    ]
+                    # Copy the tracing context per query so spans land under this provider
+                    futures = [pool.submit(run_in_context(_search, tv, q, max_res, deadline)) for q in targeted]
+                    for year, future in zip(years, futures):
+                        collect(future.result(), year)
+                    issued += len(targeted)
+        annotate(queries=issued, years_unfound=len([y for y in plan.pending if y is not None]))
         
         # Sort by confidence and return top results
         all_results.sort(key=lambda x: x.confidence, reverse=True)
-        logger.info(f"Tavily found {len(all_results)} documents")
+        logger.info(f"Tavily found {len(all_results)} documents with {issued} queries")
         # Return more results when year window is used to ensure we have enough for all years
-        max_return = 50 if intent.years and len(intent.years) > 1 else 20
+        max_return = 50 if window else 20
         return all_results[:max_return]
         
     except Exception as e:
         logger.error(f"Tavily client error: {e}", exc_info=True)
+        provider_error("tavily")
         return []
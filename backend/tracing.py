@@ -0,0 +1,186 @@
+"""
+Per-request span trees.
+
+A request traced with `trace_request` collects nested `span`s: parse, each
+doc type, provider calls, Tavily queries, downloads and database writes.
+The current span lives in a ContextVar, so it follows tasks created with
+asyncio and work handed to threads with `asyncio.to_thread` or
+`run_in_context`. Outside a traced request `span` yields None and costs one
+ContextVar lookup.
+
+Finished trees are returned on DownloadResponse when `debug_timings` is set
+and, when TRACE_EXPORT_URL is configured, posted as OTLP/HTTP JSON to a
+trace collector.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+import aiohttp
+
+from .config import TRACE_EXPORT_URL
+from .models import TimingSpan
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "ir-fetcher"
+EXPORT_TIMEOUT = 5
+
+_pending_exports: Set["asyncio.Task"] = set()
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("irfetcher_span", default=None)
+
+class Span:
+    __slots__ = ("name", "attributes", "children", "start", "end", "span_id", "error")
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.attributes = attributes
+        self.children: List["Span"] = []
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.span_id = os.urandom(8).hex()
+        self.error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    def to_model(self, origin: Optional[float] = None) -> TimingSpan:
+        origin = self.start if origin is None else origin
+        attributes = dict(self.attributes)
+        if self.error:
+            attributes["error"] = self.error
+        return TimingSpan(
+            name=self.name,
+            start_ms=round((self.start - origin) * 1000, 3),
+            duration_ms=round(self.duration * 1000, 3),
+            attributes=attributes,
+            children=[child.to_model(origin) for child in self.children],
+        )
+
+class RootSpan(Span):
+    __slots__ = ("trace_id", "wall_start_ns")
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        super().__init__(name, attributes)
+        self.trace_id = os.urandom(16).hex()
+        self.wall_start_ns = time.time_ns()
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+def annotate(**attributes: Any):
+    """Attach attributes to the current span, if the request is traced."""
+    s = _current.get()
+    if s is not None:
+        s.attributes.update(attributes)
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    s = Span(name, attributes)
+    parent.children.append(s)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as exc:
+        s.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        s.end = time.perf_counter()
+        _current.reset(token)
+
+@contextmanager
+def trace_request(name: str, enabled: bool, **attributes: Any) -> Iterator[Optional[RootSpan]]:
+    """Start a span tree for one request; yields None when not enabled."""
+    if not enabled:
+        yield None
+        return
+    root = RootSpan(name, attributes)
+    token = _current.set(root)
+    try:
+        yield root
+    except BaseException as exc:
+        root.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        root.end = time.perf_counter()
+        _current.reset(token)
+
+def tracing_requested(debug_timings: bool) -> bool:
+    return debug_timings or bool(TRACE_EXPORT_URL)
+
+def run_in_context(fn: Callable, *args) -> Callable[[], Any]:
+    """Bind `fn` to the caller's context for loop.run_in_executor."""
+    ctx = contextvars.copy_context()
+    return lambda: ctx.run(fn, *args)
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def to_otlp(root: RootSpan) -> Dict[str, Any]:
+    """Encode a finished tree as an OTLP/HTTP JSON ExportTraceServiceRequest."""
+    spans = []
+
+    def visit(s: Span, parent_id: Optional[str]):
+        start_ns = root.wall_start_ns + int((s.start - root.start) * 1e9)
+        encoded = {
+            "traceId": root.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(start_ns),
+            "endTimeUnixNano": str(start_ns + int(s.duration * 1e9)),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items() if v is not None],
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if parent_id:
+            encoded["parentSpanId"] = parent_id
+        spans.append(encoded)
+        for child in s.children:
+            visit(child, s.span_id)
+
+    visit(root, None)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+        }]
+    }
+
+async def export_trace(root: RootSpan, url: str) -> bool:
+    """POST the tree to an OTLP/HTTP collector; failures are logged, never raised."""
+    try:
+        async with aiohttp.ClientSession() as s:
+            async with s.post(url, json=to_otlp(root), timeout=EXPORT_TIMEOUT) as r:
+                r.raise_for_status()
+        return True
+    except Exception as exc:
+        logger.warning("Trace export to %s failed: %s", url, exc)
+        return False
+
+def schedule_export(root: RootSpan) -> Optional["asyncio.Task"]:
+    """Export in the background so the response isn't held up by the collector."""
+    if not TRACE_EXPORT_URL:
+        return None
+    task = asyncio.ensure_future(export_trace(root, TRACE_EXPORT_URL))
+    # The loop only keeps weak references to tasks
+    _pending_exports.add(task)
+    task.add_done_callback(_pending_exports.discard)
+    return task
@@ -0,0 +1,209 @@
+"""
+Circuit breakers for the search and lookup providers.
+
+Each provider (tavily, sec, ir, ticker) has a breaker that watches the
+outcome and duration of its last BREAKER_WINDOW calls. Once enough of them
+failed or ran slow it opens, and calls fail fast for BREAKER_OPEN_SECONDS.
+After that it turns half-open: BREAKER_HALF_OPEN_CALLS trial calls go
+through and close it again if they all go well, or reopen it if one
+doesn't.
+"""
+import functools
+import logging
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Set
+
+from ..config import (
+    BREAKER_ERROR_RATE,
+    BREAKER_HALF_OPEN_CALLS,
+    BREAKER_MIN_CALLS,
+    BREAKER_OPEN_SECONDS,
+    BREAKER_SLOW_RATE,
+    BREAKER_WINDOW,
+)
+from ..metrics import BREAKER_REJECTIONS, BREAKER_STATE, PROVIDER_ERRORS
+from .deadline import Deadline, expired
+
+logger = logging.getLogger(__name__)
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# A call that takes longer than this counts against its provider's slow rate
+SLOW_CALL_SECONDS = {"tavily": 20.0, "sec": 10.0, "ir": 45.0, "ticker": 3.0}
+
+# Providers that reported an error during the guarded call running in this context
+_call_errors: ContextVar[Optional[Set[str]]] = ContextVar("breaker_call_errors", default=None)
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        slow_seconds: float,
+        window: int = BREAKER_WINDOW,
+        min_calls: int = BREAKER_MIN_CALLS,
+        error_rate: float = BREAKER_ERROR_RATE,
+        slow_rate: float = BREAKER_SLOW_RATE,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+        half_open_calls: int = BREAKER_HALF_OPEN_CALLS,
+    ):
+        self.name = name
+        self.slow_seconds = slow_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.rejected = 0
+        # (failed, slow) per call, newest last
+        self._outcomes: "deque[tuple]" = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trials = 0
+        self._trial_successes = 0
+        # Providers run in worker threads
+        self._lock = threading.Lock()
+        BREAKER_STATE.labels(name).set(0)
+
+    def _cooled_down(self) -> bool:
+        return time.monotonic() - self._opened_at >= self.open_seconds
+
+    @property
+    def state(self) -> str:
+        """Current state; an open breaker past its cool-down reads as half-open."""
+        with self._lock:
+            if self._state == OPEN and self._cooled_down():
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead. A True from a half-open breaker is a trial."""
+        with self._lock:
+            if self._state == OPEN and self._cooled_down():
+                self._transition(HALF_OPEN)
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._trials < self.half_open_calls:
+                self._trials += 1
+                return True
+            self.rejected += 1
+        BREAKER_REJECTIONS.labels(self.name).inc()
+        return False
+
+    def record(self, failed: bool, seconds: float):
+        """Outcome of a call that allow() let through."""
+        slow = seconds >= self.slow_seconds
+        with self._lock:
+            if self._state == HALF_OPEN:
+                if failed or slow:
+                    self._transition(OPEN)
+                else:
+                    self._trial_successes += 1
+                    if self._trial_successes >= self.half_open_calls:
+                        self._transition(CLOSED)
+                return
+            if self._state == OPEN:
+                return  # started before the breaker opened
+            self._outcomes.append((failed, slow))
+            calls = len(self._outcomes)
+            if calls < self.min_calls:
+                return
+            errors = sum(1 for f, _ in self._outcomes if f) / calls
+            slows = sum(1 for _, s in self._outcomes if s) / calls
+            if errors >= self.error_rate or slows >= self.slow_rate:
+                logger.warning(
+                    f"{self.name} circuit opened: {errors:.0%} errors, {slows:.0%} slow over {calls} calls"
+                )
+                self._transition(OPEN)
+
+    def release(self):
+        """A call that allow() let through ended without a verdict on the provider."""
+        with self._lock:
+            if self._state == HALF_OPEN and self._trials > 0:
+                self._trials -= 1
+
+    def _transition(self, state: str):
+        if state != OPEN:
+            logger.info(f"{self.name} circuit {state.replace('_', '-')}")
+        self._state = state
+        self._outcomes.clear()
+        self._trials = 0
+        self._trial_successes = 0
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        BREAKER_STATE.labels(self.name).set(_STATE_VALUES[state])
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = len(self._outcomes)
+            state, retry_in = self._state, None
+            if state == OPEN:
+                left = self.open_seconds - (time.monotonic() - self._opened_at)
+                if left > 0:
+                    retry_in = round(left, 1)
+                else:
+                    state = HALF_OPEN
+            return {
+                "state": state,
+                "calls": calls,
+                "error_rate": round(sum(1 for f, _ in self._outcomes if f) / calls, 3) if calls else 0.0,
+                "slow_rate": round(sum(1 for _, s in self._outcomes if s) / calls, 3) if calls else 0.0,
+                "slow_seconds": self.slow_seconds,
+                "retry_in": retry_in,
+                "rejected": self.rejected,
+            }
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def breaker(name: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, SLOW_CALL_SECONDS.get(name, 10.0))
+        return _breakers[name]
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    """Snapshot of every provider's breaker, for the API."""
+    return {name: breaker(name).snapshot() for name in sorted(set(SLOW_CALL_SECONDS) | set(_breakers))}
+
+def provider_error(name: str):
+    """Count a failed upstream request and mark the guarded call it happened in as failed."""
+    PROVIDER_ERRORS.labels(name).inc()
+    errors = _call_errors.get()
+    if errors is not None:
+        errors.add(name)
+
+def guarded(name: str, fallback: Callable[[], Any]):
+    """
+    Route calls to the decorated provider function through `name`'s breaker;
+    while it is open, `fallback()` is returned straight away. A call fails if
+    it raises or reports provider_error(name). Calls whose Deadline argument
+    ran out say nothing about the provider and are not counted.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            b = breaker(name)
+            if not b.allow():
+                logger.info(f"{name} circuit open; skipping call")
+                return fallback()
+            deadline = kwargs.get("deadline") or next((a for a in args if isinstance(a, Deadline)), None)
+            errors: Set[str] = set()
+            token = _call_errors.set(errors)
+            started = time.monotonic()
+            failed = True
+            try:
+                result = fn(*args, **kwargs)
+                failed = name in errors
+                return result
+            finally:
+                _call_errors.reset(token)
+                if expired(deadline):
+                    b.release()
+                else:
+                    b.record(failed, time.monotonic() - started)
+        return wrapper
+    return decorate
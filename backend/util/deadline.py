@@ -0,0 +1,52 @@
+"""
+Request deadlines. A Deadline is made once per request from
+DownloadRequest.deadline_ms and handed down to every stage; each stage
+cuts its usual timeouts down to what is left with `budget`.
+"""
+import time
+from typing import Optional
+
+# Smallest timeout handed to a client; HTTP libraries reject zero
+MIN_TIMEOUT = 0.01
+# How much sooner than a caller's deadline a run it joins may stop
+JOIN_SLACK = 0.1
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def from_ms(cls, ms: Optional[int]) -> Optional["Deadline"]:
+        return cls(ms / 1000) if ms else None
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+def budget(deadline: Optional[Deadline], default: float, share: float = 1.0) -> float:
+    """
+    A stage's `default` timeout in seconds, capped by `share` of what is
+    left of `deadline`. Optional stages take a share so that the stages
+    after them still get time.
+    """
+    if deadline is None:
+        return default
+    return max(MIN_TIMEOUT, min(default, deadline.remaining() * share))
+
+def expired(deadline: Optional[Deadline]) -> bool:
+    return deadline is not None and deadline.remaining() <= 0
+
+def outlasts(deadline: Optional[Deadline], other: Optional[Deadline]) -> bool:
+    """Whether `deadline` ends no earlier than `other`; no deadline never ends."""
+    if deadline is None:
+        return True
+    return other is not None and deadline.expires_at >= other.expires_at
+
+def ends_with(deadline: Optional[Deadline], other: Optional[Deadline], slack: float = JOIN_SLACK) -> bool:
+    """
+    Whether a run on `deadline` can stand in for one on `other`: it stops
+    no later, so joining it never waits past `other`, and at most `slack`
+    seconds sooner, so it doesn't cut the results much shorter.
+    """
+    if deadline is None or other is None:
+        return deadline is other
+    return 0 <= other.expires_at - deadline.expires_at <= slack
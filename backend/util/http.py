@@ -1,15 +1,219 @@
 import aiohttp
-from typing import Optional, Dict, Any
+import asyncio
+import logging
+import random
+import re
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from ..config import HEDGE_MIN_SAMPLES, HEDGE_PERCENTILE, RETRY_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY
+from ..metrics import HEDGED_REQUESTS, HTTP_RETRIES
+from .deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Query parameters that only track the click, never select the document
+TRACKING_PARAM_PREFIXES = ("utm_", "gclid", "fbclid", "mc_cid", "mc_eid")
+
+# Statuses worth asking again for; anything else won't change on a retry
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+# Recent times to first byte (response headers) across hosts, for hedging
+_first_byte_seconds: "deque[float]" = deque(maxlen=500)
+
+def retry_after_seconds(headers) -> Optional[float]:
+    """Retry-After as seconds from now, from either delta-seconds or an HTTP date."""
+    value = (headers or {}).get("Retry-After")
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    Seconds to wait before retry number `attempt` (0-based): the server's
+    Retry-After when it sent one, else exponential backoff with full jitter.
+    Either way at most RETRY_MAX_DELAY.
+    """
+    if retry_after is not None:
+        return min(retry_after, RETRY_MAX_DELAY)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+def _retry_reason(exc: BaseException) -> Optional[str]:
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return f"status_{exc.status}" if exc.status in RETRY_STATUSES else None
+    if isinstance(exc, TimeoutError):
+        return None  # the request already had its whole timeout
+    if isinstance(exc, aiohttp.ClientConnectionError):
+        return "connection"
+    if isinstance(exc, aiohttp.ClientPayloadError):
+        return "payload"
+    return None
+
+async def with_retries(
+    call: Callable[[], Awaitable[T]],
+    attempts: Optional[int] = None,
+    deadline: Optional[Deadline] = None,
+) -> T:
+    """
+    Await `call()` until it succeeds, retrying transient failures (resets,
+    truncated bodies, 429/5xx) with backoff_delay, up to `attempts` tries
+    (RETRY_ATTEMPTS by default). Only for idempotent requests. Gives up
+    early rather than sleep past `deadline`.
+    """
+    for attempt in range((attempts or RETRY_ATTEMPTS) - 1):
+        try:
+            return await call()
+        except Exception as exc:
+            reason = _retry_reason(exc)
+            if reason is None:
+                raise
+            headers = getattr(exc, "headers", None) if isinstance(exc, aiohttp.ClientResponseError) else None
+            delay = backoff_delay(attempt, retry_after_seconds(headers))
+            if deadline is not None and delay >= deadline.remaining():
+                raise
+            logger.info(f"Retrying in {delay:.2f}s after {reason}: {exc}")
+            HTTP_RETRIES.labels(reason.split("_")[0]).inc()
+            await asyncio.sleep(delay)
+    return await call()
+
+def hedge_delay() -> Optional[float]:
+    """
+    How long to wait for a response before sending a second copy of the
+    request: the HEDGE_PERCENTILE of recent times to first byte. None while
+    hedging is off or too few times have been seen.
+    """
+    if HEDGE_PERCENTILE <= 0 or len(_first_byte_seconds) < HEDGE_MIN_SAMPLES:
+        return None
+    ordered = sorted(_first_byte_seconds)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * HEDGE_PERCENTILE / 100))]
+
+async def hedged_get(
+    s: aiohttp.ClientSession,
+    url: str,
+    headers: Optional[Dict[str, str]] = None,
+    hedge_after: Optional[float] = None,
+) -> aiohttp.ClientResponse:
+    """
+    GET `url` and return the response once its headers have arrived. If
+    they haven't after `hedge_after` seconds, an identical second request is
+    started; whichever answers first is returned and the other is cancelled.
+    Only for idempotent requests.
+    """
+    async def attempt() -> aiohttp.ClientResponse:
+        started = time.monotonic()
+        try:
+            resp = await s.get(url, headers=headers)
+        except asyncio.CancelledError:
+            # The loser of a hedge: its first byte would have come later than
+            # this, and leaving it out would make the samples look fast
+            _first_byte_seconds.append(time.monotonic() - started)
+            raise
+        _first_byte_seconds.append(time.monotonic() - started)
+        return resp
+
+    if hedge_after is None:
+        return await attempt()
+    primary = asyncio.ensure_future(attempt())
+    done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+    if done:
+        return primary.result()
+
+    hedge = asyncio.ensure_future(attempt())
+    pending = {primary, hedge}
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    HEDGED_REQUESTS.labels("hedge" if task is hedge else "primary").inc()
+                    return task.result()
+                error = error or task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+        # A loser that got its response anyway still holds a connection
+        for result in await asyncio.gather(*pending, return_exceptions=True):
+            if isinstance(result, aiohttp.ClientResponse):
+                result.close()
 
 async def get_json(url: str, headers: Optional[Dict[str, str]] = None, params: Optional[Dict[str, Any]] = None):
-    async with aiohttp.ClientSession() as s:
-        async with s.get(url, headers=headers, params=params, timeout=60) as r:
-            r.raise_for_status()
-            return await r.json()
+    async def attempt():
+        async with aiohttp.ClientSession() as s:
+            async with s.get(url, headers=headers, params=params, timeout=60) as r:
+                r.raise_for_status()
+                return await r.json()
+
+    return await with_retries(attempt)
 
 async def get_bytes(url: str, headers: Optional[Dict[str, str]] = None):
-    async with aiohttp.ClientSession() as s:
-        async with s.get(url, headers=headers, timeout=180) as r:
-            r.raise_for_status()
-            data = await r.read()
-            return data, r.headers.get("Content-Type")
+    async def attempt():
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=180)) as s:
+            async with await hedged_get(s, url, headers, hedge_delay()) as r:
+                r.raise_for_status()
+                data = await r.read()
+                return data, r.headers.get("Content-Type")
+
+    return await with_retries(attempt)
+
+def canonical_url(url: str) -> str:
+    """
+    One spelling per resource: lower-case scheme and host, no default port
+    or fragment, tracking parameters dropped and the rest sorted.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    netloc = host if port is None or (scheme, port) in (("http", 80), ("https", 443)) else f"{host}:{port}"
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(TRACKING_PARAM_PREFIXES)
+    ))
+    return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
+
+def content_total_length(headers) -> Optional[int]:
+    """Full entity size from Content-Range (for 206s) or Content-Length."""
+    content_range = headers.get("Content-Range")
+    if content_range:
+        m = re.search(r"/(\d+)\s*$", content_range)
+        if m:
+            return int(m.group(1))
+    length = headers.get("Content-Length")
+    return int(length) if length and length.isdigit() else None
+
+async def get_range(s: aiohttp.ClientSession, url: str, size: int, headers: Optional[Dict[str, str]] = None, timeout: float = 10):
+    """
+    Fetch at most the first `size` bytes of `url` with a Range request.
+
+    Servers that ignore Range answer 200 with the full body; only `size`
+    bytes are read before the connection is dropped. Returns
+    (status, response headers, bytes).
+    """
+    req_headers = dict(headers or {})
+    req_headers["Range"] = f"bytes=0-{size - 1}"
+    async with s.get(url, headers=req_headers, timeout=aiohttp.ClientTimeout(total=timeout)) as r:
+        r.raise_for_status()
+        data = b""
+        while len(data) < size:
+            chunk = await r.content.read(size - len(data))
+            if not chunk:
+                break
+            data += chunk
+        if r.status != 206:
+            r.close()
+        return r.status, r.headers, data
@@ -0,0 +1,69 @@
+"""
+Single-flight execution: concurrent callers asking for the same key share
+one run of the work instead of each starting their own.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+class SingleFlight:
+    def __init__(self):
+        # key -> (run, the tag it was started with)
+        self._inflight: Dict[Hashable, Tuple["asyncio.Task", Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    def in_flight(self, key: Hashable, tag: Any = None, accept: Optional[Callable[[Any, Any], bool]] = None) -> bool:
+        """Whether `do(key, ..., tag, accept)` on the running loop would join a run rather than start one."""
+        return self._joinable(key, tag, accept) is not None
+
+    def held(self, key: Hashable) -> bool:
+        """Whether any run for `key` is in flight, joinable from here or not."""
+        return key in self._inflight
+
+    def _joinable(
+        self, key: Hashable, tag: Any, accept: Optional[Callable[[Any, Any], bool]],
+    ) -> Optional["asyncio.Task"]:
+        task, running_tag = self._inflight.get(key, (None, None))
+        # Runs on another loop (a profiled request's private one) can't be awaited here
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            return None
+        if accept is not None and not accept(running_tag, tag):
+            return None
+        return task
+
+    async def do(
+        self,
+        key: Hashable,
+        work: Callable[[], Awaitable[T]],
+        tag: Any = None,
+        accept: Optional[Callable[[Any, Any], bool]] = None,
+    ) -> Tuple[T, bool]:
+        """
+        Await `work()` for `key`, or join the run already in flight for it.
+        Returns the result and whether it was shared from another caller's run.
+
+        A run started here is stored with `tag`. With `accept`, a run is only
+        joined if `accept(its tag, tag)` holds; otherwise a new run starts,
+        and later callers join that one.
+
+        The run belongs to no single caller: one that is cancelled stops
+        waiting, but the run carries on for everyone else. Errors reach
+        every caller. The key is released as soon as the run finishes, so
+        later callers start fresh.
+        """
+        task = self._joinable(key, tag, accept)
+        shared = task is not None
+        if not shared:
+            task = asyncio.get_running_loop().create_task(work())
+            self._inflight[key] = (task, tag)
+            task.add_done_callback(lambda t, key=key: self._release(key, t))
+        return await asyncio.shield(task), shared
+
+    def _release(self, key: Hashable, task: "asyncio.Task"):
+        if self._inflight.get(key, (None,))[0] is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here in case every caller gave up waiting
@@ -0,0 +1,98 @@
+import re
+from typing import Dict, Optional
+
+SNIFF_BYTES = 8192
+
+PDF_MAGIC = b"%PDF-"
+OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"   # legacy .doc/.xls/.ppt
+ZIP_MAGIC = b"PK\x03\x04"                         # .docx/.xlsx/.pptx
+
+HTML_PROLOGUES = (
+    b"<!doctype html",
+    b"<html",
+    b"<head",
+    b"<body",
+    b"<meta",
+    b"<title",
+    b"<script",
+    b"<!--",
+)
+
+KIND_MIMETYPES = {
+    "pdf": "application/pdf",
+    "ole": "application/msword",
+    "zip": "application/zip",
+}
+
+def sniff_kind(head: bytes) -> Optional[str]:
+    """
+    Classify a response from its first bytes.
+
+    Returns "pdf", "ole", "zip" or "html"; None means nothing conclusive
+    (e.g. CSV or plain text) and the body should be judged by its headers.
+    """
+    if not head:
+        return None
+    # The PDF spec allows junk before the header within the first 1024 bytes
+    if PDF_MAGIC in head[:1024]:
+        return "pdf"
+    if head.startswith(OLE_MAGIC):
+        return "ole"
+    if head.startswith(ZIP_MAGIC):
+        return "zip"
+    text = head.lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    if text.startswith(HTML_PROLOGUES):
+        return "html"
+    if text.startswith(b"<?xml") and b"<html" in text:
+        return "html"
+    return None
+
+def is_document(head: bytes, content_type: Optional[str] = None) -> bool:
+    """False once the first bytes show the response is a web page, not a file."""
+    kind = sniff_kind(head)
+    if kind == "html":
+        return False
+    if kind is None and content_type and content_type.lower().startswith("text/html"):
+        # Served as HTML without any document signature
+        return False
+    return True
+
+_PDF_TITLE_LITERAL = re.compile(rb"/Title\s*\((.*?)(?<!\\)\)", re.S)
+_PDF_TITLE_HEX = re.compile(rb"/Title\s*<([0-9A-Fa-f\s]+)>")
+_PDF_CREATED = re.compile(rb"/CreationDate\s*\(D:(\d{4})")
+_XMP_TITLE = re.compile(rb"<dc:title>.*?<rdf:li[^>]*>(.*?)</rdf:li>", re.S)
+_XMP_CREATED = re.compile(rb"xmp:CreateDate(?:>|=\")(\d{4})")
+
+def _decode_pdf_string(raw: bytes) -> str:
+    if raw.startswith(b"\xfe\xff"):
+        return raw[2:].decode("utf-16-be", errors="ignore")
+    raw = re.sub(rb"\\([()\\])", rb"\1", raw)
+    return raw.decode("latin-1", errors="ignore")
+
+def pdf_info(head: bytes) -> Dict[str, Optional[str]]:
+    """
+    Best-effort title and creation year from the start of a PDF.
+
+    Only sees the /Info dictionary or XMP packet when they sit in `head`,
+    which is typical for linearized (web-optimized) files.
+    """
+    title = None
+    m = _PDF_TITLE_LITERAL.search(head)
+    if m:
+        title = _decode_pdf_string(m.group(1))
+    else:
+        m = _PDF_TITLE_HEX.search(head)
+        if m:
+            try:
+                title = _decode_pdf_string(bytes.fromhex(m.group(1).decode()))
+            except ValueError:
+                title = None
+        else:
+            m = _XMP_TITLE.search(head)
+            if m:
+                title = m.group(1).decode("utf-8", errors="ignore")
+    created = _PDF_CREATED.search(head) or _XMP_CREATED.search(head)
+    return {
+        "title": title.strip() or None if title else None,
+        "created_year": created.group(1).decode() if created else None,
+    }
@@ -0,0 +1,266 @@
+"""
+Resumable file downloads.
+
+download_to_file streams a URL into a `.part` file next to a JSON sidecar
+recording what is needed to continue later (URL, validator, content type,
+size and progress). Large files on servers that accept byte ranges are
+fetched as several concurrent segments written into a preallocated file.
+"""
+import asyncio
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional
+import aiohttp
+from ..config import DOWNLOAD_SEGMENTS, SEGMENT_THRESHOLD_BYTES
+from .http import content_total_length, hedge_delay, hedged_get
+from .sniff import SNIFF_BYTES, is_document
+
+CHUNK_SIZE = 256 * 1024
+TIMEOUT = 180
+
+class RejectedContent(Exception):
+    """Raised when a download is abandoned because its first bytes are not a document."""
+
+class _ResourceChanged(Exception):
+    """A resumed range came back as something other than the bytes we asked for."""
+
+def range_start(headers) -> Optional[int]:
+    m = re.match(r"\s*bytes\s+(\d+)-", headers.get("Content-Range", ""))
+    return int(m.group(1)) if m else None
+
+def _load_part_meta(meta_path: str, url: str) -> Dict[str, Any]:
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return meta if meta.get("url") == url else {}
+
+def _save_part_meta(meta_path: str, meta: Dict[str, Any]):
+    tmp_path = meta_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+def discard_partial(part_path: str):
+    for path in (part_path, part_path + ".json"):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def _write_at(out, pos: int, data: bytes):
+    if hasattr(os, "pwrite"):
+        os.pwrite(out.fileno(), data, pos)
+    else:  # Windows: no pwrite, but segment writers share one thread
+        out.seek(pos)
+        out.write(data)
+
+async def _read_up_to(r: aiohttp.ClientResponse, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = await r.content.read(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+async def download_to_file(
+    url: str,
+    part_path: str,
+    headers: Optional[Dict[str, str]] = None,
+    sniff_bytes: int = SNIFF_BYTES,
+    segments: int = DOWNLOAD_SEGMENTS,
+    segment_threshold: int = SEGMENT_THRESHOLD_BYTES,
+    timeout: float = TIMEOUT,
+):
+    """
+    Stream `url` into `part_path`, resuming an earlier interrupted attempt.
+
+    When a partial file exists, the request carries `Range: bytes=<offset>-`
+    plus `If-Range` with the strong ETag or Last-Modified, so a changed
+    resource comes back whole (200) and the file is restarted. The first
+    `sniff_bytes` of a fresh transfer are checked and RejectedContent is
+    raised for web pages.
+
+    If the server advertises `Accept-Ranges: bytes` and the body is at least
+    `segment_threshold` bytes, the open response keeps serving the first
+    segment while `segments - 1` more ranged requests fetch the rest. Each
+    request is hedged (see http.hedged_get) when its first byte is late.
+
+    Every request gets `timeout` seconds in total. On an error (a timeout
+    included) the partial file and sidecar are left in place for the next
+    attempt. Returns (content_type, total bytes) once the file is complete.
+    """
+    meta_path = part_path + ".json"
+    meta = _load_part_meta(meta_path, url)
+    have_part = bool(meta) and os.path.exists(part_path)
+    validator = meta.get("etag") or meta.get("last_modified")
+    # Byte offsets only line up with the stored file when nothing is re-encoded
+    base_headers = {"Accept-Encoding": "identity", **(headers or {})}
+
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as s:
+        if have_part and validator and meta.get("segments"):
+            with open(part_path, "r+b") as out:
+                await _run_segments(s, out, part_path, meta, base_headers)
+            return meta.get("content_type"), meta["total"]
+
+        offset = os.path.getsize(part_path) if have_part and validator else 0
+        req_headers = dict(base_headers)
+        if offset:
+            if meta.get("total") == offset:
+                return meta.get("content_type"), offset
+            req_headers["Range"] = f"bytes={offset}-"
+            req_headers["If-Range"] = validator
+
+        async with await hedged_get(s, url, req_headers, hedge_delay()) as r:
+            r.raise_for_status()
+            if offset and not (r.status == 206 and range_start(r.headers) == offset):
+                offset = 0  # resource changed or range ignored: start over
+            etag = r.headers.get("ETag")
+            if offset:
+                content_type = meta.get("content_type")
+            else:
+                content_type = r.headers.get("Content-Type")
+                meta = {
+                    "url": url,
+                    # If-Range only accepts strong validators
+                    "etag": etag if etag and not etag.startswith("W/") else None,
+                    "last_modified": r.headers.get("Last-Modified"),
+                    "content_type": content_type,
+                }
+            meta["total"] = content_total_length(r.headers)
+            if r.headers.get("Content-Encoding", "identity").lower() != "identity":
+                # Sizes refer to the encoded body and ranges can't be resumed
+                meta.update(total=None, etag=None, last_modified=None)
+
+            head = b""
+            if not offset:
+                head = await _read_up_to(r, sniff_bytes)
+                if not is_document(head, content_type):
+                    r.close()
+                    discard_partial(part_path)
+                    raise RejectedContent(f"{url} is not a document (Content-Type: {content_type})")
+            os.makedirs(os.path.dirname(part_path) or ".", exist_ok=True)
+
+            total = meta["total"]
+            if (
+                not offset
+                and segments > 1
+                and r.status == 200
+                and total
+                and total >= segment_threshold
+                and r.headers.get("Accept-Ranges", "").lower() == "bytes"
+                and (meta["etag"] or meta["last_modified"])
+            ):
+                await _download_segments(s, r, part_path, meta, head, segments, base_headers)
+                return content_type, total
+
+            written = offset
+            try:
+                with open(part_path, "ab" if offset else "wb") as out:
+                    if head:
+                        out.write(head)
+                        written += len(head)
+                        meta["offset"] = written
+                        _save_part_meta(meta_path, meta)
+                    async for chunk in r.content.iter_chunked(CHUNK_SIZE):
+                        out.write(chunk)
+                        written += len(chunk)
+            except BaseException:
+                meta["offset"] = written
+                _save_part_meta(meta_path, meta)
+                raise
+            meta["offset"] = written
+            _save_part_meta(meta_path, meta)
+            if total is not None and written != total:
+                raise aiohttp.ClientPayloadError(f"{url} ended at {written} of {total} bytes")
+            return content_type, written
+
+def plan_segments(total: int, count: int, min_first: int = 0) -> List[List[int]]:
+    """Split [0, total) into `count` [start, end, done] ranges (end inclusive)."""
+    size = max(-(-total // count), min_first, 1)
+    return [[start, min(start + size, total) - 1, 0] for start in range(0, total, size)]
+
+async def _download_segments(
+    s: aiohttp.ClientSession,
+    first: aiohttp.ClientResponse,
+    part_path: str,
+    meta: Dict[str, Any],
+    head: bytes,
+    count: int,
+    base_headers: Dict[str, str],
+):
+    total = meta["total"]
+    meta.pop("offset", None)
+    meta["segments"] = plan_segments(total, count, min_first=len(head))
+    meta["segments"][0][2] = len(head)
+    with open(part_path, "wb") as out:
+        out.truncate(total)  # preallocate so every segment can write in place
+        _write_at(out, 0, head)
+        _save_part_meta(part_path + ".json", meta)
+        await _run_segments(s, out, part_path, meta, base_headers, first=first)
+
+async def _run_segments(
+    s: aiohttp.ClientSession,
+    out,
+    part_path: str,
+    meta: Dict[str, Any],
+    base_headers: Dict[str, str],
+    first: Optional[aiohttp.ClientResponse] = None,
+):
+    url = meta["url"]
+    validator = meta.get("etag") or meta.get("last_modified")
+
+    async def pump(seg: List[int], resp: aiohttp.ClientResponse):
+        pos = seg[0] + seg[2]
+        remaining = seg[1] + 1 - pos
+        while remaining > 0:
+            chunk = await resp.content.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                raise aiohttp.ClientPayloadError(f"{url} segment {seg[0]}-{seg[1]} ended early")
+            _write_at(out, pos, chunk)
+            pos += len(chunk)
+            remaining -= len(chunk)
+            seg[2] += len(chunk)
+
+    async def fetch(seg: List[int]):
+        start = seg[0] + seg[2]
+        seg_headers = {**base_headers, "Range": f"bytes={start}-{seg[1]}", "If-Range": validator}
+        async with await hedged_get(s, url, seg_headers, hedge_delay()) as resp:
+            resp.raise_for_status()
+            if resp.status != 206 or range_start(resp.headers) != start:
+                raise _ResourceChanged(f"{url} no longer serves the range {start}-{seg[1]}")
+            await pump(seg, resp)
+
+    async def continue_first(seg: List[int]):
+        # The original 200 response is already positioned after the sniffed head
+        try:
+            await pump(seg, first)
+        finally:
+            first.close()
+
+    jobs = []
+    for seg in meta["segments"]:
+        if seg[2] >= seg[1] - seg[0] + 1:
+            continue
+        if first is not None and seg[0] == 0:
+            jobs.append(asyncio.ensure_future(continue_first(seg)))
+        else:
+            jobs.append(asyncio.ensure_future(fetch(seg)))
+    if first is not None and not any(seg[0] == 0 and seg[2] < seg[1] + 1 for seg in meta["segments"]):
+        first.close()
+
+    try:
+        await asyncio.gather(*jobs)
+    except BaseException as exc:
+        for job in jobs:
+            job.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
+        if isinstance(exc, _ResourceChanged):
+            discard_partial(part_path)
+            raise aiohttp.ClientPayloadError(str(exc)) from exc
+        _save_part_meta(part_path + ".json", meta)
+        raise
+    _save_part_meta(part_path + ".json", meta)
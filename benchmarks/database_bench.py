@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Benchmark concurrent catalog writes and reads against a large SQLite table.
+
+Run with:
+    python -m benchmarks.database_bench [--rows 1000000] [--writers 8] [--readers 4] [--pages 50]
+
+Seeds a scratch database with --rows rows and pages through it with
+list_files, unfiltered and with each /files filter, reporting the cost of
+the first and the last of --pages pages. Then it runs writer threads calling
+save_file_metadata while reader threads poll get_recent_files, and reports
+insert throughput and read latency. --legacy runs the same workload against
+a single shared connection that commits every insert, as database.py did
+before the write-behind queue.
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+_tmp_dir = tempfile.mkdtemp(prefix="ir_fetcher_bench_")
+os.environ["DATABASE_BACKEND"] = "sqlite"
+os.environ["SQLITE_PATH"] = str(Path(_tmp_dir) / "bench.db")
+
+from backend import database  # noqa: E402
+
+
+def _row(i: int) -> dict:
+    return {
+        "company": f"Company {i % 5000}",
+        "doc_type": ("annual report", "10-K", "earnings release")[i % 3],
+        "year": 2000 + i % 25,
+        "file_path": f"data/downloads/c{i}.pdf",
+        "filename": f"c{i}.pdf",
+        "url": f"https://example.com/{i}.pdf",
+        "sha256": f"{i:064x}",
+        "mimetype": "application/pdf",
+        # A rare value, so a filter on it has to skip far more rows per page
+        "source": "SEC" if i % 50 == 0 else "IR",
+        "indexed_at": 1_600_000_000 + i,
+    }
+
+
+def seed(rows: int):
+    start = time.perf_counter()
+    chunk = 20_000
+    for offset in range(0, rows, chunk):
+        database.save_files_metadata([_row(i) for i in range(offset, min(rows, offset + chunk))])
+    print(f"seeded {rows} rows in {time.perf_counter() - start:.1f}s")
+
+
+class _LegacyStore:
+    """Shared connection, lock around writes, one commit per insert, unlocked reads."""
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=DELETE;")
+        self.lock = threading.Lock()
+
+    def save(self, item: dict) -> bool:
+        doc = database._normalize_metadata(item)
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO files (company, doc_type, year, file_path, filename, url, sha256, "
+                "mimetype, source, indexed_at, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT DO NOTHING;",
+                tuple(doc[field] for field in database.DB_FIELDS),
+            )
+            return cursor.rowcount > 0
+
+    def recent(self, limit: int = 100):
+        cursor = self.conn.execute(
+            "SELECT company, doc_type, year, file_path, filename, url, sha256, mimetype, "
+            "source, indexed_at, created_at FROM files ORDER BY indexed_at DESC LIMIT ?;",
+            (limit,),
+        )
+        return [dict(row) for row in cursor.fetchall()]
+
+
+# (label, list_files filters); values are as common as their _row pattern makes them
+PAGE_FILTERS = [
+    ("unfiltered", {}),
+    ("company", {"company": "Company 42"}),
+    ("doc_type", {"doc_type": "10-K"}),
+    ("year", {"year": 2010}),
+    ("source", {"source": "SEC"}),
+]
+
+
+def page_through(pages: int):
+    for label, filters in PAGE_FILTERS:
+        after, latencies = None, []
+        for _ in range(pages):
+            t0 = time.perf_counter()
+            rows = database.list_files(limit=100, after=after, **filters)
+            latencies.append(time.perf_counter() - t0)
+            if len(rows) < 100:
+                break
+            after = (rows[-1]["indexed_at"], rows[-1]["id"])
+        print(
+            f"[paging] {label}: {len(latencies)} pages, first={latencies[0] * 1000:.2f}ms "
+            f"last={latencies[-1] * 1000:.2f}ms p50={statistics.median(latencies) * 1000:.2f}ms"
+        )
+
+
+def run(args):
+    database.init_database()
+    seed(args.rows)
+    if args.pages:
+        page_through(args.pages)
+
+    if args.legacy:
+        database.close_database()
+        database._sqlite_conn.close()
+        database._sqlite_conn = None
+        store = _LegacyStore(str(database.SQLITE_PATH))
+        save, recent = store.save, store.recent
+    else:
+        save, recent = database.save_file_metadata, database.get_recent_files
+
+    done = threading.Event()
+    read_latencies = []
+    read_lock = threading.Lock()
+
+    def writer(worker: int):
+        base = args.rows + worker * args.inserts
+        for i in range(base, base + args.inserts):
+            save(_row(i))
+
+    def reader():
+        local = []
+        while not done.is_set():
+            t0 = time.perf_counter()
+            recent(100)
+            local.append(time.perf_counter() - t0)
+        with read_lock:
+            read_latencies.extend(local)
+
+    readers = [threading.Thread(target=reader) for _ in range(args.readers)]
+    writers = [threading.Thread(target=writer, args=(w,)) for w in range(args.writers)]
+    start = time.perf_counter()
+    for t in readers + writers:
+        t.start()
+    for t in writers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    for t in readers:
+        t.join()
+
+    total = args.writers * args.inserts
+    mode = "legacy" if args.legacy else "wal+write-behind"
+    print(f"[{mode}] {total} inserts from {args.writers} threads in {elapsed:.2f}s ({total / elapsed:.0f}/s)")
+    if read_latencies:
+        read_latencies.sort()
+        p95 = read_latencies[int(len(read_latencies) * 0.95) - 1]
+        print(
+            f"[{mode}] {len(read_latencies)} reads from {args.readers} threads: "
+            f"p50={statistics.median(read_latencies) * 1000:.2f}ms p95={p95 * 1000:.2f}ms"
+        )
+    database.close_database()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--inserts", type=int, default=500, help="inserts per writer thread")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=50, help="pages of 100 rows per filter; 0 skips paging")
+    parser.add_argument("--legacy", action="store_true")
+    run(parser.parse_args())
+    print(f"scratch database: {database.SQLITE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
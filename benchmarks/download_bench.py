@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark single-stream vs segmented downloads against a local range server.
+
+Run with:
+    python -m benchmarks.download_bench [--size-mb 64] [--rate-mbps 80] [--segments 1 4 8]
+
+Serves one in-memory PDF over aiohttp, throttling every connection to
+--rate-mbps (megabits per second) to stand in for a per-connection limited
+IR host or CDN, then downloads it with download_to_file at each segment
+count and reports wall time, throughput and whether the SHA-256 matched.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+
+from aiohttp import web
+
+from backend.util.transfer import download_to_file
+
+ETAG = '"bench-v1"'
+
+
+def _app(body: bytes, rate_bytes: float) -> web.Application:
+    total = len(body)
+    chunk = 64 * 1024
+
+    async def serve(request):
+        headers = {"Content-Type": "application/pdf", "ETag": ETAG, "Accept-Ranges": "bytes"}
+        start, end, status = 0, total - 1, 200
+        range_header = request.headers.get("Range")
+        if range_header and request.headers.get("If-Range", ETAG) == ETAG:
+            first, _, last = range_header.split("=")[1].partition("-")
+            start, end, status = int(first), int(last) if last else total - 1, 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+        resp = web.StreamResponse(status=status, headers=headers)
+        resp.content_length = end + 1 - start
+        await resp.prepare(request)
+        started = time.perf_counter()
+        sent = 0
+        try:
+            for pos in range(start, end + 1, chunk):
+                piece = body[pos:min(pos + chunk, end + 1)]
+                await resp.write(piece)
+                sent += len(piece)
+                ahead = sent / rate_bytes - (time.perf_counter() - started)
+                if ahead > 0:
+                    await asyncio.sleep(ahead)
+        except ConnectionResetError:
+            pass  # segmented clients hang up on the 200 once segment 0 is done
+        return resp
+
+    app = web.Application()
+    app.router.add_get("/report.pdf", serve)
+    return app
+
+
+async def _bench(args) -> list:
+    body = b"%PDF-1.7\n" + os.urandom(int(args.size_mb * 1024 * 1024))
+    expected = hashlib.sha256(body).hexdigest()
+    runner = web.AppRunner(_app(body, args.rate_mbps * 1_000_000 / 8))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/report.pdf"
+
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for count in args.segments:
+                part = os.path.join(tmp, f"bench-{count}.part")
+                started = time.perf_counter()
+                _, size = await download_to_file(url, part, segments=count, segment_threshold=0)
+                elapsed = time.perf_counter() - started
+                with open(part, "rb") as f:
+                    ok = hashlib.sha256(f.read()).hexdigest() == expected
+                results.append((count, elapsed, size / elapsed / 1024 / 1024, ok))
+                os.remove(part)
+                os.remove(part + ".json")
+    finally:
+        await runner.cleanup()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=64)
+    parser.add_argument("--rate-mbps", type=float, default=80, help="per-connection limit in megabits/s")
+    parser.add_argument("--segments", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    print(f"{args.size_mb:g} MB file, {args.rate_mbps:g} Mbit/s per connection")
+    print(f"{'segments':>8}  {'seconds':>8}  {'MB/s':>8}  sha256")
+    for count, elapsed, rate, ok in asyncio.run(_bench(args)):
+        print(f"{count:>8}  {elapsed:>8.2f}  {rate:>8.1f}  {'ok' if ok else 'MISMATCH'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the prompt parser.
+
+Run with:
+    python -m benchmarks.parser_bench
+
+Builds a deterministic corpus of a few thousand prompts, checks that
+`parse_prompt` returns exactly what the original pattern-by-pattern parser
+returned, then times both (without and with the parse cache).
+"""
+import random
+import re
+import time
+from typing import List
+
+from backend.agents import parser
+from backend.models import Intent
+
+COMPANIES = [
+    "Apple", "Microsoft Corp", "Infosys", "Reliance Industries", "Nestle", "HSBC Holdings",
+    "Tata Motors", "Siemens AG", "Toyota", "Unilever", "BP", "Amazon.com", "AT&T",
+]
+DOC_PHRASES = [
+    "annual report", "annual reports", "10-K", "form 10-k", "10q", "20-F", "financial statements",
+    "balance sheet and cash flow", "investor presentation", "investor slide deck", "earnings release",
+    "quarterly results", "half-year report", "semi-annual results", "all reports", "all filings",
+    "results release", "earnings presentation", "", "documents",
+]
+PERIODS = [
+    "", "", "", "Q1", "q 2", "third quarter", "4th quarter", "quarter one", "year-end quarter",
+    "year-end quarter one", "H1", "first half", "second half", "h2 fy", "Q3 and Q1", "H2 and Q4",
+]
+YEARS = ["", "2023", "2019", "2022-23", "2020 to 2024", "2021-2022", "FY2024", "2018 2020 2022", "2024–25"]
+LEADS = ["", "download", "get", "Download the latest", "please fetch", "find"]
+
+
+def build_corpus(size: int = 4000, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        parts = [
+            rng.choice(LEADS),
+            rng.choice(COMPANIES),
+            rng.choice(DOC_PHRASES),
+            rng.choice(PERIODS),
+            rng.choice(YEARS),
+        ]
+        if rng.random() < 0.3:
+            rng.shuffle(parts)
+        prompt = " ".join(p for p in parts if p)
+        if rng.random() < 0.2:
+            prompt = "  " + prompt.upper() + " "
+        corpus.append(prompt)
+    return corpus
+
+
+# --- Reference: the parser as it was before the single-pass rewrite ---------
+
+def _legacy_detect_periods(text: str):
+    extras = {}
+    txt = text.lower()
+    for code, patterns in parser.QUARTER_PATTERNS.items():
+        for pattern in patterns:
+            if re.search(pattern, txt):
+                extras["quarter"] = code
+                return extras
+    for code, patterns in parser.HALF_PATTERNS.items():
+        for pattern in patterns:
+            if re.search(pattern, txt):
+                extras["half"] = code
+                return extras
+    return extras
+
+
+def _legacy_extract_doc_types(text: str) -> List[str]:
+    txt = text.lower()
+    if any(phrase in txt for phrase in ["all report", "all reports", "all filings", "all documents", "all docs"]):
+        return parser.ALL_DOC_TYPES.copy()
+    doc_types: List[str] = []
+    for needle, normalized in parser.DOC_TYPE_MAPPING:
+        if needle in txt and normalized not in doc_types:
+            doc_types.append(normalized)
+    if not doc_types:
+        doc_types = parser.DEFAULT_DOC_TYPES.copy()
+    return doc_types
+
+
+def _legacy_extract_years(text: str) -> List[int]:
+    m = re.search(r"(20\d{2})\s*(?:to|-|–|—)\s*(\d{2,4})", text)
+    if m:
+        start = int(m.group(1))
+        end_raw = m.group(2)
+        if len(end_raw) == 2:
+            end = int(str(start)[:2] + end_raw)
+        else:
+            end = int(end_raw)
+        return sorted({start, end})
+    years = sorted({int(y) for y in re.findall(r"(20\d{2})", text)})
+    return years or []
+
+
+def legacy_parse_prompt(prompt: str) -> Intent:
+    t = prompt.strip()
+    doc_types = _legacy_extract_doc_types(t)
+    tokens = [w for w in re.findall(r"[A-Za-z&.\-]+", t) if len(w) > 1]
+    common = set("download latest report reports annual quarterly from the of to and get all files filings documents".split())
+    cand = [w for w in tokens if w.lower() not in common]
+    company = cand[0] if cand else "Unknown"
+    return Intent(
+        company=company,
+        doc_type=doc_types[0],
+        doc_types=doc_types,
+        years=_legacy_extract_years(t),
+        extras=_legacy_detect_periods(t),
+    )
+
+
+def find_mismatches(corpus: List[str]) -> List[str]:
+    return [p for p in corpus if parser.parse_prompt(p) != legacy_parse_prompt(p)]
+
+
+def _time(fn, corpus: List[str], rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for prompt in corpus:
+            fn(prompt)
+    return time.perf_counter() - start
+
+
+def main():
+    corpus = build_corpus()
+    mismatches = find_mismatches(corpus)
+    print(f"Corpus: {len(corpus)} prompts ({len(set(corpus))} unique), mismatches: {len(mismatches)}")
+    for prompt in mismatches[:10]:
+        print("  MISMATCH:", repr(prompt))
+
+    rounds = 5
+    legacy = _time(legacy_parse_prompt, corpus, rounds)
+    parser._parse_normalized.cache_clear()
+    cold = _time(lambda p: parser._parse_normalized.__wrapped__(p.strip()), corpus, rounds)
+    warm = _time(parser.parse_prompt, corpus, rounds)
+    total = len(corpus) * rounds
+    print(f"legacy parser:          {total / legacy:8.0f} prompts/s")
+    print(f"single-pass (no cache): {total / cold:8.0f} prompts/s")
+    print(f"single-pass (cached):   {total / warm:8.0f} prompts/s  cache={parser.parse_cache_info()}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
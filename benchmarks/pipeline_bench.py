@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of run_pipeline against local provider stand-ins.
+
+Run with:
+    python -m benchmarks.pipeline_bench [--iterations 5] [--concurrency 1] [--scenarios single_year ...]
+
+Nothing leaves the machine: Tavily responses are replayed from
+benchmarks/fixtures/tavily_recorded.json, and EDGAR, the IR sites and the
+document host are served by benchmarks/provider_standins.py with realistic
+PDF sizes, time to first byte and per-connection bandwidth. Each scenario
+runs in a fresh subprocess with its own scratch database and download
+directories, so peak RSS is that scenario's alone, and reports p50/p95
+request latency, requests/s, MB/s downloaded and peak RSS.
+
+After changing the queries web_search sends, re-record the fixture with
+`--record` (responses are synthesized from each query and saved).
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.provider_standins import FIXTURE_PATH, ProviderStandIns, load_recording, save_recording
+
+SCENARIOS = {
+    "single_year": {"prompt": "Acme Industries annual report 2023"},
+    "five_year_window": {"prompt": "Acme Industries annual reports 2019 2020 2021 2022 2023"},
+    "all_reports": {"prompt": "Acme Industries all reports 2023"},
+    "sec_fallback": {"prompt": "Acme Industries 10-K 2022"},
+}
+
+
+def _percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+async def _run_scenario(name: str, iterations: int, concurrency: int, warmup: int) -> dict:
+    """Runs inside the scenario subprocess; the environment already points at the stand-ins."""
+    import resource
+
+    from backend.database import close_database, init_database
+    from backend.models import DownloadRequest
+    from backend.pipeline import run_pipeline
+    from backend.services import ir_scraper
+    from backend.services.metadata import shutdown_metadata_writer
+
+    # The guessed IR domains (acme.com/investors, ...) are real hosts; only
+    # the IR page Tavily points at is served by the stand-ins
+    ir_scraper.candidate_ir_urls = lambda company: []
+    init_database()
+
+    async def one():
+        started = time.perf_counter()
+        response = await run_pipeline(DownloadRequest(**SCENARIOS[name]))
+        elapsed = time.perf_counter() - started
+        size = sum(os.path.getsize(r.file_path) for r in response.results)
+        return elapsed, len(response.results), size
+
+    for _ in range(warmup):
+        await one()
+
+    latencies, files, downloaded = [], 0, 0
+    started = time.perf_counter()
+    remaining = iterations
+    while remaining > 0:
+        batch = await asyncio.gather(*(one() for _ in range(min(concurrency, remaining))))
+        remaining -= len(batch)
+        for elapsed, count, size in batch:
+            latencies.append(elapsed)
+            files += count
+            downloaded += size
+    wall = time.perf_counter() - started
+
+    shutdown_metadata_writer()
+    close_database()
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "p50": _percentile(latencies, 50),
+        "p95": _percentile(latencies, 95),
+        "requests_per_s": len(latencies) / wall,
+        "files_per_request": files / len(latencies),
+        "mb_per_s": downloaded / wall / 1024 / 1024,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def _scenario_env(stand_ins: ProviderStandIns, scratch: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_BACKEND": "sqlite",
+        "SQLITE_PATH": os.path.join(scratch, "bench.db"),
+        "DOWNLOAD_ROOT": os.path.join(scratch, "downloads"),
+        "METADATA_ROOT": os.path.join(scratch, "metadata"),
+        "TEXT_CACHE_ROOT": os.path.join(scratch, "text"),
+        "TAVILY_API_KEY": "bench",
+        "TAVILY_API_BASE_URL": stand_ins.tavily_url,
+        "SEC_BASE_URL": stand_ins.url,
+    })
+    env.pop("TRACE_EXPORT_URL", None)
+    return env
+
+
+async def _bench(args) -> list:
+    recording = None if args.record else load_recording()
+    stand_ins = ProviderStandIns(
+        recording,
+        search_latency=args.search_latency,
+        page_latency=args.page_latency,
+        ttfb=args.ttfb,
+        rate_mbps=args.rate_mbps,
+    )
+    results = []
+    async with stand_ins:
+        for name in args.scenarios:
+            with tempfile.TemporaryDirectory() as scratch:
+                proc = await asyncio.create_subprocess_exec(
+                    sys.executable, "-m", "benchmarks.pipeline_bench",
+                    "--run-scenario", name,
+                    "--iterations", str(args.iterations),
+                    "--concurrency", str(args.concurrency),
+                    "--warmup", str(args.warmup),
+                    env=_scenario_env(stand_ins, scratch),
+                    stdout=asyncio.subprocess.PIPE,
+                )
+                out, _ = await proc.communicate()
+            if proc.returncode != 0:
+                raise SystemExit(f"scenario {name} failed with exit code {proc.returncode}")
+            results.append(json.loads(out.decode().strip().splitlines()[-1]))
+    if args.record:
+        save_recording(stand_ins.recorded)
+        print(f"recorded {len(stand_ins.recorded)} queries to {FIXTURE_PATH}")
+    elif stand_ins.misses:
+        print(f"warning: {len(set(stand_ins.misses))} queries missing from the recording; re-run with --record")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=1, help="pipeline runs in flight at once")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs before measuring")
+    parser.add_argument("--search-latency", type=float, default=0.3, help="seconds per Tavily call")
+    parser.add_argument("--page-latency", type=float, default=0.2, help="seconds per EDGAR/IR page")
+    parser.add_argument("--ttfb", type=float, default=0.15, help="seconds before a file's first byte")
+    parser.add_argument("--rate-mbps", type=float, default=100, help="per-connection limit in megabits/s")
+    parser.add_argument("--record", action="store_true", help="synthesize Tavily responses and save them")
+    parser.add_argument("--run-scenario", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scenario:
+        result = asyncio.run(_run_scenario(args.run_scenario, args.iterations, args.concurrency, args.warmup))
+        print(json.dumps(result))
+        return
+
+    print(f"{args.iterations} requests per scenario, concurrency {args.concurrency}, "
+          f"Tavily {args.search_latency:g}s, TTFB {args.ttfb:g}s, {args.rate_mbps:g} Mbit/s per connection")
+    print(f"{'scenario':<18} {'p50 s':>7} {'p95 s':>7} {'req/s':>7} {'files':>6} {'MB/s':>7} {'peak RSS MB':>12}")
+    for r in asyncio.run(_bench(args)):
+        print(f"{r['scenario']:<18} {r['p50']:>7.2f} {r['p95']:>7.2f} {r['requests_per_s']:>7.2f} "
+              f"{r['files_per_request']:>6.1f} {r['mb_per_s']:>7.1f} {r['peak_rss_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+In-memory stand-in for the slice of PostgREST that database.py uses.
+
+Serves `/rest/v1/<table>` on a background thread so the real supabase client
+can talk to it: GET with `select`, `eq`/`lt`/`gt` filters, `or=(...)`,
+`order` and `limit`; POST inserts honouring `on_conflict` and
+`Prefer: resolution=ignore-duplicates|merge-duplicates`, answering with the
+representation of the rows actually written. Every request is counted so
+tests and benchmarks can report round-trips.
+"""
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+# Any JWT-shaped string passes the client's key check; nothing verifies it
+FAKE_SERVICE_KEY = (
+    "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9."
+    "eyJyb2xlIjoic2VydmljZV9yb2xlIn0."
+    "c3RhbmQtaW4"
+)
+
+
+def _split_top_level(expr: str) -> List[str]:
+    parts, depth, current = [], 0, ""
+    for ch in expr:
+        if ch == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        depth += ch == "("
+        depth -= ch == ")"
+        current += ch
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _compare(value, op: str, operand: str) -> bool:
+    if value is None:
+        return op == "is" and operand == "null"
+    if op == "eq":
+        return str(value) == operand
+    if op == "neq":
+        return str(value) != operand
+    number = float(operand)
+    return {"lt": value < number, "lte": value <= number, "gt": value > number, "gte": value >= number}[op]
+
+
+def _condition(expr: str):
+    """Compile `col.op.value`, `and(...)` or `or(...)` into a row predicate."""
+    for logic, combine in (("and(", all), ("or(", any)):
+        if expr.startswith(logic):
+            subs = [_condition(part) for part in _split_top_level(expr[len(logic):-1])]
+            return lambda row, subs=subs, combine=combine: combine(sub(row) for sub in subs)
+    column, op, operand = expr.split(".", 2)
+    return lambda row: _compare(row.get(column), op, operand)
+
+
+class PostgrestStandIn:
+    """Start with `with PostgrestStandIn() as server:`; `server.url` is the SUPABASE_URL."""
+
+    def __init__(self, latency: float = 0.0, unique_column: str = "sha256,company,doc_type,year"):
+        self.latency = latency
+        self.unique_column = unique_column
+        self.tables: Dict[str, List[Dict]] = {}
+        self.requests: Counter = Counter()
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def round_trips(self) -> int:
+        return sum(self.requests.values())
+
+    def __enter__(self) -> "PostgrestStandIn":
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stand_in._handle(self, "GET")
+
+            def do_POST(self):
+                stand_in._handle(self, "POST")
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _reply(self, handler: BaseHTTPRequestHandler, status: int, payload):
+        body = json.dumps(payload).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _handle(self, handler: BaseHTTPRequestHandler, method: str):
+        if self.latency:
+            threading.Event().wait(self.latency)
+        parts = urlsplit(handler.path)
+        table = parts.path.rsplit("/", 1)[-1]
+        params = parse_qsl(parts.query, keep_blank_values=True)
+        with self._lock:
+            self.requests[method] += 1
+            rows = self.tables.setdefault(table, [])
+            if method == "GET":
+                status, payload = 200, self._select(rows, params)
+            else:
+                length = int(handler.headers.get("Content-Length") or 0)
+                body = json.loads(handler.rfile.read(length) or b"[]")
+                status, payload = self._insert(rows, body, dict(params), handler.headers.get("Prefer", ""))
+        self._reply(handler, status, payload)
+
+    def _select(self, rows: List[Dict], params) -> List[Dict]:
+        predicates, order, limit = [], [], None
+        for key, value in params:
+            if key == "select":
+                continue
+            if key == "order":
+                order = [term.split(".") for term in value.split(",")]
+            elif key == "limit":
+                limit = int(value)
+            elif key == "or":
+                predicates.append(_condition(f"or{value}"))
+            else:
+                predicates.append(_condition(f"{key}.{value}"))
+        result = [row for row in rows if all(p(row) for p in predicates)]
+        for column, *direction in reversed(order):
+            result.sort(key=lambda row: row.get(column) or 0, reverse="desc" in direction)
+        return [dict(row) for row in result[:limit]]
+
+    def _insert(self, rows: List[Dict], body, params: Dict, prefer: str):
+        docs = body if isinstance(body, list) else [body]
+        columns = (params.get("on_conflict") or self.unique_column).split(",")
+
+        def key(row: Dict):
+            return tuple(row.get(column) for column in columns)
+
+        by_key = {key(row): row for row in rows}
+        if "resolution=" not in prefer and any(key(doc) in by_key for doc in docs):
+            # Plain INSERT: the whole statement fails on a unique violation
+            return 409, {"code": "23505", "message": "duplicate key value violates unique constraint"}
+        written = []
+        for doc in docs:
+            target = by_key.get(key(doc))
+            if target is not None:
+                if "merge-duplicates" in prefer:
+                    target.update(doc)
+                    written.append(dict(target))
+                continue
+            row = {"id": self._next_id, **doc}
+            self._next_id += 1
+            rows.append(row)
+            by_key[key(doc)] = row
+            written.append(dict(row))
+        return 201, written if "return=representation" in prefer else []
@@ -0,0 +1,319 @@
+"""
+Local stand-ins for every external service run_pipeline talks to.
+
+One aiohttp app serves:
+
+- `POST /tavily/search`: the Tavily search API. Responses are replayed from a
+  recording (`benchmarks/fixtures/tavily_recorded.json`, keyed by exact
+  query); in record mode they are synthesized from the query instead and
+  kept so the harness can write a fresh recording.
+- `GET /cgi-bin/browse-edgar`: the EDGAR company search page, a few filing
+  index lines of the shape sec.py scrapes.
+- `GET /ir/<company>/investors`: an investor relations page linking to the
+  company's PDFs.
+- `GET /files/...`: the document host. Every PDF is generated on the fly
+  from its path (a real header with /Title and /CreationDate, then filler)
+  at a size typical for its document type, after a time-to-first-byte
+  delay and throttled per connection. Range, If-Range and ETag are honoured
+  like a CDN would. Paths ending in `-summary.pdf` are HTML landing pages
+  served under a .pdf name, as IR sites often do.
+
+URLs inside recorded responses are stored with a `{base}` placeholder so a
+recording replays against whatever port the stand-ins bind to.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "tavily_recorded.json")
+
+# Typical sizes for each document type, in bytes
+DOC_SIZES = {
+    "annual-report": 6 * 1024 * 1024,
+    "10-k": 3 * 1024 * 1024,
+    "earnings-release": 400 * 1024,
+    "investor-presentation": 3 * 1024 * 1024,
+    "financial-statements": 1536 * 1024,
+}
+DOC_TITLES = {
+    "annual-report": "Annual Report",
+    "10-k": "Form 10-K",
+    "earnings-release": "Earnings Release Q4",
+    "investor-presentation": "Investor Presentation",
+    "financial-statements": "Financial Statements",
+}
+# Doc types a real search engine has little indexed for, so the router falls
+# through to SEC and IR scraping
+SPARSE_DOC_TYPES = {"10-k", "investor-presentation"}
+# Years answered for queries that don't name one (year-window searches)
+UNDATED_YEARS = range(2019, 2025)
+
+CHUNK = 64 * 1024
+_FILLER = hashlib.sha256(b"irfetcher-bench").digest() * (CHUNK // 32)
+_YEAR_RE = re.compile(r"\b(20\d{2})\b")
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+def _doc_slug(query: str) -> str:
+    q = query.lower()
+    for needle, slug in (
+        ("10-k", "10-k"),
+        ("investor presentation", "investor-presentation"),
+        ("earnings release", "earnings-release"),
+        ("financial statements", "financial-statements"),
+    ):
+        if needle in q:
+            return slug
+    return "annual-report"
+
+
+def _company(query: str) -> str:
+    quoted = re.match(r'\s*"([^"]+)"', query)
+    if quoted:
+        return quoted.group(1)
+    site = re.match(r"\s*site:([a-z0-9]+)\.com", query)
+    if site:
+        return site.group(1).capitalize()
+    return query.split()[0]
+
+
+def synthesize_tavily(query: str, max_results: int = 10) -> Dict:
+    """
+    Results a search engine plausibly returns for `query`: the report itself
+    and a mirror, plus the noise the pipeline has to filter out (a landing
+    page, an HTML page posing as a PDF, another company's report and the
+    previous year's edition).
+    """
+    company = _company(query)
+    slug = _slug(company)
+    if "investor relations site" in query:
+        return {"results": [{
+            "url": f"{{base}}/ir/{slug}/investors",
+            "title": f"{company} - Investor Relations",
+            "content": f"Reports and presentations for {company} investors.",
+            "score": 0.8,
+        }]}
+    doc = _doc_slug(query)
+    title = DOC_TITLES[doc]
+    years = [int(y) for y in _YEAR_RE.findall(query)] or list(UNDATED_YEARS)
+    results: List[Dict] = []
+    for year in years:
+        results.append({"url": f"{{base}}/files/{slug}/{doc}-{year}.pdf",
+                        "title": f"{company} {title} {year}", "score": 0.82})
+        if doc in SPARSE_DOC_TYPES:
+            continue
+        results.extend([
+            {"url": f"{{base}}/files/{slug}/{doc}-{year}-summary.pdf",
+             "title": f"{company} {title} {year} - summary", "score": 0.78},
+            {"url": f"{{base}}/pages/{slug}/{doc}-{year}.html",
+             "title": f"{company} {title} {year} | Investors", "score": 0.9},
+            {"url": f"{{base}}/files/mirror/{slug}-{doc}-{year}.pdf",
+             "title": f"{company} {title} {year}", "score": 0.7},
+            {"url": f"{{base}}/files/globex/{doc}-{year}.pdf",
+             "title": f"Globex {title} {year}", "score": 0.65},
+            {"url": f"{{base}}/files/{slug}/{doc}-{year - 1}.pdf",
+             "title": f"{company} {title} {year - 1}", "score": 0.6},
+        ])
+    return {"results": results[:max_results]}
+
+
+def _fill(results: Dict, base: str) -> Dict:
+    return json.loads(json.dumps(results).replace("{base}", base))
+
+
+def pdf_size(path: str) -> int:
+    for doc, size in DOC_SIZES.items():
+        if doc in path:
+            return size
+    return DOC_SIZES["annual-report"]
+
+
+def pdf_header(path: str) -> bytes:
+    name = path.rsplit("/", 1)[-1].rsplit(".", 1)[0]
+    years = _YEAR_RE.findall(name)
+    year = int(years[-1]) if years else 2023
+    company = path.strip("/").split("/")[1] if path.count("/") > 2 else "acme"
+    doc = next((d for d in DOC_TITLES if d in name), "annual-report")
+    title = f"{company.title()} {DOC_TITLES[doc]} {year}"
+    return (
+        b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n"
+        + f"1 0 obj\n<< /Title ({title}) /Producer (bench) /CreationDate (D:{year + 1}0315093000Z) >>\nendobj\n".encode()
+        + f"% {path}\n".encode()
+    )
+
+
+class ProviderStandIns:
+    """
+    `async with ProviderStandIns(...) as s:` then point TAVILY_API_BASE_URL at
+    `s.tavily_url` and SEC_BASE_URL at `s.url`.
+
+    `recording` maps queries to responses to replay; None synthesizes every
+    response and keeps it in `recorded`.
+    """
+
+    def __init__(
+        self,
+        recording: Optional[Dict[str, Dict]] = None,
+        search_latency: float = 0.3,
+        page_latency: float = 0.2,
+        ttfb: float = 0.15,
+        rate_mbps: float = 100,
+    ):
+        self.recording = recording
+        self.recorded: Dict[str, Dict] = {}
+        self.search_latency = search_latency
+        self.page_latency = page_latency
+        self.ttfb = ttfb
+        self.rate_bytes = rate_mbps * 1_000_000 / 8
+        self.requests: Counter = Counter()
+        self.misses: List[str] = []
+        self.bytes_sent = 0
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    @property
+    def tavily_url(self) -> str:
+        return f"{self.url}/tavily"
+
+    async def __aenter__(self) -> "ProviderStandIns":
+        app = web.Application()
+        app.router.add_post("/tavily/search", self._tavily)
+        app.router.add_get("/cgi-bin/browse-edgar", self._edgar)
+        app.router.add_get("/ir/{company}/investors", self._ir_page)
+        app.router.add_get("/pages/{tail:.*}", self._landing_page)
+        app.router.add_get("/files/{tail:.*}", self._file)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._runner.cleanup()
+
+    async def _tavily(self, request: web.Request) -> web.Response:
+        self.requests["tavily"] += 1
+        body = await request.json()
+        query = body.get("query", "")
+        await asyncio.sleep(self.search_latency)
+        if self.recording is None:
+            results = synthesize_tavily(query, body.get("max_results") or 10)
+            self.recorded[query] = results
+        else:
+            results = self.recording.get(query)
+            if results is None:
+                self.misses.append(query)
+                results = {"results": []}
+        return web.json_response({"query": query, "response_time": self.search_latency, **_fill(results, self.url)})
+
+    async def _edgar(self, request: web.Request) -> web.Response:
+        self.requests["edgar"] += 1
+        await asyncio.sleep(self.page_latency)
+        slug = _slug(request.query.get("company", ""))
+        rows = [
+            f'<tr><td>10-K</td><td><a href="/Archives/edgar/data/{slug}/{slug}-10-k-{year}.htm">'
+            f"Annual report {year} [Sections 13 and 15(d)]</a></td></tr>"
+            for year in UNDATED_YEARS
+        ]
+        html = "<html><body><table>\n" + "\n".join(rows) + "\n</table></body></html>"
+        return web.Response(text=html, content_type="text/html")
+
+    async def _ir_page(self, request: web.Request) -> web.Response:
+        self.requests["ir"] += 1
+        await asyncio.sleep(self.page_latency)
+        slug = request.match_info["company"]
+        links = [
+            f'<li><a href="{self.url}/files/{slug}/{doc}-{year}.pdf">{DOC_TITLES[doc]} {year}</a></li>'
+            for doc in DOC_SIZES
+            for year in UNDATED_YEARS
+        ]
+        html = "<html><body><ul>\n" + "\n".join(links) + "\n</ul></body></html>"
+        return web.Response(text=html, content_type="text/html")
+
+    async def _landing_page(self, request: web.Request) -> web.Response:
+        self.requests["pages"] += 1
+        await asyncio.sleep(self.page_latency)
+        return web.Response(text="<!doctype html><html><body>Download the report</body></html>", content_type="text/html")
+
+    async def _file(self, request: web.Request) -> web.StreamResponse:
+        self.requests["files"] += 1
+        path = request.path
+        await asyncio.sleep(self.ttfb)
+        if path.endswith("-summary.pdf"):
+            # An HTML page behind a .pdf URL, with a misleading Content-Type
+            html = "<!DOCTYPE html><html><head><title>Summary</title></head><body>" + "x" * 30_000 + "</body></html>"
+            return web.Response(text=html, content_type="application/pdf")
+
+        header = pdf_header(path)
+        total = pdf_size(path)
+        etag = '"' + hashlib.md5(header).hexdigest() + '"'
+        headers = {"Content-Type": "application/pdf", "ETag": etag, "Accept-Ranges": "bytes"}
+        start, end, status = 0, total - 1, 200
+        range_header = request.headers.get("Range")
+        if range_header and request.headers.get("If-Range", etag) == etag:
+            first, _, last = range_header.split("=", 1)[1].partition("-")
+            start, end, status = int(first), min(int(last), total - 1) if last else total - 1, 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+        resp = web.StreamResponse(status=status, headers=headers)
+        resp.content_length = end + 1 - start
+        await resp.prepare(request)
+
+        started = time.perf_counter()
+        sent = 0
+        try:
+            for pos in range(start, end + 1, CHUNK):
+                stop = min(pos + CHUNK, end + 1)
+                piece = self._body(header, pos, stop)
+                await resp.write(piece)
+                sent += len(piece)
+                ahead = sent / self.rate_bytes - (time.perf_counter() - started)
+                if ahead > 0:
+                    await asyncio.sleep(ahead)
+        except ConnectionResetError:
+            pass  # probes and segmented downloads hang up early
+        self.bytes_sent += sent
+        return resp
+
+    @staticmethod
+    def _body(header: bytes, start: int, stop: int) -> bytes:
+        """Bytes [start, stop) of a file made of `header` followed by filler."""
+        out = bytearray()
+        pos = start
+        if pos < len(header):
+            out += header[pos:min(stop, len(header))]
+            pos = len(header)
+        while pos < stop:
+            offset = pos % len(_FILLER)
+            take = min(stop - pos, len(_FILLER) - offset)
+            out += _FILLER[offset:offset + take]
+            pos += take
+        return bytes(out)
+
+
+def load_recording(path: str = FIXTURE_PATH) -> Dict[str, Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["queries"]
+
+
+def save_recording(recorded: Dict[str, Dict], path: str = FIXTURE_PATH):
+    """Merge `recorded` into the recording, keeping queries older code still sends."""
+    queries = load_recording(path) if os.path.exists(path) else {}
+    queries.update(recorded)
+    payload = {
+        "note": "Tavily responses replayed by benchmarks/pipeline_bench.py; regenerate with --record.",
+        "queries": dict(sorted(queries.items())),
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=1, ensure_ascii=False)
+        f.write("\n")
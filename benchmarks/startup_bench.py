@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark cold start of the API.
+
+Run with:
+    python -m benchmarks.startup_bench [--runs 5]
+
+Each run uses a fresh interpreter and scratch SQLite file. Reports the
+median time to `import backend.main` and the time from launching uvicorn
+to the first successful GET /health, plus the heavy SDKs (tavily, bs4,
+supabase, ...) that were already loaded after the import.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["tavily", "bs4", "lxml", "supabase", "pdfplumber"]
+
+_IMPORT_PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import backend.main
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def _env(tmp: str) -> dict:
+    return {**os.environ, "DATABASE_BACKEND": "sqlite", "SQLITE_PATH": os.path.join(tmp, "startup.db"),
+            "TEXT_CACHE_ROOT": os.path.join(tmp, "text")}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_import() -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        out = subprocess.run([sys.executable, "-c", _IMPORT_PROBE], cwd=ROOT, env=_env(tmp),
+                             capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def time_first_health(timeout: float = 60) -> float:
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=ROOT, env=_env(tmp), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            while time.perf_counter() - started < timeout:
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as r:
+                        if r.status == 200:
+                            return time.perf_counter() - started
+                except OSError:
+                    time.sleep(0.01)
+            raise TimeoutError("API did not answer /health")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    imports = [time_import() for _ in range(args.runs)]
+    health = [time_first_health() for _ in range(args.runs)]
+    print(f"import backend.main : {statistics.median(i['seconds'] for i in imports) * 1000:8.1f} ms (median of {args.runs})")
+    print(f"first /health       : {statistics.median(health) * 1000:8.1f} ms (median of {args.runs})")
+    print(f"heavy SDKs at import: {', '.join(imports[-1]['loaded']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Count Supabase round-trips per API request against a local PostgREST stand-in.
+
+Run with:
+    python -m benchmarks.supabase_bench [--requests 50] [--latency-ms 20]
+
+Simulates --requests pipeline runs, each saving --files-per-request rows from
+the metadata writer threads (a quarter of them duplicates) followed by
+--reads-per-request GET /files page loads. Runs once with batching and the
+read cache disabled (one insert per save, one query per read, as before) and
+once with the defaults, and reports round-trips per request and wall time.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend import database
+from backend.config import METADATA_WRITER_THREADS
+from benchmarks.postgrest_standin import FAKE_SERVICE_KEY, PostgrestStandIn
+
+
+def _doc(i: int) -> dict:
+    return {
+        "company": f"Company {i % 7}", "doc_type": "annual report", "year": 2000 + i % 25,
+        "file_path": f"data/downloads/{i}.pdf", "filename": f"{i}.pdf",
+        "url": f"https://example.com/{i}.pdf", "sha256": f"{i:064x}",
+        "mimetype": "application/pdf", "source": "bench", "indexed_at": 1700000000 + i,
+    }
+
+
+def run(args, batch: int, ttl: float) -> dict:
+    with PostgrestStandIn(latency=args.latency_ms / 1000) as server:
+        database.DATABASE_BACKEND = "supabase"
+        database.SUPABASE_URL = server.url
+        database.SUPABASE_KEY = FAKE_SERVICE_KEY
+        database.SUPABASE_WRITE_BATCH = batch
+        database.SUPABASE_CACHE_TTL = ttl
+        database._supabase_client = None
+        database._writer = None
+        database._invalidate_read_cache()
+
+        started = time.perf_counter()
+        next_id = 0
+        with ThreadPoolExecutor(METADATA_WRITER_THREADS) as pool:
+            for _ in range(args.requests):
+                ids = []
+                for _ in range(args.files_per_request):
+                    # Every fourth save re-finds a document that is already stored
+                    ids.append(next_id - 1 if next_id and len(ids) % 4 == 3 else next_id)
+                    next_id += 1
+                list(pool.map(database.save_file_metadata, [_doc(i) for i in ids]))
+                for page in range(args.reads_per_request):
+                    database.list_files(company=f"Company {page % 3}", limit=100)
+        elapsed = time.perf_counter() - started
+        database.close_database()
+        return {"round_trips": server.round_trips, "posts": server.requests["POST"],
+                "gets": server.requests["GET"], "seconds": elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--files-per-request", type=int, default=8)
+    parser.add_argument("--reads-per-request", type=int, default=6)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    defaults = (database.SUPABASE_WRITE_BATCH, database.SUPABASE_CACHE_TTL)
+    before = run(args, batch=1, ttl=0)
+    after = run(args, batch=defaults[0], ttl=defaults[1])
+    print(f"{'':>10}  {'POST':>6}  {'GET':>6}  {'trips/request':>13}  {'seconds':>8}")
+    for label, r in (("unbatched", before), ("batched", after)):
+        print(f"{label:>10}  {r['posts']:>6}  {r['gets']:>6}  {r['round_trips'] / args.requests:>13.1f}  {r['seconds']:>8.2f}")
+    saved = (before["round_trips"] - after["round_trips"]) / args.requests
+    print(f"round-trips saved per request: {saved:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Minimal OTLP/HTTP JSON trace collector for local debugging and tests.
+
+Accepts POST /v1/traces and keeps every span in memory. Run it on its own
+and point the API at it to see each request's span tree as it finishes:
+
+    python -m benchmarks.trace_collector_standin --port 4318
+    TRACE_EXPORT_URL=http://127.0.0.1:4318/v1/traces python run.py
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+
+class TraceCollectorStandIn:
+    """Use as `with TraceCollectorStandIn() as collector:`; export to `collector.url`."""
+
+    def __init__(self, port: int = 0, on_trace: Optional[Callable[[List[Dict]], None]] = None):
+        self.port = port
+        self.on_trace = on_trace
+        self.spans: List[Dict] = []
+        self._received = threading.Condition()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1/traces"
+
+    def __enter__(self) -> "TraceCollectorStandIn":
+        collector = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                spans = [
+                    span
+                    for resource in payload.get("resourceSpans", [])
+                    for scope in resource.get("scopeSpans", [])
+                    for span in scope.get("spans", [])
+                ]
+                with collector._received:
+                    collector.spans.extend(spans)
+                    collector._received.notify_all()
+                if collector.on_trace:
+                    collector.on_trace(spans)
+                body = b"{}"
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def wait_for(self, count: int, timeout: float = 5) -> bool:
+        """Block until at least `count` spans have arrived."""
+        with self._received:
+            return self._received.wait_for(lambda: len(self.spans) >= count, timeout)
+
+
+def format_tree(spans: List[Dict]) -> str:
+    """Render one trace's spans as an indented tree with durations."""
+    children: Dict[Optional[str], List[Dict]] = {}
+    for span in spans:
+        children.setdefault(span.get("parentSpanId"), []).append(span)
+    lines = []
+
+    def visit(span: Dict, depth: int):
+        ms = (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6
+        attrs = " ".join(
+            f"{a['key']}={next(iter(a['value'].values()))}" for a in span.get("attributes", [])
+        )
+        lines.append(f"{'  ' * depth}{span['name']:<{max(1, 24 - 2 * depth)}} {ms:10.1f} ms  {attrs}")
+        for child in sorted(children.get(span["spanId"], []), key=lambda s: int(s["startTimeUnixNano"])):
+            visit(child, depth + 1)
+
+    for root in children.get(None, []):
+        visit(root, 0)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=4318)
+    args = parser.parse_args()
+
+    with TraceCollectorStandIn(args.port, on_trace=lambda spans: print(format_tree(spans) + "\n", flush=True)) as c:
+        print(f"Collecting traces at {c.url} (Ctrl+C to stop)", flush=True)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Shared fixtures.
+
+`offline_pipeline` runs the pipeline against the provider stand-ins in
+benchmarks/provider_standins.py, with downloads, manifest and text cache
+under the test's tmp_path. Stand-in options (recording, latencies,
+rate_mbps) default to a fast replay of the recorded fixture; change them
+for a whole test with
+
+    @pytest.mark.parametrize("offline_pipeline", [{"rate_mbps": 40}], indirect=True)
+
+or for one run by passing them to `run` / `stand_ins`.
+"""
+import asyncio
+import contextlib
+import os
+import tempfile
+from pathlib import Path
+from typing import AsyncIterator, List, Tuple
+
+os.environ["DATABASE_BACKEND"] = "sqlite"
+os.environ.setdefault("SQLITE_PATH", str(Path(tempfile.mkdtemp()) / "tests.db"))
+
+import pytest  # noqa: E402
+
+from backend import database, pipeline  # noqa: E402
+from backend.models import DownloadRequest, DownloadResponse  # noqa: E402
+from backend.services import downloader, extraction_worker, ir_scraper, manifest, metadata, sec, web_search  # noqa: E402
+from benchmarks.provider_standins import ProviderStandIns, load_recording  # noqa: E402
+
+STAND_IN_DEFAULTS = {"search_latency": 0.05, "page_latency": 0, "ttfb": 0, "rate_mbps": 10_000}
+
+
+class OfflinePipeline:
+    def __init__(self, monkeypatch, **options):
+        self.monkeypatch = monkeypatch
+        self.options = {**STAND_IN_DEFAULTS, **options}
+
+    @contextlib.asynccontextmanager
+    async def stand_ins(self, **options) -> AsyncIterator[ProviderStandIns]:
+        """Serve every provider from the stand-ins; flushes metadata writes on the way out."""
+        options = {**self.options, **options}
+        recording = options.pop("recording") if "recording" in options else load_recording()
+        async with ProviderStandIns(recording, **options) as stand_ins:
+            self.monkeypatch.setattr(web_search, "TAVILY_API_BASE_URL", stand_ins.tavily_url)
+            self.monkeypatch.setattr(sec, "SEC_BASE_URL", stand_ins.url)
+            try:
+                yield stand_ins
+            finally:
+                metadata.shutdown_metadata_writer()
+
+    def run(self, *requests: DownloadRequest, **options) -> Tuple[ProviderStandIns, List[DownloadResponse]]:
+        """Run `requests` concurrently through the pipeline."""
+        async def go():
+            async with self.stand_ins(**options) as stand_ins:
+                return stand_ins, await asyncio.gather(*(pipeline.run_pipeline(r) for r in requests))
+
+        return asyncio.run(go())
+
+
+@pytest.fixture
+def offline_pipeline(request, tmp_path, monkeypatch) -> OfflinePipeline:
+    monkeypatch.setenv("TAVILY_API_KEY", "bench")
+    monkeypatch.setattr(ir_scraper, "candidate_ir_urls", lambda company: [])
+    monkeypatch.setattr(downloader, "DOWNLOAD_ROOT", str(tmp_path / "downloads"))
+    monkeypatch.setattr(manifest, "METADATA_ROOT", str(tmp_path / "metadata"))
+    monkeypatch.setattr(extraction_worker, "TEXT_CACHE_ROOT", str(tmp_path / "text"))
+    monkeypatch.setattr(extraction_worker, "_queue_conn", None)
+    database.init_database()
+    return OfflinePipeline(monkeypatch, **getattr(request, "param", {}))
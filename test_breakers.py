@@ -0,0 +1,94 @@
+"""
+Checks the per-provider circuit breakers: tripping on errors and slow
+calls, failing fast while open, half-open trials, and the /breakers API.
+
+Run with:
+    python -m pytest test_breakers.py
+"""
+import asyncio
+import socket
+import time
+
+import httpx
+
+from backend import main
+from backend.models import Intent
+from backend.services import sec
+from backend.util import breaker as breaker_mod
+from backend.util.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, guarded, provider_error
+from backend.util.deadline import Deadline
+
+
+def test_breaker_opens_fails_fast_and_recovers_through_half_open():
+    b = CircuitBreaker("test", slow_seconds=1.0, window=10, min_calls=4, error_rate=0.5, open_seconds=0.05)
+    for failed in (False, True, False, True):
+        assert b.allow()
+        b.record(failed, 0.01)
+    assert b.state == OPEN and not b.allow() and b.rejected == 1
+
+    time.sleep(0.06)
+    assert b.state == HALF_OPEN
+    assert b.allow() and not b.allow()  # one trial at a time
+    b.record(True, 0.01)
+    assert b.state == OPEN
+
+    time.sleep(0.06)
+    assert b.allow()
+    b.record(False, 0.01)
+    assert b.state == CLOSED and b.snapshot()["calls"] == 0
+
+
+def test_slow_calls_trip_the_breaker():
+    b = CircuitBreaker("slow", slow_seconds=0.5, min_calls=3, slow_rate=0.5)
+    for seconds in (0.1, 0.6, 0.7):
+        b.allow()
+        b.record(False, seconds)
+    assert b.state == OPEN
+
+
+def test_guarded_counts_reported_errors_and_ignores_expired_deadlines(monkeypatch):
+    monkeypatch.setattr(breaker_mod, "_breakers", {})
+    calls = []
+
+    @guarded("flaky", fallback=list)
+    def provider(fail, deadline=None):
+        calls.append(fail)
+        if fail:
+            provider_error("flaky")
+        return ["hit"]
+
+    for _ in range(10):
+        provider(True, deadline=Deadline(0))
+    assert breaker_mod.breaker("flaky").state == CLOSED
+
+    for _ in range(5):
+        assert provider(True) == ["hit"]
+    assert breaker_mod.breaker_states()["flaky"]["state"] == OPEN
+    assert provider(False) == [] and len(calls) == 15
+
+
+def test_sec_outage_fails_fast_and_shows_in_api(monkeypatch):
+    monkeypatch.setattr(breaker_mod, "_breakers", {})
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    # Nothing listens here, so every lookup is refused
+    monkeypatch.setattr(sec, "SEC_BASE_URL", f"http://127.0.0.1:{port}")
+    intent = Intent(company="Acme Industries", doc_type="10-K", years=[2022])
+
+    for _ in range(5):
+        assert sec.find_sec_documents(intent) == []
+    assert breaker_mod.breaker("sec").state == OPEN
+    started = time.perf_counter()
+    assert sec.find_sec_documents(intent) == []
+    assert time.perf_counter() - started < 0.01
+
+    async def fetch():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+            return (await client.get("/breakers")).json()
+
+    states = asyncio.run(fetch())
+    assert states["sec"]["state"] == OPEN and states["sec"]["rejected"] == 1
+    assert states["sec"]["retry_in"] > 0
+    assert states["tavily"]["state"] == CLOSED
@@ -0,0 +1,134 @@
+"""
+Checks that identical intents in flight at once share one pipeline run.
+
+Run with:
+    python -m pytest test_coalescing.py
+"""
+import asyncio
+
+import pytest
+
+from backend import pipeline
+from backend.models import DownloadRequest
+from backend.util.singleflight import SingleFlight
+from benchmarks.pipeline_bench import SCENARIOS
+
+
+def test_singleflight_survives_leader_cancellation_and_shares_errors():
+    async def go():
+        flights = SingleFlight()
+        calls = []
+
+        async def work(value):
+            calls.append(value)
+            await asyncio.sleep(0.05)
+            if value == "boom":
+                raise RuntimeError("provider down")
+            return value
+
+        leader = asyncio.ensure_future(flights.do("k", lambda: work("ok")))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do("k", lambda: work("unused")))
+        await asyncio.sleep(0)
+        leader.cancel()
+        shared_result = await follower
+
+        failures = await asyncio.gather(
+            flights.do("e", lambda: work("boom")),
+            flights.do("e", lambda: work("boom")),
+            return_exceptions=True,
+        )
+        fresh = await flights.do("k", lambda: work("again"))
+        return calls, shared_result, failures, fresh, len(flights)
+
+    calls, shared_result, failures, fresh, pending = asyncio.run(go())
+    assert shared_result == ("ok", True)
+    assert [str(f) for f in failures] == ["provider down", "provider down"]
+    assert fresh == ("again", False)
+    assert calls == ["ok", "boom", "again"]
+    assert pending == 0
+
+
+def test_identical_concurrent_requests_share_one_run(offline_pipeline):
+    single = DownloadRequest(**SCENARIOS["single_year"])
+    alone, _ = offline_pipeline.run(single)
+
+    together, responses = offline_pipeline.run(*[DownloadRequest(**SCENARIOS["single_year"]) for _ in range(5)])
+    assert together.requests == alone.requests
+    hashes = {tuple(r.sha256 for r in response.results) for response in responses}
+    assert len(hashes) == 1 and len(next(iter(hashes))) == 1
+
+
+def test_different_years_are_not_coalesced():
+    base = DownloadRequest(prompt="Acme annual report 2023")
+    other = DownloadRequest(prompt="Acme annual report 2022")
+    ticker = DownloadRequest(prompt="Acme annual report 2023", ticker="acme ")
+    intent = pipeline.parse_prompt(base.prompt)
+    assert pipeline._intent_key(base, intent) != pipeline._intent_key(other, pipeline.parse_prompt(other.prompt))
+    assert pipeline._intent_key(ticker, intent) == (("ticker", "ACME"), "annual report", (2023,), None, None)
+
+
+def test_runs_that_stop_sooner_are_not_joined():
+    from backend.util.deadline import Deadline, outlasts
+
+    async def go():
+        flights = SingleFlight()
+        short, late = Deadline(0.1), Deadline(10)
+
+        async def work(value):
+            await asyncio.sleep(0.02)
+            return value
+
+        return await asyncio.gather(
+            flights.do("k", lambda: work("short"), short, outlasts),
+            flights.do("k", lambda: work("unbounded"), None, outlasts),
+            flights.do("k", lambda: work("late"), late, outlasts),
+            flights.do("k", lambda: work("shorter"), Deadline(0.05), outlasts),
+        )
+
+    assert asyncio.run(go()) == [("short", False), ("unbounded", False), ("unbounded", True), ("unbounded", True)]
+
+
+def test_request_without_deadline_does_not_join_a_hurried_run(offline_pipeline):
+    # Started first, the 30 ms run is cut off during search
+    hurried = DownloadRequest(**SCENARIOS["five_year_window"], deadline_ms=30)
+    patient = DownloadRequest(**SCENARIOS["five_year_window"])
+    _, (cut, full) = offline_pipeline.run(hurried, patient)
+    assert {c.status for c in cut.coverage} == {"incomplete"}
+    assert [c.status for c in full.coverage] == ["downloaded"] * 5 and len(full.results) == 5
+
+
+def test_only_runs_on_about_the_same_deadline_are_joined():
+    from backend.util.deadline import Deadline, ends_with
+
+    async def go():
+        flights = SingleFlight()
+        deadline = Deadline(5)
+
+        async def work(value):
+            await asyncio.sleep(0.02)
+            return value
+
+        return await asyncio.gather(
+            flights.do("k", lambda: work("unbounded"), None, ends_with),
+            flights.do("k", lambda: work("five"), deadline, ends_with),
+            flights.do("k", lambda: work("again"), Deadline(5.05), ends_with),
+            flights.do("k", lambda: work("longer"), Deadline(8), ends_with),
+            flights.do("k", lambda: work("shorter"), Deadline(1), ends_with),
+        )
+
+    assert asyncio.run(go()) == [
+        ("unbounded", False), ("five", False), ("five", True), ("longer", False), ("shorter", False),
+    ]
+
+
+@pytest.mark.parametrize("offline_pipeline", [{"rate_mbps": 80}], indirect=True)
+def test_deadline_request_keeps_its_partial_results_beside_a_longer_run(offline_pipeline):
+    # 6 MB reports at 80 Mbit/s take about 0.6 s each; the unbounded run needs ~3 s
+    patient = DownloadRequest(**SCENARIOS["five_year_window"])
+    hurried = DownloadRequest(**SCENARIOS["five_year_window"], deadline_ms=1500)
+    _, (full, partial) = offline_pipeline.run(patient, hurried)
+    assert len(full.results) == 5
+    statuses = [c.status for c in partial.coverage]
+    assert partial.results and statuses.count("downloaded") == len(partial.results)
+    assert "incomplete" in statuses
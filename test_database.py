@@ -41,6 +41,112 @@ def main():
     print("Search Example Co:", database.search_files(company="Example Co", limit=3))
 
 
+def test_concurrent_saves_are_batched_and_deduplicated():
+    from concurrent.futures import ThreadPoolExecutor
+
+    database.init_database()
+    tag = str(time.time())
+    payloads = [
+        {
+            "company": "Batch Co",
+            "doc_type": "annual_report",
+            "year": 2020 + (i % 4),
+            "file_path": f"data/downloads/batch_{i}.pdf",
+            "filename": f"batch_{i}.pdf",
+            "url": f"https://example.com/batch_{i}.pdf",
+            "sha256": f"{tag}-{i % 20}",
+            "mimetype": "application/pdf",
+            "source": "smoke-test",
+        }
+        for i in range(40)
+    ]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        inserted = list(pool.map(database.save_file_metadata, payloads))
+    assert sum(inserted) == 20
+    rows = database.search_files(company="Batch Co", limit=1000)
+    assert len({row["sha256"] for row in rows if row["sha256"].startswith(tag)}) == 20
+
+
+
+def _filing(tag, company, year):
+    return {
+        "company": company,
+        "doc_type": "annual_report",
+        "year": year,
+        "file_path": f"data/downloads/{company}_{year}.pdf",
+        "filename": f"{company}_{year}.pdf",
+        "url": "https://example.com/shared.pdf",
+        "sha256": f"{tag}-shared",
+        "mimetype": "application/pdf",
+        "source": "smoke-test",
+    }
+
+
+def test_same_file_gets_one_catalog_row_per_caller():
+    database.init_database()
+    tag = str(time.time())
+    assert database.save_file_metadata(_filing(tag, "Parent Co", 2023))
+    # Indexed before the other callers file it; one index entry covers them all
+    assert database.save_document_text(f"{tag}-shared", f"consolidated {tag[-6:]}")
+    assert database.save_file_metadata(_filing(tag, "Subsidiary Co", 2023))
+    assert database.save_file_metadata(_filing(tag, "Parent Co", None))
+    assert not database.save_file_metadata(_filing(tag, "Subsidiary Co", 2023))
+    assert not database.save_file_metadata(_filing(tag, "Parent Co", None))
+
+    rows = [row for row in database.list_files(limit=1000) if row["sha256"] == f"{tag}-shared"]
+    assert sorted((row["company"], row["year"] or 0) for row in rows) == [
+        ("Parent Co", 0), ("Parent Co", 2023), ("Subsidiary Co", 2023),
+    ]
+    hits = database.search_documents(f"consolidated {tag[-6:]}")
+    assert [hit["id"] for hit in hits] == [max(row["id"] for row in rows)]
+
+
+def test_catalog_unique_on_sha256_is_migrated(tmp_path, monkeypatch):
+    import sqlite3
+
+    path = tmp_path / "old.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            """
+            CREATE TABLE files (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                company TEXT NOT NULL,
+                doc_type TEXT NOT NULL,
+                year INTEGER,
+                file_path TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                url TEXT NOT NULL,
+                sha256 TEXT NOT NULL UNIQUE,
+                mimetype TEXT,
+                source TEXT,
+                indexed_at INTEGER,
+                created_at TEXT NOT NULL
+            );
+            """
+        )
+        conn.execute(
+            "INSERT INTO files (id, company, doc_type, year, file_path, filename, url, sha256, created_at) "
+            "VALUES (7, 'Old Co', 'annual_report', 2021, 'a.pdf', 'a.pdf', 'https://example.com/a.pdf', 'old', 'then');"
+        )
+        # Text indexed per catalog row, before text_fts
+        conn.execute(
+            "CREATE TABLE file_text (sha256 TEXT PRIMARY KEY, pages INTEGER, chars INTEGER, extracted_at INTEGER NOT NULL);"
+        )
+        conn.execute("INSERT INTO file_text VALUES ('old', 1, 17, 0);")
+        conn.execute("CREATE VIRTUAL TABLE files_fts USING fts5(body, tokenize='porter unicode61');")
+        conn.execute("INSERT INTO files_fts (rowid, body) VALUES (7, 'legacy goodwill impairment');")
+    monkeypatch.setattr(database, "SQLITE_PATH", path)
+    monkeypatch.setattr(database, "_sqlite_conn", None)
+    database.init_database()
+    database.init_database()  # already migrated: a no-op
+
+    assert database.save_file_metadata({**_filing("old", "New Co", 2021), "sha256": "old"})
+    rows = {row["company"]: row["id"] for row in database.list_files(limit=10)}
+    assert rows["Old Co"] == 7 and "New Co" in rows
+    assert database.has_document_text("old")
+    assert [hit["sha256"] for hit in database.search_documents("goodwill impairment")] == ["old"]
+
+
 if __name__ == "__main__":
     main()
 
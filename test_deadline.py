@@ -0,0 +1,46 @@
+"""
+Checks that a request deadline bounds the pipeline and marks the target
+years it cut short.
+
+Run with:
+    python -m pytest test_deadline.py
+"""
+import time
+
+import pytest
+
+from backend.models import DownloadRequest
+from backend.util.deadline import MIN_TIMEOUT, Deadline, budget, expired
+from benchmarks.pipeline_bench import SCENARIOS
+
+
+def test_budget_caps_stage_timeouts():
+    assert budget(None, 30) == 30 and not expired(None)
+    deadline = Deadline(2)
+    assert 1.5 < budget(deadline, 30) <= 2
+    assert budget(deadline, 0.5) == 0.5
+    assert budget(deadline, 30, share=0.25) <= 0.5
+    gone = Deadline(0)
+    assert expired(gone) and budget(gone, 30) == MIN_TIMEOUT
+    assert Deadline.from_ms(None) is None
+
+
+def test_no_deadline_reports_every_year(offline_pipeline):
+    _, (response,) = offline_pipeline.run(DownloadRequest(**SCENARIOS["single_year"]))
+    assert [(c.year, c.status) for c in response.coverage] == [(2023, "downloaded")]
+
+
+# 6 MB reports at 40 Mbit/s take about 1.2 s each, so five don't fit in 2 s
+@pytest.mark.parametrize("offline_pipeline", [{"rate_mbps": 40}], indirect=True)
+def test_deadline_returns_partial_results_in_time(offline_pipeline):
+    req = DownloadRequest(**SCENARIOS["five_year_window"], deadline_ms=2000)
+    started = time.perf_counter()
+    _, (response,) = offline_pipeline.run(req)
+    elapsed = time.perf_counter() - started
+
+    statuses = {c.year: c.status for c in response.coverage}
+    assert sorted(statuses) == [2019, 2020, 2021, 2022, 2023]
+    downloaded = [y for y, status in statuses.items() if status == "downloaded"]
+    assert downloaded and "incomplete" in statuses.values()
+    assert len(response.results) == len(downloaded)
+    assert elapsed < 3.0
@@ -0,0 +1,365 @@
+"""
+Exercises download_one against a local aiohttp server.
+
+Run with:
+    python -m pytest test_downloader.py
+"""
+import asyncio
+import os
+import tempfile
+from collections import deque
+
+import pytest
+from aiohttp import web
+
+from backend.models import FoundFile
+from backend.services import downloader
+from backend.util import http
+
+PDF_BODY = b"%PDF-1.7\n" + b"0" * 200_000
+FLAKY_BODY = b"%PDF-1.5\n" + bytes(range(256)) * 4000
+FLAKY_ETAG = '"flaky-v1"'
+SEGMENTED_BODY = b"%PDF-1.6\n" + bytes(range(251)) * 8000
+SEGMENTED_ETAG = '"segmented-v1"'
+range_requests = []
+segment_requests = []
+shared_requests = []
+busy_requests = []
+stalled_requests = []
+
+
+def _app():
+    async def pdf_as_octet_stream(request):
+        return web.Response(body=PDF_BODY, content_type="application/octet-stream")
+
+    async def landing_page(request):
+        body = b"<!DOCTYPE html><html><head><title>Annual report</title></head>" + b" " * 500_000
+        return web.Response(body=body, content_type="application/pdf")
+
+    async def wrong_year(request):
+        body = b"%PDF-1.7\n1 0 obj << /Title (Acme Annual Report 2019) /CreationDate (D:20200301) >>\n"
+        return web.Response(body=body + b"0" * 300_000, content_type="application/pdf")
+
+    async def right_year(request):
+        body = b"%PDF-1.7\n1 0 obj << /Title (Acme Annual Report 2023) /CreationDate (D:20240215) >>\n"
+        return web.Response(body=body + b"0" * 300_000, content_type="application/pdf")
+
+    async def flaky(request):
+        # Cuts the first transfer off halfway; honours Range + If-Range afterwards
+        range_header = request.headers.get("Range")
+        if range_header and request.headers.get("If-Range") == FLAKY_ETAG:
+            range_requests.append(range_header)
+            start = int(range_header.split("=")[1].rstrip("-"))
+            return web.Response(
+                status=206,
+                body=FLAKY_BODY[start:],
+                headers={
+                    "Content-Type": "application/pdf",
+                    "ETag": FLAKY_ETAG,
+                    "Content-Range": f"bytes {start}-{len(FLAKY_BODY) - 1}/{len(FLAKY_BODY)}",
+                },
+            )
+        resp = web.StreamResponse(headers={"Content-Type": "application/pdf", "ETag": FLAKY_ETAG})
+        resp.content_length = len(FLAKY_BODY)
+        await resp.prepare(request)
+        await resp.write(FLAKY_BODY[: len(FLAKY_BODY) // 2])
+        request.transport.close()
+        return resp
+
+    async def segmented(request):
+        # Range-capable server; the first ranged response for the last segment
+        # is cut off so the resume path has something to pick up
+        total = len(SEGMENTED_BODY)
+        headers = {"Content-Type": "application/pdf", "ETag": SEGMENTED_ETAG, "Accept-Ranges": "bytes"}
+        range_header = request.headers.get("Range")
+        if not range_header:
+            return web.Response(body=SEGMENTED_BODY, headers=headers)
+        assert request.headers.get("If-Range") == SEGMENTED_ETAG
+        start, end = (int(x) for x in range_header.split("=")[1].split("-"))
+        segment_requests.append((start, end))
+        headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+        if end == total - 1 and len(segment_requests) <= 3:
+            resp = web.StreamResponse(status=206, headers=headers)
+            resp.content_length = end + 1 - start
+            await resp.prepare(request)
+            await resp.write(SEGMENTED_BODY[start:start + 1000])
+            request.transport.close()
+            return resp
+        return web.Response(status=206, body=SEGMENTED_BODY[start:end + 1], headers=headers)
+
+    async def slow_shared(request):
+        shared_requests.append(str(request.rel_url))
+        await asyncio.sleep(0.1)
+        return web.Response(body=PDF_BODY, content_type="application/pdf")
+
+    async def busy(request):
+        busy_requests.append(request.headers.get("Range"))
+        if len(busy_requests) == 1:
+            return web.Response(status=503, headers={"Retry-After": "0"})
+        return web.Response(body=PDF_BODY, content_type="application/pdf")
+
+    async def stalled(request):
+        # The first request sits on its headers, as a stuck CDN node would
+        stalled_requests.append(request.path)
+        if len(stalled_requests) == 1:
+            await asyncio.sleep(1.5)
+        return web.Response(body=PDF_BODY, content_type="application/pdf")
+
+    app = web.Application()
+    app.router.add_get("/busy.pdf", busy)
+    app.router.add_get("/stalled.pdf", stalled)
+    app.router.add_get("/shared.pdf", slow_shared)
+    app.router.add_get("/segmented.pdf", segmented)
+    app.router.add_get("/flaky.pdf", flaky)
+    app.router.add_get("/report.pdf", pdf_as_octet_stream)
+    app.router.add_get("/landing.pdf", landing_page)
+    app.router.add_get("/wrong-year.pdf", wrong_year)
+    app.router.add_get("/right-year.pdf", right_year)
+    return app
+
+
+@pytest.fixture(autouse=True)
+def no_first_byte_history(monkeypatch):
+    # Times seen by earlier tests would switch hedging on and double requests
+    monkeypatch.setattr(http, "_first_byte_seconds", deque(maxlen=500))
+
+
+def _run(coro_factory):
+    async def runner():
+        runner = web.AppRunner(_app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            return await coro_factory(f"http://127.0.0.1:{port}")
+        finally:
+            await runner.cleanup()
+    return asyncio.run(runner())
+
+
+def _found(url):
+    return FoundFile(url=url, title="Acme annual report 2023", year=2023, mimetype=None, source="Web", confidence=0.9)
+
+
+def test_html_disguised_as_pdf_is_rejected(monkeypatch):
+    monkeypatch.setattr(downloader, "DOWNLOAD_ROOT", tempfile.mkdtemp())
+
+    async def go(base):
+        return await downloader.download_one("Acme", "annual report", 2023, _found(f"{base}/landing.pdf")), base
+
+    result, base = _run(go)
+    assert result is None
+    assert downloader.is_rejected(f"{base}/landing.pdf")
+
+
+def test_pdf_sniffed_from_octet_stream(monkeypatch):
+    monkeypatch.setattr(downloader, "DOWNLOAD_ROOT", tempfile.mkdtemp())
+
+    async def go(base):
+        return await downloader.download_one("Acme", "annual report", 2023, _found(f"{base}/report.pdf"))
+
+    df = _run(go)
+    assert df is not None
+    assert df.mimetype == "application/pdf"
+    assert df.filename.endswith(".pdf")
+    with open(df.file_path, "rb") as f:
+        assert f.read() == PDF_BODY
+    assert os.path.getsize(df.file_path) == len(PDF_BODY)
+
+
+def test_probe_reranks_by_pdf_info_and_drops_html():
+    from backend.services.probe import rank_candidate_groups
+
+    async def go(base):
+        group = [
+            FoundFile(url=f"{base}/landing.pdf", title="Acme 2023", year=2023, mimetype=None, source="Web", confidence=0.95),
+            FoundFile(url=f"{base}/wrong-year.pdf", title="Acme 2023", year=2023, mimetype=None, source="Web", confidence=0.9),
+            FoundFile(url=f"{base}/right-year.pdf", title="Acme 2023", year=2023, mimetype=None, source="Web", confidence=0.7),
+        ]
+        return await rank_candidate_groups([group], [2023]), base
+
+    ranked, base = _run(go)
+    assert [f.url for f in ranked[0]] == [f"{base}/right-year.pdf", f"{base}/wrong-year.pdf"]
+    assert downloader.is_rejected(f"{base}/landing.pdf")
+
+
+def test_interrupted_download_resumes_from_part_file(monkeypatch):
+    import hashlib
+
+    root = tempfile.mkdtemp()
+    monkeypatch.setattr(downloader, "DOWNLOAD_ROOT", root)
+    range_requests.clear()
+    # One try per call, so the resume is left to the second download_one
+    monkeypatch.setattr(http, "RETRY_ATTEMPTS", 1)
+
+    async def go(base):
+        f = _found(f"{base}/flaky.pdf")
+        first = await downloader.download_one("Acme", "annual report", 2023, f)
+        part = downloader.partial_path_for(f.url)
+        kept = os.path.getsize(part) if os.path.exists(part) else 0
+        second = await downloader.download_one("Acme", "annual report", 2023, f)
+        return first, kept, second, part
+
+    first, kept, second, part = _run(go)
+    assert first is None
+    assert 0 < kept < len(FLAKY_BODY)
+    assert range_requests == [f"bytes={kept}-"]
+    assert second is not None
+    assert second.sha256 == hashlib.sha256(FLAKY_BODY).hexdigest()
+    assert not os.path.exists(part) and not os.path.exists(part + ".json")
+
+
+def test_segmented_download_resumes_unfinished_segments(tmp_path):
+    import hashlib
+    from backend.util import transfer
+
+    segment_requests.clear()
+    part = str(tmp_path / "segmented.part")
+
+    async def go(base):
+        url = f"{base}/segmented.pdf"
+        try:
+            await transfer.download_to_file(url, part, segments=4, segment_threshold=1)
+        except Exception:
+            pass
+        first_round = list(segment_requests)
+        result = await transfer.download_to_file(url, part, segments=4, segment_threshold=1)
+        return first_round, result
+
+    first_round, (content_type, size) = _run(go)
+    total = len(SEGMENTED_BODY)
+    # Segment 0 rides on the original response; three ranged requests cover the rest
+    assert len(first_round) == 3 and min(start for start, _ in first_round) > 0
+    # Only the interrupted tail segment is fetched again, from where it stopped
+    last_start = max(start for start, _ in first_round)
+    assert segment_requests[3:] == [(last_start + 1000, total - 1)]
+    assert content_type == "application/pdf" and size == total
+    with open(part, "rb") as f:
+        assert hashlib.sha256(f.read()).hexdigest() == hashlib.sha256(SEGMENTED_BODY).hexdigest()
+
+
+def test_concurrent_downloads_of_one_url_share_the_transfer(monkeypatch):
+    import hashlib
+    from backend.util.http import canonical_url
+
+    root = tempfile.mkdtemp()
+    monkeypatch.setattr(downloader, "DOWNLOAD_ROOT", root)
+    shared_requests.clear()
+
+    async def go(base):
+        loud = base.replace("http://", "HTTP://")
+        spellings = [f"{base}/shared.pdf", f"{loud}/shared.pdf?utm_source=news#page=2"]
+        return await asyncio.gather(
+            downloader.download_one("Acme", "annual report", 2023, _found(spellings[0])),
+            downloader.download_one("Acme", "10-K", 2023, _found(spellings[1])),
+            downloader.download_one("Acme", "annual report", 2022, _found(spellings[0])),
+        ), spellings
+
+    results, spellings = _run(go)
+    assert canonical_url(spellings[1]) == canonical_url(spellings[0])
+    assert shared_requests == ["/shared.pdf"]
+    assert len({df.file_path for df in results}) == 3
+    assert {df.sha256 for df in results} == {hashlib.sha256(PDF_BODY).hexdigest()}
+    for df in results:
+        with open(df.file_path, "rb") as f:
+            assert f.read() == PDF_BODY
+    assert not os.path.exists(downloader.partial_path_for(spellings[0]))
+    assert not downloader._transfer_users
+
+
+def test_new_transfer_does_not_touch_filed_copies(monkeypatch):
+    monkeypatch.setattr(downloader, "DOWNLOAD_ROOT", tempfile.mkdtemp())
+    real_copy = downloader._file_copy
+    sources, urls = [], []
+
+    def copy_then_restart(src, dst):
+        real_copy(src, dst)
+        sources.append(src)
+        if len(sources) == 1:
+            # What a new download_one of the URL does to its part file meanwhile
+            with open(downloader.partial_path_for(urls[0]), "wb") as f:
+                f.write(b"<html>")
+
+    monkeypatch.setattr(downloader, "_file_copy", copy_then_restart)
+
+    async def go(base):
+        urls.append(f"{base}/shared.pdf")
+        return await asyncio.gather(
+            downloader.download_one("Acme", "annual report", 2023, _found(urls[0])),
+            downloader.download_one("Acme Holdings", "annual report", 2023, _found(urls[0])),
+        )
+
+    results = _run(go)
+    assert len(sources) == 2 and downloader.partial_path_for(urls[0]) not in sources
+    for df in results:
+        with open(df.file_path, "rb") as f:
+            assert f.read() == PDF_BODY
+    assert not any(os.path.exists(src) for src in sources) and not downloader._staged
+
+
+def test_call_without_deadline_does_not_join_a_hurried_transfer(monkeypatch):
+    from backend.util.deadline import Deadline
+
+    monkeypatch.setattr(downloader, "DOWNLOAD_ROOT", tempfile.mkdtemp())
+
+    async def go(base):
+        f = _found(f"{base}/shared.pdf")
+        return await asyncio.gather(
+            downloader.download_one("Acme", "annual report", 2023, f, Deadline(0.001)),
+            downloader.download_one("Acme", "annual report", 2022, f),
+        )
+
+    hurried, patient = _run(go)
+    assert hurried is None
+    assert patient is not None and os.path.getsize(patient.file_path) == len(PDF_BODY)
+    assert not downloader._transfer_users and not downloader._staged
+
+
+def test_transient_failures_are_retried_within_one_call(monkeypatch):
+    import hashlib
+
+    monkeypatch.setattr(downloader, "DOWNLOAD_ROOT", tempfile.mkdtemp())
+    monkeypatch.setattr(http, "RETRY_BASE_DELAY", 0.01)
+    range_requests.clear()
+    busy_requests.clear()
+
+    async def go(base):
+        cut = await downloader.download_one("Acme", "annual report", 2023, _found(f"{base}/flaky.pdf"))
+        throttled = await downloader.download_one("Acme", "annual report", 2022, _found(f"{base}/busy.pdf"))
+        return cut, throttled
+
+    cut, throttled = _run(go)
+    # The cut-off transfer resumes from its part file on the retry
+    assert cut is not None and cut.sha256 == hashlib.sha256(FLAKY_BODY).hexdigest()
+    assert len(range_requests) == 1
+    assert throttled is not None and len(busy_requests) == 2
+
+
+def test_retry_delay_honours_retry_after():
+    assert http.retry_after_seconds({"Retry-After": "7"}) == 7
+    assert http.retry_after_seconds({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0
+    assert http.retry_after_seconds({}) is None
+    assert http.backoff_delay(0, retry_after=2.5) == 2.5
+    assert http.backoff_delay(0, retry_after=3600) == http.RETRY_MAX_DELAY
+    assert all(0 <= http.backoff_delay(3) <= http.RETRY_BASE_DELAY * 8 for _ in range(50))
+
+
+def test_late_first_byte_is_hedged():
+    import aiohttp
+
+    stalled_requests.clear()
+
+    async def go(base):
+        started = asyncio.get_running_loop().time()
+        async with aiohttp.ClientSession() as s:
+            async with await http.hedged_get(s, f"{base}/stalled.pdf", hedge_after=0.1) as r:
+                body = await r.read()
+        return body, asyncio.get_running_loop().time() - started
+
+    body, elapsed = _run(go)
+    assert body == PDF_BODY
+    assert len(stalled_requests) == 2 and elapsed < 1
+    # The cancelled primary counts too, with what it had waited so far
+    fast, stalled = sorted(http._first_byte_seconds)
+    assert fast < 0.1 <= stalled
@@ -0,0 +1,93 @@
+"""
+Checks the process-pool text extraction queue, including restarts.
+
+Run with:
+    python -m pytest test_extraction_worker.py
+"""
+import os
+import tempfile
+import time
+from pathlib import Path
+
+os.environ["DATABASE_BACKEND"] = "sqlite"
+os.environ.setdefault("SQLITE_PATH", str(Path(tempfile.mkdtemp()) / "extraction.db"))
+
+from backend import database  # noqa: E402
+from backend.models import DownloadedFile  # noqa: E402
+from backend.services import extraction_worker  # noqa: E402
+
+
+def _make_file(root: Path, name: str, text: str) -> DownloadedFile:
+    path = root / f"{name}.txt"
+    path.write_text(text, encoding="utf-8")
+    sha = f"{name}-{time.time()}"
+    database.save_file_metadata({
+        "company": "Worker Co", "doc_type": "annual report", "year": 2024,
+        "file_path": str(path), "filename": path.name, "url": f"https://example.com/{name}",
+        "sha256": sha, "mimetype": "text/plain", "source": "IR",
+    })
+    return DownloadedFile(
+        company="Worker Co", doc_type="annual report", year=2024, file_path=str(path),
+        filename=path.name, url=f"https://example.com/{name}", sha256=sha,
+        mimetype="text/plain", source="IR",
+    )
+
+
+def test_queue_survives_restart_and_skips_processed(tmp_path, monkeypatch):
+    monkeypatch.setattr(extraction_worker, "TEXT_CACHE_ROOT", str(tmp_path / "text"))
+    monkeypatch.setattr(extraction_worker, "_queue_conn", None)
+    database.init_database()
+
+    first = _make_file(tmp_path, "first", "segment sales by geography")
+    second = _make_file(tmp_path, "second", "operating margin outlook")
+
+    # Nothing running yet: work is only recorded in the persistent queue
+    assert extraction_worker.enqueue_extraction(first)
+    assert extraction_worker.enqueue_extraction(second)
+    assert extraction_worker.pending_count() == 2
+
+    worker = extraction_worker.start_extraction_worker(workers=2)
+    try:
+        assert worker.drain(timeout=60)
+        stats = worker.stats()
+    finally:
+        extraction_worker.stop_extraction_worker()
+
+    assert stats["files"] == 2 and stats["pages"] == 2
+    assert database.has_document_text(first.sha256)
+    assert os.path.exists(extraction_worker.cache_path_for(first.sha256))
+    assert [r["sha256"] for r in database.search_documents("operating margin")] == [second.sha256]
+
+    # Already indexed hashes are not queued again
+    assert not extraction_worker.enqueue_extraction(first)
+    assert extraction_worker.pending_count() == 0
+
+
+def test_dispatcher_replaces_a_broken_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(extraction_worker, "TEXT_CACHE_ROOT", str(tmp_path / "text"))
+    monkeypatch.setattr(extraction_worker, "_queue_conn", None)
+    database.init_database()
+
+    worker = extraction_worker.start_extraction_worker(workers=1)
+    try:
+        warm = _make_file(tmp_path, "warm", "pool is up")
+        extraction_worker.enqueue_extraction(warm)
+        assert worker.drain(timeout=60)
+        # What a segfaulting or OOM-killed child leaves behind
+        broken = worker._pool
+        for process in list(broken._processes.values()):
+            process.kill()
+        deadline = time.monotonic() + 10
+        while not broken._broken and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        after = _make_file(tmp_path, "after", "dividend policy unchanged")
+        extraction_worker.enqueue_extraction(after)
+        assert worker.drain(timeout=60)
+        stats = extraction_worker.extraction_stats()
+    finally:
+        extraction_worker.stop_extraction_worker()
+
+    assert stats["running"]
+    assert database.has_document_text(after.sha256)
+    assert stats["files"] == 2 and stats["failures"] == 0
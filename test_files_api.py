@@ -0,0 +1,124 @@
+"""
+Checks keyset pagination, filters and ETags on GET /files.
+
+Run with:
+    python -m pytest test_files_api.py
+"""
+import importlib
+import os
+import tempfile
+from pathlib import Path
+
+os.environ["DATABASE_BACKEND"] = "sqlite"
+os.environ["SQLITE_PATH"] = str(Path(tempfile.mkdtemp()) / "files_api.db")
+
+import backend.database as database  # noqa: E402
+
+importlib.reload(database)
+
+import backend.main as main  # noqa: E402
+
+importlib.reload(main)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+client = TestClient(main.app)
+
+
+def _seed():
+    database.init_database()
+    rows = []
+    for i in range(25):
+        rows.append({
+            "company": "Acme" if i % 2 else "Globex",
+            "doc_type": "files api report",
+            "year": 2015 + i % 5,
+            "file_path": f"data/downloads/{i}.pdf",
+            "filename": f"{i}.pdf",
+            "url": f"https://example.com/{i}.pdf",
+            "sha256": f"files-api-{i}",
+            "mimetype": "application/pdf",
+            "source": "SEC" if i % 3 else "Tavily",
+            # Pairs share a timestamp so the id tie-breaker is exercised
+            "indexed_at": 1_700_000_000 + i // 2,
+        })
+    database.save_files_metadata(rows)
+
+
+_seed()
+
+
+def test_keyset_pages_cover_catalog_without_overlap():
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 7, "doc_type": "files api report"}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get("/files", params=params).json()
+        seen.extend(item["sha256"] for item in body["items"])
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+    assert len(seen) == 25
+    assert len(set(seen)) == 25
+    assert seen == [row["sha256"] for row in database.list_files(doc_type="files api report", limit=100)]
+
+
+def test_filters_and_etag():
+    resp = client.get("/files", params={"company": "Acme", "source": "SEC"})
+    items = resp.json()["items"]
+    assert items and all(i["company"] == "Acme" and i["source"] == "SEC" for i in items)
+
+    etag = resp.headers["etag"]
+    again = client.get(
+        "/files",
+        params={"company": "Acme", "source": "SEC"},
+        headers={"If-None-Match": etag},
+    )
+    assert again.status_code == 304
+
+
+def test_invalid_cursor_is_rejected():
+    assert client.get("/files", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_search_ranks_indexed_text(tmp_path, monkeypatch):
+    from backend.models import DownloadedFile
+    from backend.services import extraction_worker
+
+    monkeypatch.setattr(extraction_worker, "TEXT_CACHE_ROOT", str(tmp_path / "text"))
+    monkeypatch.setattr(extraction_worker, "_queue_conn", None)
+
+    docs = {
+        "search-a": "Revenue guidance for fiscal 2024 was raised. Revenue guidance remains strong.",
+        "search-b": "The board approved a dividend. Revenue was flat.",
+    }
+    for sha, text in docs.items():
+        path = tmp_path / f"{sha}.txt"
+        path.write_text(text, encoding="utf-8")
+        database.save_file_metadata({
+            "company": "Initech", "doc_type": "annual report", "year": 2024,
+            "file_path": str(path), "filename": path.name, "url": f"https://example.com/{sha}",
+            "sha256": sha, "mimetype": "text/plain", "source": "IR",
+        })
+        df = DownloadedFile(
+            company="Initech", doc_type="annual report", year=2024, file_path=str(path),
+            filename=path.name, url=f"https://example.com/{sha}", sha256=sha,
+            mimetype="text/plain", source="IR",
+        )
+        assert extraction_worker.enqueue_extraction(df)
+
+    # Indexed the way downloads are: through the extraction worker
+    worker = extraction_worker.start_extraction_worker(workers=1)
+    try:
+        assert worker.drain(timeout=60)
+    finally:
+        extraction_worker.stop_extraction_worker()
+    assert not extraction_worker.enqueue_extraction(df)  # already indexed by hash
+
+    items = client.get("/search", params={"q": "revenue guidance"}).json()["items"]
+    assert [i["sha256"] for i in items] == ["search-a"]
+    assert "[guidance]" in items[0]["snippet"].lower()
+    hits = client.get("/search", params={"q": "revenue"}).json()["items"]
+    assert {i["sha256"] for i in hits if i["company"] == "Initech"} == {"search-a", "search-b"}
@@ -0,0 +1,64 @@
+"""
+Soak test: 50 concurrent /download calls against the provider stand-ins must
+not hold the event loop longer than the lag budget.
+
+Run with:
+    python -m pytest test_loop_lag.py
+
+LOOP_LAG_BUDGET_MS overrides the budget (default 250 ms). When it fails, the
+log carries the stack of every blocking step the watchdog caught.
+"""
+import asyncio
+import logging
+import os
+import time
+
+import httpx
+import pytest
+
+from backend import main
+from backend.loop_monitor import LoopMonitor
+
+CONCURRENT_REQUESTS = 50
+LAG_BUDGET = float(os.getenv("LOOP_LAG_BUDGET_MS", "250")) / 1000
+
+
+def _company(i: int) -> str:
+    # The parser drops digits from company names
+    return "Soak" + chr(ord("a") + i // 26) + chr(ord("a") + i % 26)
+
+
+# Responses are synthesized so every company gets its own documents
+@pytest.mark.parametrize(
+    "offline_pipeline",
+    [{"recording": None, "page_latency": 0.02, "ttfb": 0.02, "rate_mbps": 400}],
+    indirect=True,
+)
+def test_concurrent_downloads_stay_within_loop_lag_budget(offline_pipeline, caplog):
+    caplog.set_level(logging.WARNING, logger="backend.loop_monitor")
+
+    async def go():
+        monitor = LoopMonitor(interval=0.02, threshold_ms=LAG_BUDGET * 1000, debug=True)
+        async with offline_pipeline.stand_ins():
+            monitor.start()
+            transport = httpx.ASGITransport(app=main.app)
+            try:
+                async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=120) as client:
+                    started = time.perf_counter()
+                    responses = await asyncio.gather(*(
+                        client.post("/download", json={"prompt": f"{_company(i)} earnings release 2023"})
+                        for i in range(CONCURRENT_REQUESTS)
+                    ))
+                    elapsed = time.perf_counter() - started
+            finally:
+                await monitor.stop()
+        return responses, monitor, elapsed
+
+    responses, monitor, elapsed = asyncio.run(go())
+    assert all(r.status_code == 200 for r in responses)
+    assert sum(len(r.json()["results"]) for r in responses) == CONCURRENT_REQUESTS
+    assert monitor.samples > 0
+    assert monitor.max_lag <= LAG_BUDGET, (
+        f"event loop held for {monitor.max_lag * 1000:.0f} ms (budget {LAG_BUDGET * 1000:.0f} ms) "
+        f"over {elapsed:.1f}s; {monitor.stalls} stalls logged"
+    )
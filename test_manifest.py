@@ -0,0 +1,108 @@
+"""
+Checks the append-only metadata manifest: sidecar compaction and replay,
+and that a failed catalog write is reported rather than passed off as stored.
+
+Run with:
+    python -m pytest test_manifest.py
+"""
+import asyncio
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+os.environ["DATABASE_BACKEND"] = "sqlite"
+os.environ.setdefault("SQLITE_PATH", str(Path(tempfile.mkdtemp()) / "manifest.db"))
+
+import pytest  # noqa: E402
+
+from backend import database, pipeline  # noqa: E402
+from backend.models import DownloadedFile, DownloadRequest, FoundFile  # noqa: E402
+from backend.services import manifest, metadata  # noqa: E402
+
+
+def _record(sha: str, indexed_at: int) -> dict:
+    return {
+        "company": "Manifest Co", "doc_type": "manifest report", "year": 2023,
+        "file_path": f"data/downloads/{sha}.pdf", "filename": f"{sha}.pdf",
+        "url": f"https://example.com/{sha}.pdf", "sha256": sha,
+        "mimetype": "application/pdf", "source": "IR", "indexed_at": indexed_at,
+    }
+
+
+def test_compact_folds_sidecars_and_replay_rebuilds(tmp_path):
+    root = str(tmp_path)
+    stamp = str(time.time()).replace(".", "")
+    day_one, day_two = 1700000000, 1700000000 + 86400
+    old = [_record(f"{stamp}-a", day_one), _record(f"{stamp}-b", day_one + 60), _record(f"{stamp}-c", day_two)]
+    for record in old:
+        with open(tmp_path / f"{record['sha256']}.json", "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=2)
+    # Already in the manifest, so its sidecar is a duplicate
+    with open(tmp_path / "dupe.json", "w", encoding="utf-8") as f:
+        json.dump(old[2], f)
+    manifest._append_lines(manifest.segment_path("2023-11-15", root=root), [manifest._encode(old[2])])
+
+    stats = manifest.compact(root, compress=True)
+    assert stats["folded"] == 2 and stats["duplicates"] == 2
+    assert not list(tmp_path.glob("*.json"))
+    assert sorted(os.listdir(root)) == ["2023-11-14.jsonl.gz", "2023-11-15.jsonl.gz"]
+    assert [r["sha256"] for r in manifest.iter_records(root)] == [r["sha256"] for r in old]
+
+    # A torn trailing line is skipped, not fatal
+    manifest._append_lines(manifest.segment_path("2023-11-15", True, root), ['{"company": "Trunc'])
+    database.init_database()
+    assert manifest.replay(root) == {"records": 3, "inserted": 3}
+    assert manifest.replay(root) == {"records": 3, "inserted": 0}
+    rows = database.list_files(doc_type="manifest report", limit=50)
+    assert {r["sha256"] for r in rows} >= {r["sha256"] for r in old}
+
+
+def _downloaded(year: int, url: str, source: str = "SaveTest") -> DownloadedFile:
+    return DownloadedFile(company="Initech", doc_type="annual report", year=year, file_path=f"/tmp/{year}.pdf",
+                          filename=f"{year}.pdf", url=url, sha256=str(year) * 16,
+                          mimetype="application/pdf", source=source)
+
+
+def test_failed_catalog_write_is_not_reported_as_stored(tmp_path, monkeypatch):
+    monkeypatch.setattr(manifest, "METADATA_ROOT", str(tmp_path))
+    monkeypatch.setattr(metadata, "enqueue_extraction", lambda df: True)
+
+    def flaky_save(doc):
+        if doc["year"] == 2022:
+            raise RuntimeError("database is locked")
+        return True
+
+    async def fake_search(intent, deadline=None):
+        return [
+            FoundFile(url=f"https://save.example/initech-annual-report-{year}.pdf",
+                      title=f"Initech annual report {year}", year=year, mimetype="application/pdf",
+                      source="SaveTest", confidence=0.9)
+            for year in (2022, 2023)
+        ]
+
+    async def fake_rank(groups, years, deadline=None):
+        return groups
+
+    async def fake_download(company, doc_type, year, f, deadline=None):
+        return _downloaded(year, f.url, f.source)
+
+    monkeypatch.setattr(metadata, "save_file_metadata", flaky_save)
+    monkeypatch.setattr(pipeline, "route_search", fake_search)
+    monkeypatch.setattr(pipeline, "rank_candidate_groups", fake_rank)
+    monkeypatch.setattr(pipeline, "download_one", fake_download)
+
+    async def run():
+        try:
+            with pytest.raises(RuntimeError):
+                await metadata.write_metadata_async(_downloaded(2022, "https://save.example/direct.pdf"))
+            return await pipeline.run_pipeline(DownloadRequest(prompt="Initech annual reports 2022 2023"))
+        finally:
+            metadata.shutdown_metadata_writer()
+
+    response = asyncio.run(run())
+    assert [df.year for df in response.results] == [2023]
+    assert [(c.year, c.status) for c in response.coverage] == [(2022, "not_saved"), (2023, "downloaded")]
+    # Only the stored file reached the manifest
+    assert [r["year"] for r in manifest.iter_records(str(tmp_path))] == [2023]
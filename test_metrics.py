@@ -0,0 +1,67 @@
+"""
+Checks that a pipeline run shows up on GET /metrics.
+
+Run with:
+    python -m pytest test_metrics.py
+"""
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from backend import main, pipeline
+from backend.models import DownloadedFile, DownloadRequest, FoundFile
+
+
+def _sample(text: str, name: str, labels: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(f"{name}{{{labels}}}") or (not labels and line.startswith(name + " ")):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_pipeline_stages_and_counters_are_exported(monkeypatch):
+    found = [
+        FoundFile(url="https://metrics.example/globex-annual-report-2023.pdf", title="Globex annual report 2023",
+                  year=2023, mimetype="application/pdf", source="MetricsTest", confidence=0.9),
+        FoundFile(url="https://metrics.example/other-2023.pdf", title="Unrelated press kit 2023",
+                  year=2023, mimetype="application/pdf", source="MetricsTest", confidence=0.5),
+    ]
+
+    async def fake_search(intent, deadline=None):
+        return list(found)
+
+    async def fake_rank(groups, years, deadline=None):
+        return groups
+
+    async def fake_download(company, doc_type, year, f, deadline=None):
+        return DownloadedFile(company=company, doc_type=doc_type, year=year, file_path="/tmp/x.pdf",
+                              filename="x.pdf", url=f.url, sha256="0" * 64, mimetype="application/pdf",
+                              source=f.source)
+
+    async def fake_write(df):
+        return None
+
+    monkeypatch.setattr(pipeline, "route_search", fake_search)
+    monkeypatch.setattr(pipeline, "rank_candidate_groups", fake_rank)
+    monkeypatch.setattr(pipeline, "download_one", fake_download)
+    monkeypatch.setattr(pipeline, "write_metadata_async", fake_write)
+
+    client = TestClient(main.app)
+    before = client.get("/metrics").text
+    prompt = "Globex annual report 2023"
+    for _ in range(2):
+        asyncio.run(pipeline.run_pipeline(DownloadRequest(prompt=prompt)))
+    resp = client.get("/metrics")
+    assert resp.status_code == 200 and resp.headers["content-type"].startswith("text/plain")
+    after = resp.text
+
+    def delta(name, labels=""):
+        return _sample(after, name, labels) - _sample(before, name, labels)
+
+    assert delta("irfetcher_stage_seconds_count", 'stage="parse"') == 2
+    assert delta("irfetcher_stage_seconds_count", 'stage="filter"') == 2
+    assert delta("irfetcher_candidates_total", 'source="MetricsTest",stage="found"') == 4
+    assert delta("irfetcher_candidates_total", 'source="MetricsTest",stage="filtered"') == 2
+    assert delta("irfetcher_candidates_total", 'source="MetricsTest",stage="accepted"') == 2
+    # The second identical prompt is served from the parser cache
+    assert delta("irfetcher_parse_cache_hits_total") >= 1
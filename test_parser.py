@@ -0,0 +1,28 @@
+"""
+Checks that the single-pass prompt parser matches the original parser.
+
+Run with:
+    python -m pytest test_parser.py
+"""
+from backend.agents.parser import parse_prompt
+from benchmarks.parser_bench import build_corpus, find_mismatches
+
+
+def test_parser_matches_legacy_on_corpus():
+    corpus = build_corpus(size=3000)
+    assert find_mismatches(corpus) == []
+
+
+def test_overlapping_period_patterns_keep_priority():
+    # "year-end quarter" (Q4) overlaps "quarter one" (Q1); Q1 is checked first.
+    assert parse_prompt("Apple year-end quarter one 2023").extras == {"quarter": "Q1"}
+    assert parse_prompt("Apple H2 and Q4 results").extras == {"quarter": "Q4"}
+
+
+def test_cached_intents_are_not_shared():
+    first = parse_prompt("Infosys annual report 2023")
+    first.doc_types.append("10-K")
+    first.extras["ticker"] = "INFY"
+    second = parse_prompt("Infosys annual report 2023")
+    assert second.doc_types == ["annual report"]
+    assert "ticker" not in second.extras
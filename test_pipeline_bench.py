@@ -0,0 +1,23 @@
+"""
+Runs one benchmark scenario in-process against the provider stand-ins.
+
+Run with:
+    python -m pytest test_pipeline_bench.py
+"""
+import os
+
+import pytest
+
+from backend.models import DownloadRequest
+from benchmarks.pipeline_bench import SCENARIOS
+from benchmarks.provider_standins import DOC_SIZES
+
+
+@pytest.mark.parametrize("offline_pipeline", [{"search_latency": 0}], indirect=True)
+def test_sec_fallback_scenario_replays_offline(offline_pipeline):
+    stand_ins, (response,) = offline_pipeline.run(DownloadRequest(**SCENARIOS["sec_fallback"]))
+    assert not stand_ins.misses
+    # Tavily has one hit for a 10-K, so the router also asks EDGAR
+    assert stand_ins.requests["edgar"] == 1
+    assert [r.year for r in response.results] == [2022]
+    assert os.path.getsize(response.results[0].file_path) == DOC_SIZES["10-k"]
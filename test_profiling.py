@@ -0,0 +1,73 @@
+"""
+Checks the guarded per-request profiler and the tracemalloc admin endpoint.
+
+Run with:
+    python -m pytest test_profiling.py
+"""
+import asyncio
+import os
+import pstats
+from pathlib import Path
+
+import httpx
+import pytest
+
+from backend import main, profiling
+from benchmarks.pipeline_bench import SCENARIOS
+
+TOKEN = "profile-secret"
+
+
+@pytest.mark.parametrize("offline_pipeline", [{"search_latency": 0}], indirect=True)
+def test_profile_flag_saves_one_request_profile(offline_pipeline, tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", TOKEN)
+
+    async def go():
+        async with offline_pipeline.stand_ins():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=60) as client:
+                body = SCENARIOS["single_year"]
+                plain = await client.post("/download", json=body)
+                denied = await client.post("/download", json=body, headers={"X-Profile": "wrong"})
+                profiled = await client.post("/download", json=body, headers={"X-Profile": TOKEN})
+                by_query = await client.post(f"/download?profile={TOKEN}", json=body)
+        return plain, denied, profiled, by_query
+
+    plain, denied, profiled, by_query = asyncio.run(go())
+    assert plain.status_code == 200 and plain.json()["profile"] is None
+    assert denied.status_code == 403
+    assert len(profiled.json()["results"]) == 1
+
+    path = profiled.json()["profile"]
+    assert os.path.dirname(path) == str(tmp_path / "profiles")
+    functions = {name for _, _, name in pstats.Stats(path).stats}
+    assert "_run_single_intent" in functions
+    summary = Path(path).with_suffix(".txt").read_text()
+    assert summary.startswith(f"prompt: {SCENARIOS['single_year']['prompt']}")
+    assert by_query.json()["profile"] not in (None, path)
+
+
+def test_tracemalloc_endpoint_reports_growth(monkeypatch):
+    async def go():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+            disabled = await client.post("/admin/tracemalloc")
+            monkeypatch.setattr(profiling, "ADMIN_TOKEN", TOKEN)
+            headers = {"X-Admin-Token": TOKEN}
+            forbidden = await client.post("/admin/tracemalloc")
+            baseline = await client.post("/admin/tracemalloc", headers=headers)
+            retained = [bytearray(1024) for _ in range(2000)]
+            diff = await client.post("/admin/tracemalloc", params={"limit": 5}, headers=headers)
+            stopped = await client.delete("/admin/tracemalloc", headers=headers)
+            del retained
+        return disabled, forbidden, baseline, diff, stopped
+
+    disabled, forbidden, baseline, diff, stopped = asyncio.run(go())
+    assert disabled.status_code == 404
+    assert forbidden.status_code == 403
+    assert baseline.json()["started"] is True and baseline.json()["diff"] == []
+    top = diff.json()["diff"][0]
+    assert "test_profiling.py" in top["location"]
+    assert top["size_diff"] >= 2000 * 1024
+    assert stopped.json() == {"stopped": True}
@@ -0,0 +1,72 @@
+"""
+Checks provider ordering from per-company download history.
+
+Run with:
+    python -m pytest test_search_router.py
+"""
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+
+os.environ["DATABASE_BACKEND"] = "sqlite"
+os.environ.setdefault("SQLITE_PATH", str(Path(tempfile.mkdtemp()) / "search_router.db"))
+
+from backend import database  # noqa: E402
+from backend.agents import search_router  # noqa: E402
+from backend.agents.search_router import plan_providers  # noqa: E402
+from backend.models import FoundFile, Intent  # noqa: E402
+
+
+def test_plan_orders_by_yield_and_skips_fruitless_providers():
+    assert plan_providers("annual report", {}) == ["tavily", "sec", "ir"]
+    assert plan_providers("investor presentation", {}) == ["tavily", "ir"]
+
+    sec_wins = {"tavily": {"attempts": 8, "wins": 2}, "sec": {"attempts": 8, "wins": 6}}
+    # IR has no history yet, so its prior (0.5) beats Tavily's 3 in 10
+    assert plan_providers("10-K", sec_wins, explore=False) == ["sec", "ir", "tavily"]
+
+    tavily_dry = {"tavily": {"attempts": 6, "wins": 0}, "ir": {"attempts": 6, "wins": 5}}
+    assert plan_providers("annual report", tavily_dry, explore=False) == ["ir", "sec"]
+    # Exploration falls back to the default order, skipped providers included
+    assert plan_providers("annual report", tavily_dry, explore=True) == ["tavily", "sec", "ir"]
+    # Too few attempts to call a provider fruitless
+    assert "tavily" in plan_providers("annual report", {"tavily": {"attempts": 2, "wins": 0}}, explore=False)
+
+
+def test_route_search_follows_recorded_history(monkeypatch):
+    database.init_database()
+    monkeypatch.setattr(search_router, "ROUTER_EXPLORE_RATE", 0.0)
+    calls = []
+
+    def fake(provider, count):
+        def find(intent, deadline=None):
+            calls.append(provider)
+            return [
+                FoundFile(url=f"https://{provider}.example.com/{i}.pdf", title=f"Routeco annual report {i}",
+                          year=2023, mimetype="application/pdf", source=provider.upper(), confidence=0.8)
+                for i in range(count)
+            ]
+        return find
+
+    monkeypatch.setattr(search_router, "web_find_documents", fake("tavily", 0))
+    monkeypatch.setattr(search_router, "find_sec_documents", fake("sec", 6))
+    monkeypatch.setattr(search_router, "find_ir_documents", fake("ir", 0))
+    intent = Intent(company="Routeco Holdings", doc_type="annual report", years=[2023])
+    key = search_router.stats_key(intent)
+
+    asyncio.run(search_router.route_search(intent))
+    assert calls == ["tavily", "sec"]
+
+    for _ in range(5):
+        database.record_provider_outcome(key, "annual report", attempted=["tavily", "sec"], won=["sec"])
+    calls.clear()
+    found = asyncio.run(search_router.route_search(intent))
+    # SEC always delivered and Tavily never did: SEC alone now answers
+    assert calls == ["sec"] and len(found) == 6
+
+    asyncio.run(search_router.record_download_sources(intent, ["SEC", "Unknown"]))
+    stats = database.get_provider_stats(key, "annual report")
+    assert stats["sec"] == {"attempts": 7, "wins": 6}
+    assert stats["tavily"] == {"attempts": 6, "wins": 0}
+    assert "unknown" not in stats
@@ -0,0 +1,24 @@
+"""
+Checks that importing the API has no side effects and stays light.
+
+Run with:
+    python -m pytest test_startup.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_import_does_not_touch_database_or_load_sdks(tmp_path):
+    db_path = tmp_path / "never-created.db"
+    code = (
+        "import json, sys; import backend.main; "
+        "print(json.dumps([m for m in ('tavily', 'bs4', 'lxml', 'supabase') if m in sys.modules]))"
+    )
+    env = {**os.environ, "DATABASE_BACKEND": "sqlite", "SQLITE_PATH": str(db_path)}
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    assert json.loads(out.stdout.strip().splitlines()[-1]) == []
+    assert not db_path.exists()
@@ -0,0 +1,67 @@
+"""
+Runs the Supabase code paths of database.py against a local PostgREST stand-in.
+
+Run with:
+    python -m pytest test_supabase_backend.py
+"""
+import pytest
+
+pytest.importorskip("supabase")
+
+from backend import database  # noqa: E402
+from benchmarks.postgrest_standin import FAKE_SERVICE_KEY, PostgrestStandIn  # noqa: E402
+
+
+def _doc(i: int) -> dict:
+    return {
+        "company": "Stand-in Co", "doc_type": "annual report", "year": 2000 + i,
+        "file_path": f"data/downloads/{i}.pdf", "filename": f"{i}.pdf",
+        "url": f"https://example.com/{i}.pdf", "sha256": f"{i:064x}",
+        "mimetype": "application/pdf", "source": "IR", "indexed_at": 1700000000 + i,
+    }
+
+
+@pytest.fixture
+def supabase_backend(monkeypatch):
+    with PostgrestStandIn() as server:
+        monkeypatch.setattr(database, "DATABASE_BACKEND", "supabase")
+        monkeypatch.setattr(database, "SUPABASE_URL", server.url)
+        monkeypatch.setattr(database, "SUPABASE_KEY", FAKE_SERVICE_KEY)
+        monkeypatch.setattr(database, "_supabase_client", None)
+        monkeypatch.setattr(database, "_writer", None)
+        monkeypatch.setattr(database, "_read_cache", {})
+        try:
+            yield server
+        finally:
+            database.close_database()
+
+
+def test_batched_upsert_ignores_duplicates(supabase_backend):
+    server = supabase_backend
+    assert database.save_file_metadata(_doc(0))
+    # A duplicate is reported as "not new" rather than surfacing a 409
+    assert not database.save_file_metadata(_doc(0))
+
+    flags = database.save_files_metadata([_doc(i) for i in range(1, 9)] + [_doc(0), _doc(3)])
+    assert flags == [True] * 8 + [False, False]
+    assert len(server.tables["files"]) == 9
+    # Ten rows went over in one request
+    assert server.requests["POST"] == 3
+
+
+def test_reads_are_cached_until_a_write(supabase_backend):
+    server = supabase_backend
+    database.save_files_metadata([_doc(i) for i in range(6)])
+
+    first = database.list_files(company="Stand-in Co", limit=4)
+    again = database.list_files(company="Stand-in Co", limit=4)
+    assert first == again and [row["year"] for row in first] == [2005, 2004, 2003, 2002]
+    assert server.requests["GET"] == 1
+
+    after = (first[-1]["indexed_at"], first[-1]["id"])
+    assert [row["year"] for row in database.list_files(company="Stand-in Co", limit=4, after=after)] == [2001, 2000]
+    assert server.requests["GET"] == 2
+
+    database.save_file_metadata(_doc(6))
+    assert database.list_files(company="Stand-in Co", limit=4)[0]["year"] == 2006
+    assert server.requests["GET"] == 3
@@ -0,0 +1,99 @@
+"""
+Checks the debug_timings span tree and its export to a trace collector.
+
+Run with:
+    python -m pytest test_tracing.py
+"""
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+
+os.environ["DATABASE_BACKEND"] = "sqlite"
+os.environ.setdefault("SQLITE_PATH", str(Path(tempfile.mkdtemp()) / "tracing.db"))
+
+import tavily  # noqa: E402
+from aiohttp import web  # noqa: E402
+
+from backend import database, pipeline, tracing  # noqa: E402
+from backend.models import DownloadRequest  # noqa: E402
+from backend.services import downloader, extraction_worker, manifest  # noqa: E402
+from benchmarks.trace_collector_standin import TraceCollectorStandIn  # noqa: E402
+
+PDF_BODY = b"%PDF-1.7\n" + b"1" * 250_000
+
+
+class FakeTavily:
+    base = ""
+
+    def __init__(self, api_key):
+        pass
+
+    def search(self, query, **kwargs):
+        return {"results": [
+            {"url": f"{self.base}/tracecorp-annual-report-2023-{i}.pdf",
+             "title": f"Tracecorp annual report 2023 part {i}", "score": 0.9 - i / 10}
+            for i in range(5)
+        ]}
+
+
+def _walk(node, depth=0):
+    yield node, depth
+    for child in node.children:
+        yield from _walk(child, depth + 1)
+
+
+def test_debug_timings_span_tree_and_export(tmp_path, monkeypatch):
+    monkeypatch.setenv("TAVILY_API_KEY", "test")
+    monkeypatch.setattr(tavily, "TavilyClient", FakeTavily)
+    monkeypatch.setattr(downloader, "DOWNLOAD_ROOT", str(tmp_path / "downloads"))
+    monkeypatch.setattr(manifest, "METADATA_ROOT", str(tmp_path / "metadata"))
+    monkeypatch.setattr(extraction_worker, "TEXT_CACHE_ROOT", str(tmp_path / "text"))
+    monkeypatch.setattr(extraction_worker, "_queue_conn", None)
+    database.init_database()
+
+    async def serve_pdf(request):
+        return web.Response(body=PDF_BODY, content_type="application/pdf")
+
+    async def go(collector_url):
+        app = web.Application()
+        app.router.add_get("/{name}", serve_pdf)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        FakeTavily.base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        monkeypatch.setattr(tracing, "TRACE_EXPORT_URL", collector_url)
+        try:
+            traced = await pipeline.run_pipeline(DownloadRequest(prompt="Tracecorp annual report 2023", debug_timings=True))
+            plain = await pipeline.run_pipeline(DownloadRequest(prompt="Tracecorp annual report 2023"))
+            await asyncio.gather(*tracing._pending_exports)
+            return traced, plain
+        finally:
+            await runner.cleanup()
+            manifest.close_manifest()
+
+    with TraceCollectorStandIn() as collector:
+        traced, plain = asyncio.run(go(collector.url))
+        # Without debug_timings the tree is still exported, just not returned
+        assert plain.timings is None
+        assert collector.wait_for(2)
+        exported = list(collector.spans)
+
+    root = traced.timings
+    assert root.name == "pipeline" and len(traced.results) == 1
+    spans = {node.name: node for node, _ in _walk(root)}
+    assert {"parse", "doc_type", "search", "provider", "tavily_query", "filter", "probe", "download", "db_write"} <= set(spans)
+    assert spans["provider"].attributes["provider"] == "tavily"
+    # Tavily queries ran on a worker thread but still hang off the provider span
+    assert all(c.name == "tavily_query" for c in spans["provider"].children) and spans["provider"].children
+    download = spans["download"]
+    assert download.attributes["bytes"] == len(PDF_BODY) and download.attributes["mb_per_s"] > 0
+    assert spans["db_write"].attributes["inserted"] in (True, False)
+    assert all(node.start_ms >= 0 and node.duration_ms >= 0 for node, _ in _walk(root))
+
+    roots = [s for s in exported if "parentSpanId" not in s]
+    assert len(roots) == 2 and all(s["name"] == "pipeline" for s in roots)
+    ids = {s["spanId"] for s in exported}
+    assert all(s["parentSpanId"] in ids for s in exported if "parentSpanId" in s)
+    assert {s["name"] for s in exported} >= {"tavily_query", "download", "db_write"}
@@ -0,0 +1,91 @@
+"""
+Checks the per-year query planning in web_find_documents.
+
+Run with:
+    python -m pytest test_web_search.py
+"""
+import re
+import threading
+
+import tavily
+
+from backend.models import Intent
+from backend.services import web_search
+
+
+class FakeTavily:
+    covered = ()
+    queries = []
+    lock = threading.Lock()
+
+    def __init__(self, api_key):
+        pass
+
+    def search(self, query, **kwargs):
+        with self.lock:
+            self.queries.append(query)
+        named = [int(y) for y in re.findall(r"\b(20\d{2})\b", query)]
+        years = named or self.covered
+        return {"results": [
+            {"url": f"https://ir.example.com/acme-annual-report-{y}.pdf",
+             "title": f"Acme annual report {y}", "score": 0.85}
+            for y in years
+        ]}
+
+
+def _run(monkeypatch, years, covered):
+    monkeypatch.setenv("TAVILY_API_KEY", "test")
+    monkeypatch.setattr(tavily, "TavilyClient", FakeTavily)
+    FakeTavily.covered = covered
+    FakeTavily.queries = []
+    found = web_search.web_find_documents(Intent(company="Acme", doc_type="annual report", years=years))
+    return found, FakeTavily.queries
+
+
+def test_window_targets_only_uncovered_years(monkeypatch):
+    found, queries = _run(monkeypatch, [2019, 2020, 2021, 2022, 2023], covered=(2019, 2020))
+    # One broad query covers two years; the next adds nothing, so the
+    # remaining three years each get a targeted query
+    targeted = sorted(q for q in queries if re.search(r"20\d{2}", q))
+    assert len(queries) == 5
+    assert [re.search(r"20\d{2}", q).group() for q in targeted] == ["2021", "2022", "2023"]
+    assert {f.year for f in found} == {2019, 2020, 2021, 2022, 2023}
+
+
+def test_single_year_stops_once_covered(monkeypatch):
+    found, queries = _run(monkeypatch, [2023], covered=())
+    assert len(queries) == 1
+    assert [f.year for f in found] == [2023]
+
+
+def test_low_confidence_results_do_not_satisfy_a_year(monkeypatch):
+    monkeypatch.setattr(web_search, "YEAR_CONFIDENCE_THRESHOLD", 1.01)
+    _, queries = _run(monkeypatch, [2023], covered=())
+    assert len(queries) == 4
+
+
+def test_client_honours_base_url_override(monkeypatch):
+    monkeypatch.setattr(web_search, "TAVILY_API_BASE_URL", "http://127.0.0.1:9/tavily")
+    assert web_search.tavily_client("test").base_url == "http://127.0.0.1:9/tavily"
+
+
+def test_deadline_bounds_a_real_client_query(monkeypatch):
+    import asyncio
+    import time
+
+    from backend.util.deadline import Deadline
+    from benchmarks.provider_standins import ProviderStandIns
+
+    async def go():
+        async with ProviderStandIns(search_latency=0.5, page_latency=0, ttfb=0) as stand_ins:
+            monkeypatch.setattr(web_search, "TAVILY_API_BASE_URL", stand_ins.tavily_url)
+            tv = web_search.tavily_client("test")
+            unbounded = await asyncio.to_thread(web_search._search, tv, '"Acme" "annual report" 2023', 5)
+            started = time.perf_counter()
+            bounded = await asyncio.to_thread(web_search._search, tv, '"Acme" "annual report" 2022', 5, Deadline(0.1))
+            return unbounded, bounded, time.perf_counter() - started
+
+    unbounded, bounded, elapsed = asyncio.run(go())
+    # The client must accept the timeout the deadline sizes for it
+    assert unbounded
+    assert bounded == [] and elapsed < 0.4